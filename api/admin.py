@@ -1,75 +1,188 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from . import profiling
 from .models import (
     Portfolio, Project, Skill, Experience, Education, 
-    Contact, SocialLink, Testimonial, Template, CustomUser
+    Contact, SocialLink, Testimonial, Template, CustomUser, Job, Tag, RequestProfile
 )
 
+class SoftDeleteAdminMixin:
+    """
+    Route the admin delete action through the set-based soft delete of
+    DeletedQuerySet, and add an action to restore soft-deleted rows.
+    """
+    actions = ["restore_selected"]
+
+    def delete_queryset(self, request, queryset):
+        queryset.soft_delete()
+
+    @admin.action(description="Restore selected %(verbose_name_plural)s")
+    def restore_selected(self, request, queryset):
+        restored = queryset.restore()
+        self.message_user(request, f"Restored {restored} row(s).")
+
+
+class PortfolioChoicesAdminMixin:
+    """
+    Join the user into the portfolio choices of the change form; their labels
+    (Portfolio.__str__) show the username, which would take a query per portfolio.
+    """
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "portfolio":
+            kwargs["queryset"] = Portfolio.objects.select_related("user")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
 # CustomUserAdmin to manage the CustomUser model in the admin panel
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(SoftDeleteAdminMixin, UserAdmin):
     model = CustomUser
     list_display = ['id', 'username', 'email', 'first_name', 'last_name', 'is_deleted', 'deleted_at']
 
    
 @admin.register(Portfolio)
-class PortfolioAdmin(admin.ModelAdmin):
+class PortfolioAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'title', 'created_at', 'updated_at', 'is_deleted')
     search_fields = ('user__username', 'title')
     list_filter = ('is_deleted',)
+    list_select_related = ('user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(SoftDeleteAdminMixin, PortfolioChoicesAdminMixin, admin.ModelAdmin):
     list_display = ('portfolio', 'name', 'tech_stack', 'created_at', 'updated_at', 'is_deleted')
     search_fields = ('name', 'tech_stack', 'portfolio__title')
-    list_filter = ('is_deleted',)
+    list_filter = ('is_deleted', 'tags')
+    list_select_related = ('portfolio__user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Skill)
-class SkillAdmin(admin.ModelAdmin):
+class SkillAdmin(SoftDeleteAdminMixin, PortfolioChoicesAdminMixin, admin.ModelAdmin):
     list_display = ('portfolio', 'name', 'proficiency', 'created_at', 'updated_at', 'is_deleted')
     search_fields = ('name', 'portfolio__title')
     list_filter = ('is_deleted', 'proficiency')
+    list_select_related = ('portfolio__user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Experience)
-class ExperienceAdmin(admin.ModelAdmin):
+class ExperienceAdmin(SoftDeleteAdminMixin, PortfolioChoicesAdminMixin, admin.ModelAdmin):
     list_display = ('portfolio', 'job_title', 'company_name', 'start_date', 'end_date', 'is_current', 'is_deleted')
     search_fields = ('job_title', 'company_name', 'portfolio__title')
     list_filter = ('is_deleted', 'is_current')
+    list_select_related = ('portfolio__user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Education)
-class EducationAdmin(admin.ModelAdmin):
+class EducationAdmin(SoftDeleteAdminMixin, PortfolioChoicesAdminMixin, admin.ModelAdmin):
     list_display = ('portfolio', 'degree', 'institution', 'start_date', 'end_date', 'is_current', 'is_deleted')
     search_fields = ('degree', 'institution', 'portfolio__title')
     list_filter = ('is_deleted', 'is_current')
+    list_select_related = ('portfolio__user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Contact)
-class ContactAdmin(admin.ModelAdmin):
+class ContactAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'email', 'phone', 'created_at', 'updated_at', 'is_deleted')  # Removed 'portfolio'
     search_fields = ('email', 'phone', 'user__username')  # Removed 'portfolio__title'
+    list_select_related = ('user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(SocialLink)
-class SocialLinkAdmin(admin.ModelAdmin):
+class SocialLinkAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'name', 'url', 'created_at', 'updated_at')  # Use 'name' and 'url'
     search_fields = ('name', 'url', 'user__username')  # Ensure you're using the correct field names
+    list_select_related = ('user',)
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(Testimonial)
-class TestimonialAdmin(admin.ModelAdmin):
+class TestimonialAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'author_name', 'author_company', 'created_at', 'updated_at', 'is_deleted')
     search_fields = ('author_name', 'author_company', 'user__username')
     list_filter = ('is_deleted',)
+    list_select_related = ('user',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Template)
-class TemplateAdmin(admin.ModelAdmin):
+class TemplateAdmin(SoftDeleteAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'description', 'created_at', 'updated_at', 'is_deleted')
     search_fields = ('name',)
     list_filter = ('is_deleted',)
     readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'created_at')
+    search_fields = ('name', 'slug')
+    readonly_fields = ('created_at',)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    search_fields = ('task', 'locked_by')
+    list_filter = ('status', 'task')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'locked_at', 'last_error')
+    actions = ["retry_selected"]
+
+    @admin.action(description="Retry selected jobs")
+    def retry_selected(self, request, queryset):
+        retried = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f"Queued {retried} job(s) again.")
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'handler', 'status', 'duration_ms', 'samples', 'trigger', 'user')
+    search_fields = ('path', 'handler')
+    list_filter = ('trigger', 'method', 'handler')
+    list_select_related = ('user',)
+    fields = ('method', 'path', 'handler', 'status', 'duration_ms', 'samples', 'trigger', 'user', 'created_at', 'download', 'hottest_functions')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<uuid:pk>/download/', self.admin_site.admin_view(self.download_view), name='api_requestprofile_download'),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if not self.has_view_permission(request, profile):
+            raise Http404
+        try:
+            return FileResponse(open(profile.path_on_disk, 'rb'), as_attachment=True, filename=profile.file, content_type='text/plain')
+        except FileNotFoundError:
+            raise Http404("The profile file is gone")
+
+    @admin.display(description="Folded stacks")
+    def download(self, obj):
+        url = reverse('admin:api_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a> (open in speedscope or flamegraph.pl)', url, obj.file)
+
+    @admin.display(description="Hottest functions")
+    def hottest_functions(self, obj):
+        try:
+            rows = profiling.hottest_functions(obj.path_on_disk)
+        except FileNotFoundError:
+            return "The profile file is gone"
+        if not obj.samples:
+            return "No samples; the request was shorter than PROFILE_INTERVAL"
+        return format_html(
+            '<table><tr><th>Function</th><th>Own</th><th>Total</th></tr>{}</table>',
+            format_html_join('', '<tr><td>{}</td><td>{}%</td><td>{}%</td></tr>', (
+                (frame, round(own * 100 / obj.samples, 1), round(total * 100 / obj.samples, 1))
+                for frame, own, total in rows
+            )),
+        )
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import instrumentation, signals  # noqa: F401
+
+        connection_created.connect(instrumentation.install, dispatch_uid="api.instrumentation.install")
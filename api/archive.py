@@ -0,0 +1,152 @@
+"""
+Archival of soft-deleted rows.
+
+Rows soft-deleted longer ago than the retention period are moved out of the
+live tables into the ``*_archive`` tables declared at the bottom of
+``api/models.py``. Each batch is one short transaction that copies the rows
+with ``INSERT ... SELECT`` and deletes them from the live table, so a run can
+be interrupted at any point and simply started again.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import (
+    Project, Skill, Experience, Education, Testimonial, Contact, SocialLink,
+    ProjectArchive, SkillArchive, ExperienceArchive, EducationArchive,
+    TestimonialArchive, ContactArchive, SocialLinkArchive, restored,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MODELS = {
+    Project: ProjectArchive,
+    Skill: SkillArchive,
+    Experience: ExperienceArchive,
+    Education: EducationArchive,
+    Testimonial: TestimonialArchive,
+    Contact: ContactArchive,
+    SocialLink: SocialLinkArchive,
+}
+
+
+def _copy_rows(model, source_table, target_table, pks, overrides, using):
+    """
+    Copy the rows ``pks`` between the live and archive tables of ``model`` with
+    one INSERT ... SELECT. ``overrides`` maps column names to constant values
+    for the copied rows; columns not in the live table are appended.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = [field.column for field in model._meta.concrete_fields]
+    columns += [column for column in overrides if column not in columns]
+    select_list = ", ".join("%s" if column in overrides else quote(column) for column in columns)
+    params = [overrides[column] for column in columns if column in overrides]
+    params += [model._meta.pk.get_db_prep_value(pk, connection) for pk in pks]
+    placeholders = ", ".join(["%s"] * len(pks))
+    sql = (
+        f"INSERT INTO {quote(target_table)} ({', '.join(quote(column) for column in columns)}) "
+        f"SELECT {select_list} FROM {quote(source_table)} WHERE {quote(model._meta.pk.column)} IN ({placeholders})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _prepare(model, column, value, using):
+    return model._meta.get_field(column).get_db_prep_value(value, connections[using])
+
+
+def archive_model_rows(model, cutoff, batch_size=500, pause=0.0, max_batches=None):
+    """
+    Move the rows of ``model`` soft-deleted before ``cutoff`` into its archive
+    table, ``batch_size`` rows per transaction, sleeping ``pause`` seconds
+    between batches. Returns the number of rows moved.
+    """
+    archive = ARCHIVE_MODELS[model]
+    using = router.db_for_write(model)
+    candidates = model._base_manager.using(using).filter(is_deleted=True, deleted_at__lt=cutoff).order_by("deleted_at", "id")
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic(using=using):
+            pks = list(candidates.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            # A row deleted, restored and deleted again replaces its older archived copy
+            archive._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+            archived_at = _prepare(archive, "archived_at", timezone.now(), using)
+            _copy_rows(model, model._meta.db_table, archive._meta.db_table, pks, {"archived_at": archived_at}, using)
+            # Archived rows keep their file names, so no delete signals are sent.
+            # Many-to-many links (project tags) are dropped and rebuilt on restore.
+            for field in model._meta.many_to_many:
+                through = field.remote_field.through
+                through._base_manager.using(using).filter(**{f"{field.m2m_field_name()}__in": pks})._raw_delete(using)
+            model._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+        moved += len(pks)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def archive_soft_deleted(retention=None, batch_size=500, pause=0.0, models=None):
+    """
+    Archive soft-deleted rows of every archived model (or just ``models``).
+    ``retention`` is a timedelta and defaults to ``ARCHIVE_RETENTION_DAYS``.
+    Returns a report of rows moved and rows per second for each model.
+
+    Safe to call from cron or any job scheduler.
+    """
+    if retention is None:
+        retention = timedelta(days=settings.ARCHIVE_RETENTION_DAYS)
+    cutoff = timezone.now() - retention
+    report = {}
+    for model in models or ARCHIVE_MODELS:
+        started = time.monotonic()
+        moved = archive_model_rows(model, cutoff, batch_size=batch_size, pause=pause)
+        elapsed = time.monotonic() - started
+        report[model._meta.label] = {
+            "rows": moved,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(moved / elapsed, 1) if elapsed else 0.0,
+        }
+        if moved:
+            logger.info("Archived %d %s row(s) in %.2fs", moved, model._meta.label, elapsed)
+    return report
+
+
+def restore_archived(model, pks=None, batch_size=500):
+    """
+    Move archived rows of ``model`` (all of them, or just ``pks``) back into the
+    live table as active rows. Rows whose parent portfolio or user no longer
+    exists are left in the archive. Returns ``(restored, skipped)``.
+    """
+    archive = ARCHIVE_MODELS[model]
+    using = router.db_for_write(model)
+    rows = archive._base_manager.using(using).order_by("pk")
+    if pks is not None:
+        rows = rows.filter(pk__in=pks)
+    total = rows.count()
+    for field in model._meta.concrete_fields:
+        if field.is_relation:
+            parents = field.related_model._base_manager.using(using).values("pk")
+            rows = rows.filter(**{f"{field.attname}__in": parents})
+
+    overrides = {
+        "is_deleted": _prepare(model, "is_deleted", False, using),
+        "deleted_at": None,
+    }
+    restored_count = 0
+    while True:
+        with transaction.atomic(using=using):
+            batch = list(rows.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                break
+            _copy_rows(model, archive._meta.db_table, model._meta.db_table, batch, overrides, using)
+            archive._base_manager.using(using).filter(pk__in=batch)._raw_delete(using)
+            restored.send(sender=model, pks=batch, using=using)
+        restored_count += len(batch)
+    return restored_count, total - restored_count
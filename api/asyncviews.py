@@ -0,0 +1,114 @@
+"""
+Native async reads for ASGI deployments.
+
+DRF views are synchronous, so under ASGI Django runs every request to them in
+a worker thread. With ``ASYNC_READS`` enabled, ``AsyncReadMixin`` turns the
+views of a viewset into coroutines: ``list`` and ``retrieve`` (plus any action
+listed in ``async_actions``) run on the event loop and read with the async ORM
+through the fast path's ``RowPlan``, while writes and everything else are
+handed to the regular synchronous view in a thread, as before.
+
+Authentication, permissions and throttling stay synchronous and run in one
+thread hop before the handler. Requests the fast path cannot serve (e.g.
+``?expand=``) fall back to the synchronous handler.
+
+``ASYNC_READS`` is read when the URLconf is loaded. Leave it off under WSGI,
+where every async view would be run through its own event loop.
+"""
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+from .fastpath import FastReadMixin
+
+
+class AsyncReadMixin(FastReadMixin):
+    """
+    ViewSet mixin serving the actions in ``async_actions`` (action name to
+    coroutine method name) natively under ASGI.
+    """
+    async_actions = {"list": "alist", "retrieve": "aretrieve"}
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_READS or not any(action in cls.async_actions for action in actions.values()):
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            action_map = {"head": actions["get"], **actions} if "get" in actions else actions
+            if action_map.get(request.method.lower()) not in cls.async_actions:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = action_map
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        # Keeps cls, initkwargs, actions and csrf_exempt for the router and schema
+        return update_wrapper(async_view, view)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """
+        ``APIView.dispatch()`` awaiting the action's coroutine.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication, permission and throttle classes may query the database
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, self.async_actions[self.action])
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def alist(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        if plan is None or (self.paginator is not None and not hasattr(self.paginator, "apaginate_queryset")):
+            return await sync_to_async(self.list)(request, *args, **kwargs)
+        rows = plan.values(self.filter_queryset(self.get_queryset()), self.ordering_columns())
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(rows, request, view=self)
+            if page is not None:
+                return self.get_paginated_response(await plan.aserialize(page, request))
+        return Response(await plan.aserialize([row async for row in rows], request))
+
+    async def aget_object(self):
+        """
+        ``get_object()`` for coroutine actions: the lookup runs on the event loop.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def aretrieve(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        if plan is None:
+            return await sync_to_async(self.retrieve)(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = plan.values(self.filter_queryset(self.get_queryset()))
+        try:
+            row = await rows.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            # As DRF's get_object_or_404()
+            raise Http404
+        self.check_object_permissions(request, row)
+        return Response((await plan.aserialize([row], request))[0])
@@ -0,0 +1,182 @@
+"""
+JWT authentication with a per-process cache of the authenticated users.
+
+``JWTAuthentication`` loads the user of every request by primary key, the most
+frequent query of the API. ``CachedJWTAuthentication`` keeps recently seen
+users in a bounded LRU cache of ``AUTH_USER_CACHE_SIZE`` entries, each valid
+for ``AUTH_USER_CACHE_TTL`` seconds, keyed by the token's user id.
+
+The signal handlers in ``api/signals.py`` invalidate a user's entry whenever
+the user is saved (password, staff and superuser changes), soft-deleted,
+restored or purged. Invalidation bumps a version in the ``AUTH_USER_CACHE``
+cache, which every hit is checked against. That cache is shared by all worker
+processes, so the others drop their entry immediately too; a version missing
+from it (expired or culled) counts as a miss. Changes made with
+``QuerySet.update()`` send no signal and show up after at most the TTL. Users
+are loaded from the primary database, never from a lagging replica.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import metrics
+from .routers import primary
+
+VERSION_KEY = "auth-user-version:v1:{}"
+
+
+class UserCacheStats:
+    """
+    Per-process counters of the user cache. Every hit is a query saved.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "queries_saved": self.hits,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class UserCache:
+    """
+    Thread-safe LRU cache of user instances with a time to live.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = UserCacheStats()
+
+    def versions(self):
+        return caches[settings.AUTH_USER_CACHE]
+
+    def version(self, user_id):
+        """
+        The current version of ``user_id``'s entry, starting one if there is none.
+        """
+        key = VERSION_KEY.format(user_id)
+        versions = self.versions()
+        version = versions.get(key)
+        if version is None:
+            versions.add(key, time.time_ns(), timeout=settings.AUTH_USER_CACHE_TTL * 2)
+            version = versions.get(key)
+        return version
+
+    def get(self, user_id):
+        """
+        A copy of the cached user, or None on a miss.
+        """
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            user, expires_at, version = entry
+            current = self.versions().get(VERSION_KEY.format(key))
+            if expires_at > time.monotonic() and current is not None and version == current:
+                self.stats.incr("hits")
+                # Requests may modify request.user; never share the cached instance
+                return copy.copy(user)
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+        self.stats.incr("misses")
+        return None
+
+    def set(self, user_id, user, version):
+        """
+        Cache ``user``, loaded while ``version`` was current.
+        """
+        key = str(user_id)
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (copy.copy(user), time.monotonic() + settings.AUTH_USER_CACHE_TTL, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.incr("evictions", evicted)
+
+    def invalidate(self, user_ids):
+        keys = [str(user_id) for user_id in user_ids]
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        # A new version makes every process drop its entry, and an entry loaded concurrently
+        versions = self.versions()
+        now = time.time_ns()
+        versions.set_many({VERSION_KEY.format(key): now for key in keys}, timeout=settings.AUTH_USER_CACHE_TTL * 2)
+        self.stats.incr("invalidations", len(keys))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` resolving users through ``user_cache``.
+    """
+    def authenticate(self, request):
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            result = super().authenticate(request)
+            outcome = "anonymous" if result is None else "authenticated"
+            return result
+        finally:
+            metrics.auth_duration.observe(time.perf_counter() - started, "jwt", outcome)
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None or settings.AUTH_USER_CACHE_SIZE <= 0:
+            return super().get_user(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            version = user_cache.version(user_id)
+            with primary():
+                user = super().get_user(validated_token)
+            user_cache.set(user_id, user, version)
+            return user
+
+        # The checks JWTAuthentication runs after loading the user
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,216 @@
+"""
+Reference counting and garbage collection of content-addressed blobs.
+
+Rows keep a file name in their ``FileField`` columns (archived rows in the
+matching ``CharField``). The signal handlers in ``api/signals.py`` call
+``adjust()`` whenever a saved or deleted row changes the names it references.
+``collect_garbage()`` deletes blobs whose count dropped to zero, after checking
+the tables again, since bulk ``update()`` and archival bypass the signals.
+``recount()`` rebuilds every count from the tables.
+"""
+import hashlib
+import logging
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import images, snapshots
+from .archive import ARCHIVE_MODELS
+from .models import Blob, Portfolio
+from .storage import BLOB_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+
+def file_fields(model):
+    return tuple(field.name for field in model._meta.concrete_fields if isinstance(field, models.FileField))
+
+
+def referencing_fields():
+    """
+    ``(model, field_names)`` for every live and archive table holding file names.
+    """
+    fields = []
+    for model in apps.get_app_config("api").get_models():
+        names = file_fields(model)
+        if names:
+            fields.append((model, names))
+            if model in ARCHIVE_MODELS:
+                fields.append((ARCHIVE_MODELS[model], names))
+    return fields
+
+
+def stored_names(instance):
+    return [getattr(instance, name).name for name in file_fields(type(instance)) if getattr(instance, name)]
+
+
+def adjust(added=(), removed=()):
+    """
+    Add one reference to each name in ``added`` and drop one for each in ``removed``.
+    Names that are not blobs (files stored before deduplication) are ignored.
+    """
+    delta = Counter(added)
+    delta.subtract(removed)
+    for name, change in delta.items():
+        if change:
+            Blob.objects.filter(name=name).update(refcount=F("refcount") + change)
+
+
+def references(names=None):
+    """
+    Count the rows referencing each file name, optionally only ``names``.
+    """
+    counts = Counter()
+    for model, field_names in referencing_fields():
+        for field_name in field_names:
+            rows = model._base_manager.exclude(**{f"{field_name}__isnull": True}).exclude(**{field_name: ""})
+            if names is not None:
+                rows = rows.filter(**{f"{field_name}__in": names})
+            for name, count in rows.values_list(field_name).annotate(count=Count("pk")).order_by():
+                counts[name] += count
+    return counts
+
+
+def recount():
+    """
+    Rebuild every blob's reference count from the tables. Returns the number of
+    blobs whose count was wrong.
+    """
+    counts = references()
+    fixed = 0
+    with transaction.atomic():
+        for blob in Blob.objects.select_for_update().only("pk", "name", "refcount"):
+            if blob.refcount != counts[blob.name]:
+                Blob.objects.filter(pk=blob.pk).update(refcount=counts[blob.name])
+                fixed += 1
+    return fixed
+
+
+def delete_blob_files(storage, name):
+    storage.delete(name)
+    for width in settings.IMAGE_DERIVATIVE_WIDTHS:
+        for fmt in settings.IMAGE_DERIVATIVE_FORMATS:
+            storage.delete(images.derivative_name(name, width, fmt))
+
+
+def collect_garbage(grace=None, dry_run=False):
+    """
+    Delete blobs with no references whose content was last uploaded more than
+    ``grace`` (a timedelta, default ``BLOB_GC_GRACE`` seconds) ago, along with
+    their image derivatives. Returns ``(blobs, bytes)`` deleted.
+
+    Safe to call from cron or the job queue.
+    """
+    if grace is None:
+        grace = timedelta(seconds=settings.BLOB_GC_GRACE)
+    candidates = list(
+        Blob.objects.filter(refcount__lte=0, last_used_at__lt=timezone.now() - grace).values_list("name", flat=True)
+    )
+    still_referenced = references(candidates)
+    deleted = freed = 0
+    for name in candidates:
+        if still_referenced[name]:
+            Blob.objects.filter(name=name).update(refcount=still_referenced[name])
+            continue
+        with transaction.atomic():
+            # Skip blobs re-uploaded or referenced since the candidates were listed
+            blob = Blob.objects.select_for_update().filter(
+                name=name, refcount__lte=0, last_used_at__lt=timezone.now() - grace,
+            ).first()
+            if blob is None:
+                continue
+            if not dry_run:
+                blob.delete()
+                transaction.on_commit(lambda name=name: delete_blob_files(default_storage, name))
+        deleted += 1
+        freed += blob.size
+    if deleted:
+        logger.info("%s %d unreferenced blob(s), %d bytes", "Would delete" if dry_run else "Deleted", deleted, freed)
+    return deleted, freed
+
+
+def _sha256(storage, name):
+    digest = hashlib.sha256()
+    with storage.open(name) as content:
+        for chunk in content.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _move_derivatives(storage, old_name, new_name):
+    # Derivatives follow their original, unless the blob already has its own
+    for width in settings.IMAGE_DERIVATIVE_WIDTHS:
+        for fmt in settings.IMAGE_DERIVATIVE_FORMATS:
+            old_path = storage.path(images.derivative_name(old_name, width, fmt))
+            new_path = storage.path(images.derivative_name(new_name, width, fmt))
+            if not os.path.exists(old_path):
+                continue
+            if os.path.exists(new_path):
+                os.unlink(old_path)
+            else:
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                file_move_safe(old_path, new_path)
+
+
+def deduplicate_media(storage=None, dry_run=False):
+    """
+    Move every file referenced by a row but stored before content addressing
+    into the blob store, point the rows at the blob and delete the original.
+    Identical files end up as one blob. Returns a report of files seen, blobs
+    they collapse into, bytes before and after, and names missing on disk.
+    """
+    storage = storage or default_storage
+    moved = {}
+    digests = {}
+    report = {"files": 0, "blobs": 0, "bytes_before": 0, "bytes_after": 0, "missing": 0}
+    for model, field_names in referencing_fields():
+        for field_name in field_names:
+            names = list(
+                model._base_manager.exclude(**{f"{field_name}__isnull": True})
+                .exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__startswith": f"{BLOB_DIRECTORY}/"})
+                .values_list(field_name, flat=True)
+                .distinct()
+                .order_by()
+            )
+            for name in names:
+                if name not in moved:
+                    if not storage.exists(name):
+                        logger.warning("%s.%s references missing file %s", model._meta.label, field_name, name)
+                        report["missing"] += 1
+                        moved[name] = None
+                        continue
+                    size = storage.size(name)
+                    report["files"] += 1
+                    report["bytes_before"] += size
+                    digest = _sha256(storage, name)
+                    if digest not in digests:
+                        digests[digest] = size
+                        report["blobs"] += 1
+                        report["bytes_after"] += size
+                    if dry_run:
+                        moved[name] = name
+                        continue
+                    with storage.open(name) as content:
+                        moved[name] = storage.save(name, File(content, name))
+                    _move_derivatives(storage, name, moved[name])
+                if moved[name] and not dry_run:
+                    model._base_manager.filter(**{field_name: name}).update(**{field_name: moved[name]})
+
+    if not dry_run:
+        for name, new_name in moved.items():
+            if new_name and new_name != name:
+                storage.delete(name)
+        recount()
+        # Snapshots hold the old media paths
+        snapshots.invalidate(list(Portfolio._base_manager.values_list("pk", flat=True)))
+    return report
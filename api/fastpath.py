@@ -0,0 +1,287 @@
+"""
+Read-only serialization straight from ``QuerySet.values()``.
+
+``ModelSerializer`` builds a model instance per row and then resolves every
+field through ``get_attribute()`` and ``to_representation()``. For list pages of
+a few hundred rows that dominates the request. ``FastReadMixin`` instead reads
+the columns the serializer shows with ``values()`` and converts them with
+converters compiled once per serializer class and field set. The output is the
+same, byte for byte, as the serializer's.
+
+Viewsets opt in with ``fast_reads = True``. Serializers with fields the fast
+path does not know (nested serializers, method fields, dotted sources, ...) or
+with their own ``to_representation()`` fall back to the regular path.
+"""
+import copy
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField as ModelFileField, JSONField as ModelJSONField
+from django.utils import timezone
+from rest_framework import fields as drf_fields, relations
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import ISO_8601, api_settings
+
+from . import images
+from .serializers import ImageVariantsField
+
+# Fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = (drf_fields.CharField, drf_fields.BooleanField, drf_fields.IntegerField, drf_fields.FloatField)
+
+_plans = {}
+
+# Converters are compiled as factories taking the request and the current time
+# zone, which are bound once per response: ``make(request, tz)(value)``.
+
+
+def _constant(convert):
+    return lambda request, tz: convert
+
+
+def _datetime_converter(field):
+    if getattr(field, "format", api_settings.DATETIME_FORMAT).lower() != ISO_8601 or not settings.USE_TZ:
+        return _constant(field.to_representation)
+    to_representation = field.to_representation
+    # DRF converts to the field's own zone if it has one, else the current one
+    field_timezone = getattr(field, "timezone", None)
+
+    def make(request, tz):
+        tz = field_timezone or tz
+
+        def convert(value):
+            if value.tzinfo is None:
+                return to_representation(value)
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return convert
+    return make
+
+
+def _date_converter(field):
+    if getattr(field, "format", api_settings.DATE_FORMAT).lower() != ISO_8601:
+        return _constant(field.to_representation)
+    return _constant(lambda value: value.isoformat())
+
+
+def _file_url_converter(model_field):
+    storage = model_field.storage
+
+    def make(request, tz):
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+    return make
+
+
+def _variants_converter(storage):
+    def make(request, tz):
+        return lambda variants: images.variant_urls(variants, storage, request)
+    return make
+
+
+def _converter(field, model_field):
+    """
+    ``(make_converter, call_on_none)`` for a serializer field reading
+    ``model_field``, or None when the fast path cannot reproduce it.
+    ``make_converter`` None means the value is used as is.
+    """
+    if isinstance(field, ImageVariantsField):
+        if not isinstance(model_field, ModelJSONField):
+            return None
+        return _variants_converter(model_field.model._meta.get_field(field.image_field).storage), True
+    if isinstance(field, drf_fields.FileField):
+        if not isinstance(model_field, ModelFileField) or not getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL):
+            return None
+        return _file_url_converter(model_field), True
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        if field.pk_field is not None or not model_field.many_to_one:
+            return None
+        return None, False
+    if isinstance(field, relations.RelatedField):
+        return None
+    if isinstance(field, drf_fields.DateTimeField):
+        return _datetime_converter(field), False
+    if isinstance(field, drf_fields.DateField):
+        return _date_converter(field), False
+    if isinstance(field, drf_fields.UUIDField) and field.uuid_format == "hex_verbose":
+        return _constant(str), False
+    if isinstance(field, drf_fields.ChoiceField):
+        choices = field.choice_strings_to_values
+        return _constant(lambda value: value if value == "" else choices.get(str(value), value)), False
+    if type(field) in IDENTITY_FIELDS or isinstance(field, drf_fields.CharField):
+        return None, False
+    return _constant(field.to_representation), False
+
+
+class RowPlan:
+    """
+    Compiled conversion of ``values()`` rows for one serializer field set.
+    """
+    def __init__(self, model, columns, many):
+        self.model = model
+        # (output name, column, make_converter, call_on_none); column None for ``many``
+        self.columns = columns
+        # (output name, related model, reverse query name, slug field)
+        self.many = many
+
+    def values(self, queryset, required=()):
+        pk = self.model._meta.pk.name
+        names = dict.fromkeys([pk, *required, *(column for _, column, _, _ in self.columns if column)])
+        return queryset.prefetch_related(None).values(*names)
+
+    def serialize(self, rows, request=None):
+        rows = list(rows)
+        return self._convert(rows, self._related_values(rows), request)
+
+    async def aserialize(self, rows, request=None):
+        """
+        ``serialize()`` for async views; many-to-many values are read with the async ORM.
+        """
+        rows = list(rows)
+        related = {}
+        for name, queryset in self._related_querysets(rows):
+            related[name] = values = defaultdict(list)
+            async for owner, value in queryset:
+                values[owner].append(value)
+        return self._convert(rows, related, request)
+
+    def _convert(self, rows, related, request):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        columns = [
+            (name, column, make(request, tz) if make is not None else None, call_on_none)
+            for name, column, make, call_on_none in self.columns
+        ]
+        pk = self.model._meta.pk.name
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert, call_on_none in columns:
+                if column is None:
+                    item[name] = related[name].get(row[pk], [])
+                    continue
+                value = row[column]
+                if convert is not None and (call_on_none or value is not None):
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    def _related_values(self, rows):
+        related = {}
+        for name, queryset in self._related_querysets(rows):
+            related[name] = values = defaultdict(list)
+            for owner, value in queryset:
+                values[owner].append(value)
+        return related
+
+    def _related_querysets(self, rows):
+        # Same query shape as the prefetch, so the items come in the same order
+        pks = [row[self.model._meta.pk.name] for row in rows]
+        for name, related_model, query_name, slug_field in self.many:
+            queryset = related_model._default_manager.filter(**{f"{query_name}__in": pks}).values_list(query_name, slug_field)
+            yield name, queryset if pks else queryset.none()
+
+
+def compile_plan(serializer):
+    """
+    ``RowPlan`` for the fields of ``serializer`` (a ``ModelSerializer``
+    instance), or None when one of them needs the regular path. Plans are cached
+    per serializer class and field names and types.
+    """
+    key = (type(serializer), tuple((name, type(field)) for name, field in serializer.fields.items()))
+    if key not in _plans:
+        _plans[key] = _compile(serializer)
+    return _plans[key]
+
+
+def _custom_representation(field):
+    # to_representation() defined outside DRF (ImageVariantsField aside) can do anything
+    owner = next(klass for klass in type(field).__mro__ if "to_representation" in vars(klass))
+    return owner is not ImageVariantsField and not owner.__module__.startswith("rest_framework.")
+
+
+def _compile(serializer):
+    if _custom_representation(serializer):
+        return None
+    model = serializer.Meta.model
+    columns = []
+    many = []
+    for name, field in serializer.fields.items():
+        if isinstance(field, BaseSerializer) or field.source == "*" or len(field.source_attrs) != 1:
+            return None
+        if _custom_representation(field):
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, relations.ManyRelatedField):
+            child = field.child_relation
+            if not model_field.many_to_many or not model_field.concrete:
+                return None
+            if isinstance(child, relations.SlugRelatedField):
+                slug_field = child.slug_field
+            elif isinstance(child, relations.PrimaryKeyRelatedField) and child.pk_field is None:
+                slug_field = "pk"
+            else:
+                return None
+            many.append((name, model_field.related_model, model_field.related_query_name(), slug_field))
+            columns.append((name, None, None, False))
+            continue
+        if model_field.is_relation and not model_field.many_to_one:
+            return None
+        # An unbound copy, so the plan keeps no reference to this request
+        converter = _converter(copy.deepcopy(field), model_field)
+        if converter is None:
+            return None
+        columns.append((name, field.source, *converter))
+    return RowPlan(model, columns, many)
+
+
+class FastReadMixin:
+    """
+    ViewSet mixin serving ``list`` and ``retrieve`` through a ``RowPlan`` when
+    ``fast_reads`` is set and the serializer allows it. Object permissions
+    receive the row dict.
+    """
+    fast_reads = False
+
+    def get_read_plan(self):
+        """
+        ``RowPlan`` for this request's serializer, or None for the regular path.
+        """
+        if not self.fast_reads:
+            return None
+        return compile_plan(self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = plan.values(self.filter_queryset(self.get_queryset()), self.ordering_columns())
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page, request))
+        return Response(plan.serialize(rows, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        plan = self.get_read_plan()
+        if plan is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = plan.values(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(rows, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(plan.serialize([row], request)[0])
+
+    def ordering_columns(self):
+        # The paginator's keyset has to be in the rows
+        ordering = getattr(self.paginator, "ordering", ())
+        return [name.lstrip("-") for name in ((ordering,) if isinstance(ordering, str) else ordering)]
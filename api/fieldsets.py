@@ -0,0 +1,147 @@
+"""
+Sparse fieldsets and on-demand expansion of related objects.
+
+``?fields=id,title`` limits a response to the listed fields and ``?expand=user``
+replaces a foreign key id with the nested object. Both apply to ``GET``
+requests only, so writes always validate every field.
+
+``SparseFieldsetMixin`` trims the serializer. ``SparseQuerysetMixin`` reads the
+same serializer on ``list`` and ``retrieve`` and loads only the columns and
+relations it needs: ``.only()`` for the requested fields, ``select_related`` for
+expanded foreign keys, and only the prefetches of requested relations.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def requested(request, param):
+    """
+    Names listed in ``param``, which may be repeated or comma-separated.
+    """
+    return {
+        name.strip()
+        for value in request.query_params.getlist(param)
+        for name in value.split(",")
+        if name.strip()
+    }
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for ``?fields=`` and ``?expand=``. Expandable foreign keys
+    are declared as ``Meta.expandable_fields = {"user": UserSerializer}``.
+
+    Only the top-level serializer of a request is trimmed; nested serializers
+    keep all their fields.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS or not self._is_top_level():
+            return fields
+
+        expand = requested(request, EXPAND_PARAM)
+        for name, serializer_class in getattr(self.Meta, "expandable_fields", {}).items():
+            if name in expand and name in fields:
+                fields[name] = serializer_class(source=fields[name].source, read_only=True)
+
+        wanted = requested(request, FIELDS_PARAM)
+        if wanted:
+            fields = fields.__class__((name, field) for name, field in fields.items() if name in wanted)
+        return fields
+
+    def _is_top_level(self):
+        return self.parent is None or (isinstance(self.parent, ListSerializer) and self.parent.parent is None)
+
+
+def _load_plan(fields, model, prefix=""):
+    """
+    ``(only, select_related, prefetch_related)`` lookups that serialize
+    ``fields`` of ``model`` without further queries, or None when a field reads
+    something other than model fields.
+    """
+    only = {prefix + model._meta.pk.name}
+    select = set()
+    prefetch = set()
+    for field in fields:
+        if field.source == "*":
+            return None
+        name, *rest = field.source_attrs
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+        if model_field.many_to_many or model_field.one_to_many:
+            if prefix:
+                return None
+            prefetch.add(name)
+        elif not model_field.is_relation:
+            only.add(prefix + name)
+        elif not model_field.concrete:
+            return None
+        elif isinstance(field, BaseSerializer):
+            # Expanded foreign key: join it and load what the nested serializer shows
+            nested = _load_plan(field.fields.values(), model_field.related_model, f"{prefix}{name}__")
+            if nested is None or nested[2]:
+                return None
+            only |= {prefix + name} | nested[0]
+            select |= {prefix + name} | nested[1]
+        elif rest:
+            # A single attribute of the related row, e.g. source="user.username"
+            if len(rest) > 1:
+                return None
+            only |= {prefix + name, f"{prefix}{name}__{rest[0]}"}
+            select.add(prefix + name)
+        else:
+            # Primary key of the related row, read from the local column
+            only.add(prefix + name)
+    return only, select, prefetch
+
+
+def _lookup_root(lookup):
+    return (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split("__")[0]
+
+
+def restrict_queryset(queryset, serializer, required=()):
+    """
+    ``queryset`` loading only what ``serializer`` outputs, plus the ``required``
+    columns (e.g. the pagination ordering). Prefetches of relations the
+    serializer does not show are dropped.
+    """
+    plan = _load_plan(serializer.fields.values(), queryset.model)
+    if plan is None:
+        return queryset
+    only, select, prefetch = plan
+    lookups = [lookup for lookup in queryset._prefetch_related_lookups if _lookup_root(lookup) in prefetch]
+    lookups += sorted(prefetch - {_lookup_root(lookup) for lookup in lookups})
+    queryset = queryset.only(*only, *required).prefetch_related(None).prefetch_related(*lookups)
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    return queryset
+
+
+class SparseQuerysetMixin:
+    """
+    ViewSet mixin loading only the columns and relations the serializer of a
+    ``list`` or ``retrieve`` request needs.
+    """
+    sparse_actions = ("list", "retrieve")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.sparse_actions or self.request.method not in SAFE_METHODS:
+            return queryset
+        ordering = getattr(self.paginator, "ordering", ()) if self.action == "list" else ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        required = [
+            name.lstrip("-") for name in ordering
+            if name.lstrip("-") in {field.name for field in queryset.model._meta.concrete_fields}
+        ]
+        return restrict_queryset(queryset, self.get_serializer(), required)
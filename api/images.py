@@ -0,0 +1,188 @@
+"""
+Resized, recompressed derivatives of uploaded images.
+
+For every image stored in one of ``IMAGE_FIELDS`` a WebP and a JPEG variant is
+written next to the original, under ``derivatives/``, for each width in
+``IMAGE_DERIVATIVE_WIDTHS`` that is narrower than the original. The work is
+queued as a job (see ``api.jobs``) with the upload, so requests never wait on
+Pillow and renders survive web worker restarts; ``runworker --concurrency``
+bounds how many run at once on a host. With ``IMAGE_RENDER_INLINE`` derivatives
+are rendered in the request once the upload is committed instead.
+
+Once they are written, the variants are recorded on the row, in the image
+field's ``<field>_variants`` column, so serializing them needs no storage
+lookups.
+
+``render_derivatives`` only uses Pillow and the standard library, so the
+process pool of ``manage.py build_image_derivatives`` never configures Django.
+"""
+import os
+import posixpath
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Models and their image fields that get derivatives
+IMAGE_FIELDS = {
+    "api.Template": ("preview_image",),
+    "api.Portfolio": ("profile_image",),
+    "api.Project": ("image",),
+    "api.Testimonial": ("author_photo",),
+}
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+def derivative_name(name, width, fmt):
+    """
+    Storage name of the ``width``-pixel ``fmt`` variant of the image ``name``.
+    """
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, "derivatives", f"{stem}_{width}w.{FORMAT_EXTENSIONS[fmt]}")
+
+
+def render_derivatives(source_path, targets, quality):
+    """
+    Render every ``(width, fmt, path)`` in ``targets`` from the image at ``source_path``.
+    Widths wider than the original are skipped rather than upscaled.
+    Returns the paths written.
+    """
+    written = []
+    widest = max((width for width, _, _ in targets), default=0)
+    with Image.open(source_path) as original:
+        if widest and widest < min(original.size):
+            # JPEG sources decode straight at a reduced scale that still covers the
+            # widest variant in either orientation
+            original.draft("RGB", (widest, widest))
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    # Each width is resized from the next wider one rather than from the full image
+    resized = {}
+    source = image
+    for width in sorted({width for width, _, _ in targets}, reverse=True):
+        if width > image.width:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        source = resized[width] = source if width == source.width else source.resize((width, height), Image.Resampling.LANCZOS)
+
+    for width, fmt, path in targets:
+        if width not in resized:
+            continue
+        output = resized[width]
+        if fmt == "jpeg":
+            output = _flatten(output)
+            options = {"quality": quality, "optimize": True, "progressive": True}
+        else:
+            if output.mode not in ("RGB", "RGBA"):
+                output = output.convert("RGBA" if "A" in output.getbands() else "RGB")
+            options = {"quality": quality, "method": 4}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        output.save(partial_path, format=fmt.upper(), **options)
+        os.replace(partial_path, path)
+        written.append(path)
+    return written
+
+
+def _flatten(image):
+    # JPEG has no alpha channel: composite transparent images onto white
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def derivative_targets(storage, name):
+    return [
+        (width, fmt, storage.path(derivative_name(name, width, fmt)))
+        for width in settings.IMAGE_DERIVATIVE_WIDTHS
+        for fmt in settings.IMAGE_DERIVATIVE_FORMATS
+    ]
+
+
+def variants_field(field_name):
+    """
+    Name of the column recording the variants of the image field ``field_name``.
+    """
+    return f"{field_name}_variants"
+
+
+def variants_current(variants, name):
+    """
+    Whether the recorded ``variants`` are those of the image ``name``.
+    """
+    return bool(variants) and all(
+        variant == derivative_name(name, int(width), fmt)
+        for fmt, widths in variants.items()
+        for width, variant in widths.items()
+    )
+
+
+def written_variants(name, targets, paths):
+    """
+    ``{fmt: {width: storage name}}`` of the ``targets`` of the image ``name``
+    that were written to ``paths``.
+    """
+    paths = set(paths)
+    variants = {}
+    for width, fmt, path in targets:
+        if path in paths:
+            variants.setdefault(fmt, {})[str(width)] = derivative_name(name, width, fmt)
+    return variants
+
+
+def pending_derivatives(fieldfile):
+    """
+    ``(source_path, targets, existing)`` for the derivatives of ``fieldfile``,
+    ``existing`` being the paths already written, or None when it gets none.
+    """
+    if not fieldfile:
+        return None
+    storage, name = fieldfile.storage, fieldfile.name
+    try:
+        targets = derivative_targets(storage, name)
+        source_path = storage.path(name)
+    except NotImplementedError:
+        # Remote storage without local paths
+        return None
+    if not targets:
+        return None
+    return source_path, targets, [path for _, _, path in targets if os.path.exists(path)]
+
+
+def build_derivatives(fieldfile):
+    """
+    Render the derivatives of ``fieldfile`` and return them as
+    ``{fmt: {width: storage name}}``.
+    Images that already have derivatives are not rendered again; stored names
+    identify the content, so the existing ones are returned as they are.
+    """
+    pending = pending_derivatives(fieldfile)
+    if pending is None:
+        return {}
+    source_path, targets, existing = pending
+    written = existing or render_derivatives(source_path, targets, settings.IMAGE_DERIVATIVE_QUALITY)
+    return written_variants(fieldfile.name, targets, written)
+
+
+def record_variants(model, pk, field_name, name, variants):
+    """
+    Store ``variants`` on the ``model`` row ``pk``, unless its image field
+    ``field_name`` no longer holds ``name``.
+    """
+    return model._base_manager.filter(pk=pk, **{field_name: name}).update(**{variants_field(field_name): variants})
+
+
+def variant_urls(variants, storage, request=None):
+    """
+    URLs of the recorded ``variants`` of an image in ``storage``, as ``{fmt: {width: url}}``.
+    """
+    urls = {}
+    for fmt, widths in (variants or {}).items():
+        for width, variant in widths.items():
+            url = storage.url(variant)
+            urls.setdefault(fmt, {})[width] = request.build_absolute_uri(url) if request else url
+    return urls
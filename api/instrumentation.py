@@ -0,0 +1,198 @@
+"""
+Per-request SQL instrumentation.
+
+While ``QueryInstrumentationMiddleware`` handles a request, every query on any
+database alias is counted and timed, and its fingerprint (the SQL with
+literals and parameter lists collapsed) tallied. The response gets a
+``Server-Timing`` header (``db`` with the query count and time, ``app`` for the
+whole request), and each request is logged to the ``api.queries`` logger with
+the numbers in the record's ``extra`` fields, for a JSON formatter to pick up.
+
+A fingerprint that repeats ``SQL_REPEAT_THRESHOLD`` times in one request is
+almost always an N+1 (a query per row of a list); it is logged as a warning.
+So is a request that runs more queries than its view's ``query_budget``: a
+``{action: queries}`` dict on the viewset, with ``"default"`` for the other
+actions. The tests hold every endpoint to its budget.
+
+Queries are recorded through an execute wrapper installed on each connection
+as it is opened, and the current request's recorder travels in a context
+variable, so queries run by ``sync_to_async`` under ASGI are counted too.
+"""
+import contextlib
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger("api.queries")
+
+# The recorder of the request being handled, if any
+_recorder = ContextVar("query_recorder", default=None)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    ``sql`` with literals replaced by ``?``, ``IN`` lists of any length
+    collapsed to ``(...)`` and whitespace normalized.
+    """
+    sql = LITERALS.sub("?", sql)
+    sql = PLACEHOLDER_LISTS.sub("(...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """
+        ``{fingerprint: count}`` of the queries run at least ``threshold`` times.
+        """
+        threshold = threshold or settings.SQL_REPEAT_THRESHOLD
+        return {sql: count for sql, count in self.fingerprints.most_common() if count >= threshold}
+
+
+@contextlib.contextmanager
+def record_queries():
+    """
+    Record the queries run in the block; yields the ``QueryRecorder``.
+    """
+    recorder = QueryRecorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def current_recorder():
+    """
+    The recorder of the enclosing ``record_queries()`` block, or None.
+    """
+    return _recorder.get()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, time.perf_counter() - started)
+
+
+def install(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver adding ``execute_wrapper`` to the connection.
+    """
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def query_budget(view, action):
+    """
+    Most queries ``action`` of the view class ``view`` may run, or None.
+    """
+    budgets = getattr(view, "query_budget", None) or {}
+    return budgets.get(action, budgets.get("default"))
+
+
+def resolve_view(request):
+    """
+    ``(view class, action)`` of the DRF view that handled ``request``, or
+    ``(None, None)``.
+    """
+    match = getattr(request, "resolver_match", None)
+    view = getattr(match.func, "cls", None) if match else None
+    if view is None:
+        return None, None
+    actions = getattr(match.func, "actions", None) or {}
+    method = request.method.lower()
+    return view, actions.get(method) or (actions.get("get") if method == "head" else None) or method
+
+
+def resolve_budget(request):
+    """
+    ``(view name, action, budget)`` of the DRF view that handled ``request``.
+    """
+    view, action = resolve_view(request)
+    if view is None:
+        return None, None, None
+    return view.__name__, action, query_budget(view, action)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count and time the queries of each request; report them in ``Server-Timing``
+    and the ``api.queries`` log.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.process_response(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.process_response(request, response, recorder, time.perf_counter() - started)
+
+    def process_response(self, request, response, recorder, duration):
+        response.headers["Server-Timing"] = ", ".join(filter(None, [
+            response.get("Server-Timing"),
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+            f"app;dur={duration * 1000:.2f}",
+        ]))
+        view, action, budget = resolve_budget(request)
+        repeated = recorder.repeated()
+        extra = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "view": view,
+            "action": action,
+            "duration_ms": round(duration * 1000, 2),
+            "db_queries": recorder.count,
+            "db_duration_ms": round(recorder.duration * 1000, 2),
+            "db_query_budget": budget,
+            "db_repeated_queries": repeated,
+        }
+        logger.info("%s %s: %d queries in %.2f ms", request.method, request.path, recorder.count, recorder.duration * 1000, extra=extra)
+        if repeated:
+            logger.warning(
+                "Possible N+1 in %s %s: %s", request.method, request.path,
+                "; ".join(f"{count}x {sql}" for sql, count in repeated.items()), extra=extra,
+            )
+        if budget is not None and recorder.count > budget:
+            logger.warning(
+                "%s.%s ran %d queries, over its budget of %d", view, action, recorder.count, budget, extra=extra,
+            )
+        return response
@@ -0,0 +1,237 @@
+"""
+Database-backed background jobs.
+
+``enqueue()`` stores a call to a module-level function as a ``Job`` row in the
+same database as everything else, so no broker is needed. ``manage.py
+runworker`` claims runnable jobs and calls them:
+
+- On backends with ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL) workers
+  lock the next runnable row and skip rows already locked by other workers.
+- Elsewhere (SQLite) a job is claimed with a conditional UPDATE of its status;
+  the worker whose UPDATE changed the row owns the job.
+
+Failed jobs are retried with exponential backoff until ``max_attempts``.
+"""
+import logging
+import os
+import random
+import socket
+import statistics
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task_path(task):
+    if isinstance(task, str):
+        return task
+    return f"{task.__module__}.{task.__qualname__}"
+
+
+def enqueue(task, *args, run_after=None, max_attempts=None, **kwargs):
+    """
+    Queue a call of ``task`` (a module-level function or its dotted path) with
+    JSON-serializable arguments. Enqueued inside a transaction, the job only
+    becomes visible to workers once it commits.
+    """
+    return Job.objects.create(
+        task=task_path(task),
+        args=list(args),
+        kwargs=kwargs,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait before the next attempt: exponential backoff with jitter.
+    """
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim_next(worker_id):
+    """
+    Claim the next runnable job for ``worker_id`` and mark it running, or return None.
+    """
+    now = timezone.now()
+    using = router.db_for_write(Job)
+    ready = Job.objects.using(using).filter(status=Job.QUEUED, run_after__lte=now).order_by("run_after", "created_at")
+    claim = {
+        "status": Job.RUNNING,
+        "locked_by": worker_id,
+        "locked_at": now,
+        "started_at": now,
+        "attempts": F("attempts") + 1,
+    }
+
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            job = ready.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.using(using).filter(pk=job.pk).update(**claim)
+    else:
+        # No row locks: compare-and-set on the status, retrying on a lost race
+        for pk in ready.values_list("pk", flat=True)[:settings.JOB_CLAIM_CANDIDATES]:
+            if Job.objects.using(using).filter(pk=pk, status=Job.QUEUED).update(**claim):
+                break
+        else:
+            return None
+        job = Job(pk=pk)
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    """
+    Call the job's task and record the outcome. Returns True on success.
+    """
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, run_after=now + timedelta(seconds=delay),
+                locked_by=None, locked_at=None, last_error=error,
+            )
+            logger.warning("Job %s (%s) failed, retrying in %.1fs", job.pk, job.task, delay)
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, finished_at=now, locked_by=None, locked_at=None, last_error=error,
+            )
+            logger.error("Job %s (%s) failed after %d attempt(s)", job.pk, job.task, job.attempts)
+        return False
+    Job.objects.filter(pk=job.pk).update(status=Job.DONE, finished_at=timezone.now(), locked_by=None, locked_at=None)
+    return True
+
+
+def requeue_stale(timeout):
+    """
+    Put jobs claimed more than ``timeout`` seconds ago back in the queue; their
+    worker is assumed to have died. Returns the number of jobs requeued.
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by=None, locked_at=None,
+    )
+
+
+class WorkerMetrics:
+    """
+    Throughput and latency of the jobs run by one worker process.
+    """
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.succeeded = 0
+        self.failed = 0
+        self.wait_times = deque(maxlen=samples)  # Seconds from runnable to claimed
+        self.run_times = deque(maxlen=samples)  # Seconds spent in the task
+
+    def record(self, job, run_time, ok):
+        wait = (job.started_at - max(job.run_after, job.created_at)).total_seconds()
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.wait_times.append(max(wait, 0.0))
+            self.run_times.append(run_time)
+
+    def as_dict(self):
+        with self._lock:
+            processed = self.succeeded + self.failed
+            elapsed = time.monotonic() - self.started
+            return {
+                "processed": processed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "jobs_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+                "wait_p50": _percentile(self.wait_times, 50),
+                "wait_p95": _percentile(self.wait_times, 95),
+                "run_p50": _percentile(self.run_times, 50),
+                "run_p95": _percentile(self.run_times, 95),
+            }
+
+
+def _percentile(samples, percent):
+    if len(samples) < 2:
+        return round(samples[0], 4) if samples else None
+    return round(statistics.quantiles(samples, n=100, method="inclusive")[percent - 1], 4)
+
+
+class Worker:
+    """
+    Runs queued jobs in ``concurrency`` threads until stopped. With ``burst``
+    the worker exits once the queue has no runnable jobs left.
+    """
+    def __init__(self, concurrency=1, poll_interval=1.0, burst=False, metrics_interval=60.0):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.metrics_interval = metrics_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.metrics = WorkerMetrics()
+        self.stopping = threading.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        requeued = requeue_stale(settings.JOB_STALE_TIMEOUT)
+        if requeued:
+            logger.warning("Requeued %d job(s) left running by a dead worker", requeued)
+        if self.concurrency == 1:
+            self.loop(f"{self.worker_id}:0")
+        else:
+            threads = [
+                threading.Thread(target=self.threaded_loop, args=(f"{self.worker_id}:{n}",), daemon=True)
+                for n in range(self.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        logger.info("Worker %s stopped: %s", self.worker_id, self.metrics.as_dict())
+
+    def loop(self, worker_id, between_jobs=None):
+        last_report = time.monotonic()
+        while not self.stopping.is_set():
+            if between_jobs is not None:
+                between_jobs()
+            job = claim_next(worker_id)
+            if job is None:
+                if self.burst:
+                    break
+                self.stopping.wait(self.poll_interval)
+                continue
+            started = time.perf_counter()
+            ok = run_job(job)
+            self.metrics.record(job, time.perf_counter() - started, ok)
+            if time.monotonic() - last_report >= self.metrics_interval:
+                last_report = time.monotonic()
+                logger.info("Worker metrics: %s", self.metrics.as_dict())
+
+    def threaded_loop(self, worker_id):
+        # Each thread has its own connections; drop broken ones between jobs
+        try:
+            self.loop(worker_id, between_jobs=close_old_connections)
+        finally:
+            connections.close_all()
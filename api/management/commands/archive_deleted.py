@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move rows soft-deleted longer ago than the retention period into the archive tables, "
+        "or restore archived rows with --restore. Safe to interrupt and run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days", type=int, default=settings.ARCHIVE_RETENTION_DAYS,
+            help="Archive rows soft-deleted more than this many days ago (default: ARCHIVE_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Rows moved per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0.0,
+            help="Seconds to sleep between batches to leave room for live traffic.",
+        )
+        parser.add_argument(
+            "--model", action="append", dest="models",
+            help="Only process this model, e.g. api.Project. May be repeated.",
+        )
+        parser.add_argument(
+            "--restore", action="store_true",
+            help="Move archived rows back into the live tables as active rows.",
+        )
+        parser.add_argument(
+            "--ids", nargs="+",
+            help="With --restore, only restore these primary keys (requires a single --model).",
+        )
+
+    def get_models(self, labels):
+        if not labels:
+            return list(archive.ARCHIVE_MODELS)
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError(f"Unknown model '{label}'.")
+            if model not in archive.ARCHIVE_MODELS:
+                raise CommandError(f"{label} has no archive table.")
+            models.append(model)
+        return models
+
+    def handle(self, *args, **options):
+        models = self.get_models(options["models"])
+
+        if options["restore"]:
+            if options["ids"] and len(models) != 1:
+                raise CommandError("--ids requires exactly one --model.")
+            for model in models:
+                restored, skipped = archive.restore_archived(model, pks=options["ids"], batch_size=options["batch_size"])
+                self.stdout.write(f"{model._meta.label}: restored {restored} row(s), skipped {skipped} without a parent")
+            return
+
+        report = archive.archive_soft_deleted(
+            retention=timedelta(days=options["retention_days"]),
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            models=models,
+        )
+        for label, stats in report.items():
+            self.stdout.write(f"{label}: moved {stats['rows']} row(s) in {stats['seconds']}s ({stats['rows_per_second']} rows/s)")
+        self.stdout.write(self.style.SUCCESS(f"Archived {sum(s['rows'] for s in report.values())} row(s)"))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import Project
+from api.tags import sync_project_tags
+
+
+class Command(BaseCommand):
+    help = "Parse Project.tech_stack of every project, including soft-deleted ones, into tags."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Projects tagged per transaction (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch_size = options["batch_size"]
+        projects = Project._base_manager.only("pk", "tech_stack").order_by("pk")
+        batch = []
+        done = 0
+        for project in projects.iterator(chunk_size=batch_size):
+            batch.append(project)
+            if len(batch) == batch_size:
+                sync_project_tags(batch)
+                done += len(batch)
+                batch = []
+        sync_project_tags(batch)
+        done += len(batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Tagged {done} project(s) in {elapsed:.2f}s"))
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.signals import image_rendered
+
+
+class Command(BaseCommand):
+    help = "Render missing resized derivatives for every stored image and record them on its row."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Rendering processes (default: number of CPUs).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rendered = 0
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=options["workers"], mp_context=context) as pool:
+            pending = {}
+            for label, field_names in images.IMAGE_FIELDS.items():
+                model = apps.get_model(label)
+                for instance in model._base_manager.iterator():
+                    for field_name in field_names:
+                        fieldfile = getattr(instance, field_name)
+                        if images.variants_current(getattr(instance, images.variants_field(field_name)), fieldfile.name):
+                            continue
+                        found = images.pending_derivatives(fieldfile)
+                        if found is None:
+                            continue
+                        source_path, targets, existing = found
+                        render = (model, instance, field_name, fieldfile.name, targets)
+                        if existing:
+                            self.record(render, existing)
+                            continue
+                        future = pool.submit(images.render_derivatives, source_path, targets, settings.IMAGE_DERIVATIVE_QUALITY)
+                        pending[future] = render
+
+            # Recorded from this thread, as each render finishes
+            for future in as_completed(pending):
+                written = future.result()
+                if written:
+                    self.record(pending[future], written)
+                    rendered += 1
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Rendered derivatives for {rendered} image(s) in {elapsed:.2f}s"))
+
+    def record(self, render, written):
+        model, instance, field_name, name, targets = render
+        image_rendered(model, instance, field_name, name, images.written_variants(name, targets, written))
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api import blobs
+
+
+class Command(BaseCommand):
+    help = "Delete stored uploads that no row references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace", type=int, default=None,
+            help="Keep unreferenced blobs uploaded less than this many seconds ago (default: BLOB_GC_GRACE).",
+        )
+        parser.add_argument(
+            "--recount", action="store_true",
+            help="Rebuild every reference count from the tables first.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Report what would be deleted without deleting anything.",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            fixed = blobs.recount()
+            self.stdout.write(f"Corrected {fixed} reference count(s)")
+        grace = timedelta(seconds=options["grace"]) if options["grace"] is not None else None
+        deleted, freed = blobs.collect_garbage(grace=grace, dry_run=options["dry_run"])
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} blob(s), {freed} bytes"))
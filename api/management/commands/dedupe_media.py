@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api import blobs
+
+
+class Command(BaseCommand):
+    help = "Move uploads stored before content addressing into the blob store, merging identical files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Hash the files and report the savings without moving anything.",
+        )
+
+    def handle(self, *args, **options):
+        report = blobs.deduplicate_media(dry_run=options["dry_run"])
+        saved = report["bytes_before"] - report["bytes_after"]
+        prefix = "Would deduplicate" if options["dry_run"] else "Deduplicated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {report['files']} file(s) into {report['blobs']} blob(s), "
+            f"saving {saved} of {report['bytes_before']} bytes"
+        ))
+        if report["missing"]:
+            self.stdout.write(self.style.WARNING(f"{report['missing']} referenced file(s) are missing on disk"))
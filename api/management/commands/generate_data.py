@@ -0,0 +1,157 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import rollups, search, tags
+from api.models import (
+    CustomUser, Portfolio, Project, Skill, Experience, Education,
+    Contact, SocialLink, Testimonial, Template
+)
+
+FIRST_NAMES = ["Ada", "Alan", "Grace", "Linus", "Margaret", "Dennis", "Barbara", "Ken", "Radia", "Guido", "Frances", "Tim", "Sophie", "Yukihiro", "Anita", "Bjarne"]
+LAST_NAMES = ["Lovelace", "Turing", "Hopper", "Torvalds", "Hamilton", "Ritchie", "Liskov", "Thompson", "Perlman", "van Rossum", "Allen", "Berners-Lee", "Wilson", "Matsumoto", "Borg", "Stroustrup"]
+CITIES = ["Berlin", "London", "Lisbon", "Toronto", "Austin", "Bangalore", "Nairobi", "Singapore", "Sydney", "Remote"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries", "Wayne Enterprises", "Cyberdyne", "Soylent", "Vandelay"]
+JOB_TITLES = ["Software Engineer", "Backend Developer", "Frontend Developer", "Data Engineer", "DevOps Engineer", "Engineering Manager", "Mobile Developer", "Site Reliability Engineer"]
+ROLES = ["Backend", "Frontend", "Full stack", "Maintainer", "Tech lead", "Contributor"]
+DEGREES = ["BSc Computer Science", "MSc Computer Science", "BEng Software Engineering", "MSc Data Science", "BA Mathematics", "PhD Distributed Systems"]
+INSTITUTIONS = ["TU Berlin", "Imperial College", "University of Toronto", "ETH Zurich", "IIT Bombay", "University of Nairobi", "MIT", "NUS"]
+SKILLS = ["Python", "Django", "React", "TypeScript", "Go", "Rust", "PostgreSQL", "Redis", "Docker", "Kubernetes", "AWS", "GraphQL", "Kotlin", "Swift", "Terraform", "Node.js"]
+PROFICIENCIES = ["Beginner", "Intermediate", "Advanced", "Expert"]
+SOCIAL_SITES = ["GitHub", "LinkedIn", "Mastodon", "Stack Overflow", "Dev.to"]
+WORDS = (
+    "built designed shipped migrated scaled maintained api service platform dashboard pipeline "
+    "realtime payments search analytics mobile cloud team users latency reliability open source "
+    "library tooling infrastructure performance customers release testing monitoring"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users with portfolios, projects, skills, experiences, educations, testimonials, "
+        "contacts and social links for load testing. Counts per user are averages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000, help="Users to create, each with one portfolio (default: 10000).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Users created per transaction (default: 1000).")
+        parser.add_argument("--seed", type=int, default=42, help="Seed of the random generator; equal seeds give equal data (default: 42).")
+        parser.add_argument("--prefix", default="user", help="Username prefix; numbering continues after existing users with it (default: user).")
+        parser.add_argument("--password", default="password", help="Password of every generated user (default: password).")
+        parser.add_argument("--projects", type=int, default=4)
+        parser.add_argument("--skills", type=int, default=8)
+        parser.add_argument("--experiences", type=int, default=3)
+        parser.add_argument("--educations", type=int, default=2)
+        parser.add_argument("--testimonials", type=int, default=2)
+        parser.add_argument("--contacts", type=int, default=1)
+        parser.add_argument("--social-links", type=int, default=3)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rng = random.Random(options["seed"])
+        # Hashing is deliberately slow; every user shares one hash
+        password = make_password(options["password"])
+        templates = list(Template.objects.active())
+        if not templates:
+            templates = Template.objects.bulk_create([
+                Template(name=name, description=f"{name} portfolio layout") for name in ("Minimal", "Classic", "Developer", "Creative")
+            ])
+        first = CustomUser._base_manager.filter(username__startswith=options["prefix"]).count()
+        total = options["users"]
+        rows = 0
+        for offset in range(0, total, options["batch_size"]):
+            numbers = range(first + offset, first + min(offset + options["batch_size"], total))
+            rows += self.create_batch(rng, numbers, password, templates, options)
+            self.stdout.write(f"Created {offset + len(numbers)}/{total} users")
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Created {total} user(s) and {rows} other row(s) in {elapsed:.2f}s"))
+
+    def create_batch(self, rng, numbers, password, templates, options):
+        """
+        Create the users ``numbers`` and all their rows in one transaction.
+        Returns the number of rows other than users.
+        """
+        def count(name):
+            # Between none and twice the average, so some portfolios are sparse and some large
+            return rng.randint(0, 2 * options[name])
+
+        def text(words):
+            return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+        def start_date():
+            return date(2005, 1, 1) + timedelta(days=rng.randrange(7000))
+
+        users, portfolios, children = [], [], {model: [] for model in (Project, Skill, Experience, Education, Testimonial, Contact, SocialLink)}
+        for number in numbers:
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f"{options['prefix']}{number}"
+            user = CustomUser(
+                username=username, email=f"{username}@example.com", password=password,
+                first_name=first_name, last_name=last_name,
+            )
+            users.append(user)
+            portfolio = Portfolio(
+                user=user, template=rng.choice([*templates, None]),
+                title=f"{first_name} {last_name}'s Portfolio", bio=text(30),
+            )
+            portfolios.append(portfolio)
+            children[Project] += [
+                Project(
+                    portfolio=portfolio, name=f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)}", description=text(60),
+                    tech_stack=", ".join(rng.sample(SKILLS, rng.randint(1, 4))), role=rng.choice(ROLES),
+                    github_url=f"https://github.com/{username}/project-{index}",
+                )
+                for index in range(count("projects"))
+            ]
+            children[Skill] += [
+                Skill(portfolio=portfolio, name=name, proficiency=rng.choice(PROFICIENCIES))
+                for name in rng.sample(SKILLS, min(count("skills"), len(SKILLS)))
+            ]
+            for index in range(count("experiences")):
+                started = start_date()
+                current = index == 0 and rng.random() < 0.5
+                children[Experience].append(Experience(
+                    portfolio=portfolio, job_title=rng.choice(JOB_TITLES), company_name=rng.choice(COMPANIES),
+                    location=rng.choice(CITIES), start_date=started, is_current=current,
+                    end_date=None if current else started + timedelta(days=rng.randint(180, 2000)), description=text(40),
+                ))
+            for index in range(count("educations")):
+                started = start_date()
+                children[Education].append(Education(
+                    portfolio=portfolio, degree=rng.choice(DEGREES), institution=rng.choice(INSTITUTIONS),
+                    location=rng.choice(CITIES), start_date=started, end_date=started + timedelta(days=rng.randint(700, 1500)),
+                ))
+            children[Testimonial] += [
+                Testimonial(
+                    user=user, author_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    author_position=rng.choice(JOB_TITLES), author_company=rng.choice(COMPANIES), testimonial_text=text(35),
+                )
+                for _ in range(count("testimonials"))
+            ]
+            children[Contact] += [
+                Contact(
+                    user=user, name=f"{first_name} {last_name}", email=f"{username}@example.com",
+                    phone=f"+1 555 {rng.randrange(10000):04d}", address=rng.choice(CITIES),
+                )
+                for _ in range(count("contacts"))
+            ]
+            children[SocialLink] += [
+                SocialLink(user=user, name=site, url=f"https://{site.lower().replace(' ', '')}.example.com/{username}")
+                for site in rng.sample(SOCIAL_SITES, min(count("social_links"), len(SOCIAL_SITES)))
+            ]
+
+        batch_size = options["batch_size"]
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users, batch_size=batch_size)
+            Portfolio.objects.bulk_create(portfolios, batch_size=batch_size)
+            for model, objects in children.items():
+                model.objects.bulk_create(objects, batch_size=batch_size)
+            # bulk_create sends no signals: fill in what their receivers maintain
+            tags.sync_project_tags(children[Project])
+            rollups.apply_skill_deltas(*rollups.count_skills((skill.name, skill.proficiency) for skill in children[Skill]))
+            search.reindex([portfolio.pk for portfolio in portfolios])
+        return len(portfolios) + sum(len(objects) for objects in children.values())
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import RequestProfile
+
+
+class Command(BaseCommand):
+    help = "Delete request profiles, and their files, older than PROFILE_RETENTION_DAYS. Run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days", type=int, default=settings.PROFILE_RETENTION_DAYS,
+            help="Delete profiles recorded more than this many days ago (default: PROFILE_RETENTION_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["retention_days"])
+        # QuerySet.delete() sends post_delete per row, which removes the files
+        deleted, _ = RequestProfile.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} request profile(s)"))
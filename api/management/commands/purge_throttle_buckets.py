@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.throttling import DatabaseBucketStore
+
+
+class Command(BaseCommand):
+    help = "Delete the throttle buckets of the database backend that are full again. Run hourly."
+
+    def handle(self, *args, **options):
+        deleted = DatabaseBucketStore().purge()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} idle throttle bucket(s)"))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search document of every active portfolio."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Portfolios reindexed per transaction (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        indexed = search.rebuild(batch_size=options["batch_size"])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} portfolio(s) in {elapsed:.2f}s"))
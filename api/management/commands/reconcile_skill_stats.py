@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.rollups import reconcile_skill_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the skill popularity rollup from the Skill table and repair drift. Run nightly."
+
+    def handle(self, *args, **options):
+        fixed = reconcile_skill_stats()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} skill counter(s)"))
@@ -0,0 +1,42 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs from the database job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+            help="Number of jobs run at the same time (default: JOB_WORKER_CONCURRENCY).",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0,
+            help="Seconds to wait before polling an empty queue again (default: 1).",
+        )
+        parser.add_argument(
+            "--burst", action="store_true",
+            help="Exit once there are no runnable jobs left.",
+        )
+        parser.add_argument(
+            "--metrics-interval", type=float, default=60.0,
+            help="Seconds between throughput/latency log lines (default: 60).",
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options["concurrency"],
+            poll_interval=options["poll_interval"],
+            burst=options["burst"],
+            metrics_interval=options["metrics_interval"],
+        )
+        # Finish the jobs in hand, then exit
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+        self.stdout.write(f"Worker {worker.worker_id} started with concurrency {worker.concurrency}")
+        worker.run()
+        self.stdout.write(f"Worker metrics: {worker.metrics.as_dict()}")
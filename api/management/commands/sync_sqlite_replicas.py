@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over every SQLite replica in DATABASE_REPLICAS. "
+        "Stands in for replication when trying out read replicas locally; run it after writes."
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("The primary database is not SQLite; replicate it with the database server")
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured, set DB_REPLICAS")
+        source = sqlite3.connect(primary["NAME"])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                target = sqlite3.connect(settings.DATABASES[alias]["NAME"])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f"Copied the primary to {alias}"))
+        finally:
+            source.close()
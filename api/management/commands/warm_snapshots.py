@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import snapshots
+from api.models import Portfolio
+
+
+class Command(BaseCommand):
+    help = "Prebuild the cached document snapshot of every active portfolio."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=200,
+            help="Number of portfolios serialized per batch (default: 200).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = time.monotonic()
+        built = 0
+        batch = []
+        for pk in Portfolio.objects.active().order_by("pk").values_list("pk", flat=True).iterator():
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                built += len(snapshots.build_snapshots(batch))
+                batch = []
+        if batch:
+            built += len(snapshots.build_snapshots(batch))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Built {built} portfolio snapshot(s) in {elapsed:.2f}s"))
+        self.stdout.write(f"Snapshot stats: {snapshots.stats.as_dict()}")
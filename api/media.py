@@ -0,0 +1,186 @@
+"""
+Serving of uploaded files under ``MEDIA_URL``.
+
+Files are streamed from disk in ``FileResponse`` blocks, so memory use per
+request does not depend on the file size. Single byte ranges
+(``Range: bytes=...``) are answered with 206, and ``If-None-Match`` /
+``If-Modified-Since`` with 304.
+
+``sendfile()`` only applies under WSGI (``SERVER_INTERFACE=wsgi``), where
+gunicorn's file wrapper turns whole files and byte ranges into ``sendfile()``
+calls. Under the default ASGI interface every block is read in Python and
+passed through the event loop.
+
+In production, set ``MEDIA_OFFLOAD_HEADER`` and leave the body to the web server
+in front: ``X-Accel-Redirect`` (nginx, pointing into the internal
+``MEDIA_OFFLOAD_PREFIX`` location) or ``X-Sendfile`` (Apache, lighttpd) with the
+absolute path. That works under either interface.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import BLOB_DIRECTORY
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+BLOB_NAME_RE = re.compile(rf"^{BLOB_DIRECTORY}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})\.\w+$")
+
+# Stored .gz, .bz2, ... files are the compressed files themselves, as in FileResponse:
+# sending their encoding as Content-Encoding would make clients decompress them
+ENCODED_CONTENT_TYPES = {
+    "br": "application/x-brotli",
+    "bzip2": "application/x-bzip",
+    "compress": "application/x-compress",
+    "gzip": "application/gzip",
+    "xz": "application/x-xz",
+}
+
+
+class FileRange:
+    """
+    File-like view of ``length`` bytes of ``file`` from ``start``. ``fileno()``
+    and ``tell()`` let gunicorn send the range with ``sendfile()``, bounded by
+    the Content-Length; other servers read it in blocks.
+    """
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` of a single satisfiable byte range, with ``end`` inclusive.
+    Returns None when the header should be ignored (multiple ranges or bad
+    syntax) and raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def file_etag(name, stat):
+    # Blob names contain the content hash; other files fall back to mtime and size
+    match = BLOB_NAME_RE.match(name)
+    if match:
+        return f'"{match["digest"]}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def range_applies(request, etag, last_modified):
+    # If-Range: serve the range only if the client's copy is still current
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_media(request, path):
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    name = posixpath.normpath(path).lstrip("/")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404("File not found")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = ENCODED_CONTENT_TYPES.get(encoding, content_type) or "application/octet-stream"
+
+    def set_headers(response):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Accept-Ranges"] = "bytes"
+        if name.startswith(f"{BLOB_DIRECTORY}/"):
+            # Blob names (and their derivatives') change whenever the content does
+            response["Cache-Control"] = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+        else:
+            response["Cache-Control"] = "public, no-cache"
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return set_headers(not_modified)
+
+    offload = settings.MEDIA_OFFLOAD_HEADER
+    if offload:
+        # The web server in front sends the body and handles Range itself
+        response = HttpResponse(content_type=content_type)
+        if offload.lower() == "x-accel-redirect":
+            response[offload] = settings.MEDIA_OFFLOAD_PREFIX.rstrip("/") + "/" + name
+        else:
+            response[offload] = full_path
+        return set_headers(response)
+
+    size = stat.st_size
+    start, end = 0, size - 1
+    status = 200
+    range_header = request.headers.get("Range")
+    if range_header and range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416, content_type=content_type)
+            response["Content-Range"] = f"bytes */{size}"
+            return set_headers(response)
+        if byte_range is not None:
+            start, end = byte_range
+            status = 206
+    length = end - start + 1 if size else 0
+
+    if request.method == "HEAD":
+        response = HttpResponse(status=status, content_type=content_type)
+    else:
+        file = open(full_path, "rb")
+        body = file if status == 200 else FileRange(file, start, length)
+        response = FileResponse(body, status=status, content_type=content_type)
+    response["Content-Length"] = str(length)
+    if status == 206:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return set_headers(response)
@@ -0,0 +1,367 @@
+"""
+Prometheus metrics.
+
+``MetricsMiddleware`` records, per handler (``ProjectViewSet.list`` for
+viewset actions, the URL name for other views):
+
+- ``http_requests_total`` and ``http_request_errors_total`` (status >= 400)
+- ``http_request_duration_seconds``, ``http_response_size_bytes`` and
+  ``db_query_duration_seconds`` (the request's total time in queries)
+
+``auth_duration_seconds`` times JWT authentication (api/authentication.py)
+and ``cache_duration_seconds`` the snapshot cache lookups (api/snapshots.py).
+``metrics_view`` serves all of them at ``/metrics`` in the text exposition
+format.
+
+Values live in a per-process registry. With ``METRICS_DIR`` set (gunicorn.conf.py
+sets it), a background thread writes each worker's values to its own file in
+that directory every ``METRICS_FLUSH_INTERVAL`` seconds, and a scrape sums the
+files of all workers, so any worker can answer for the whole server. Files of
+exited workers are merged into one archive file, so totals survive worker
+restarts. Clear the directory when the server starts.
+"""
+import bisect
+import contextlib
+import fcntl
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import instrumentation
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+ARCHIVE = "archive.json"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Request methods kept as labels; any other is "other", so clients cannot add label values
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE", "CONNECT"))
+
+
+class Registry:
+    """
+    Thread-safe values of the process's metrics: a float per label set for a
+    counter, ``[bucket counts..., sum, count]`` for a histogram.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._values = {}
+        self._pid = None
+        self._file = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add(self, name, labels, apply):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker starts from zero and flushes to its own file
+                self._start()
+            apply(self._values, (name, labels))
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+    def _start(self):
+        self._values = {}
+        self._pid = os.getpid()
+        self._file = f"{self._pid}-{uuid.uuid4().hex[:8]}.json"
+        if settings.METRICS_DIR:
+            threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """
+        Write this process's values to its file in ``METRICS_DIR``.
+        """
+        if not settings.METRICS_DIR or self._pid != os.getpid():
+            return
+        with self._flush_lock:
+            write_values(os.path.join(settings.METRICS_DIR, self._file), self.snapshot())
+
+    def collect(self):
+        """
+        Values summed over every process writing to ``METRICS_DIR``, or this
+        process's values without it.
+        """
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        with directory_lock():
+            archive_exited_workers()
+            totals = {}
+            for name in os.listdir(settings.METRICS_DIR):
+                if name.endswith(".json"):
+                    merge(totals, read_values(os.path.join(settings.METRICS_DIR, name)))
+        return totals
+
+
+registry = Registry()
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        def apply(values, key):
+            values[key] = values.get(key, 0) + amount
+        registry.add(self.name, labels, apply)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        registry.register(self)
+
+    def observe(self, value, *labels):
+        buckets = self.buckets
+
+        def apply(values, key):
+            counts = values.get(key)
+            if counts is None:
+                # A count per bucket and one for larger values, then sum and count
+                counts = values[key] = [0] * (len(buckets) + 3)
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+        registry.add(self.name, labels, apply)
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+
+requests_total = Counter("http_requests_total", "Requests handled.", ("handler", "method", "status"))
+errors_total = Counter("http_request_errors_total", "Requests answered with a 4xx or 5xx status.", ("handler", "status"))
+request_duration = Histogram("http_request_duration_seconds", "Time to answer a request.", ("handler", "method"))
+response_size = Histogram("http_response_size_bytes", "Size of response bodies.", ("handler",), buckets=SIZE_BUCKETS)
+db_duration = Histogram("db_query_duration_seconds", "Time a request spent in database queries.", ("handler",))
+auth_duration = Histogram("auth_duration_seconds", "Time to authenticate a request.", ("backend", "outcome"), buckets=FAST_BUCKETS)
+cache_duration = Histogram("cache_duration_seconds", "Time of cache lookups.", ("cache", "result"), buckets=FAST_BUCKETS)
+
+
+def write_values(path, values):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump([[name, list(labels), value] for (name, labels), value in values.items()], file)
+    os.replace(temporary, path)
+
+
+def read_values(path):
+    try:
+        with open(path) as file:
+            return {(name, tuple(labels)): value for name, labels, value in json.load(file)}
+    except (OSError, ValueError):
+        return {}
+
+
+def merge(totals, values):
+    for key, value in values.items():
+        if key not in totals:
+            totals[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            totals[key] = [total + item for total, item in zip(totals[key], value)]
+        else:
+            totals[key] += value
+
+
+@contextlib.contextmanager
+def directory_lock():
+    with open(os.path.join(settings.METRICS_DIR, ".lock"), "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def archive_exited_workers():
+    """
+    Merge the files of exited processes into the archive file. Call with
+    ``directory_lock()`` held.
+    """
+    exited = [
+        name for name in os.listdir(settings.METRICS_DIR)
+        if name.endswith(".json") and name.split("-")[0].isdigit() and not process_exists(int(name.split("-")[0]))
+    ]
+    if not exited:
+        return
+    archive = os.path.join(settings.METRICS_DIR, ARCHIVE)
+    totals = read_values(archive)
+    for name in exited:
+        merge(totals, read_values(os.path.join(settings.METRICS_DIR, name)))
+    write_values(archive, totals)
+    for name in exited:
+        os.remove(os.path.join(settings.METRICS_DIR, name))
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def exposition(values):
+    """
+    ``values`` in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in registry.metrics.values():
+        series = sorted((labels, value) for (name, labels), value in values.items() if name == metric.name)
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for labels, value in series:
+            if metric.kind == "counter":
+                lines.append(f"{metric.name}{format_labels(metric.labelnames, labels)} {format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, value):
+                cumulative += count
+                lines.append(f"{metric.name}_bucket{format_labels(metric.labelnames, labels, [('le', format_number(float(bound)))])} {cumulative}")
+            lines.append(f"{metric.name}_bucket{format_labels(metric.labelnames, labels, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{metric.name}_sum{format_labels(metric.labelnames, labels)} {format_number(value[-2])}")
+            lines.append(f"{metric.name}_count{format_labels(metric.labelnames, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def handler_name(request):
+    """
+    ``ViewSet.action`` for viewsets, the URL name or view function otherwise,
+    and ``unmatched`` for requests no URL matched, so paths never become labels.
+    Methods no action is routed for are ``ViewSet.<method>``, or ``ViewSet.other``
+    outside ``METHODS``.
+    """
+    view, action = instrumentation.resolve_view(request)
+    if view is not None:
+        if action == request.method.lower() and request.method not in METHODS:
+            action = "other"
+        return f"{view.__name__}.{action}"
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.url_name or match._func_path
+
+
+def method_name(request):
+    return request.method if request.method in METHODS else "other"
+
+
+def metrics_view(request):
+    """
+    Every metric in the text exposition format. With ``METRICS_TOKEN`` set,
+    requests must send it as a bearer token; without one, only clients in
+    ``INTERNAL_IPS`` are answered.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not secrets.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), expected):
+            return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+    elif request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        return HttpResponse(status=403)
+    return HttpResponse(exposition(registry.collect()), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """
+    Record the request metrics. Shares the query recorder of
+    ``QueryInstrumentationMiddleware`` when it runs before this one.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Checked once; inspecting the function on every request costs more than the metrics
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with self.queries() as recorder:
+            response = self.get_response(request)
+        self.record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with self.queries() as recorder:
+            response = await self.get_response(request)
+        self.record(request, response, recorder, time.perf_counter() - started)
+        return response
+
+    def queries(self):
+        recorder = instrumentation.current_recorder()
+        return contextlib.nullcontext(recorder) if recorder is not None else instrumentation.record_queries()
+
+    def record(self, request, response, recorder, duration):
+        handler = handler_name(request)
+        method = method_name(request)
+        status = str(response.status_code)
+        requests_total.inc(handler, method, status)
+        if response.status_code >= 400:
+            errors_total.inc(handler, status)
+        request_duration.observe(duration, handler, method)
+        db_duration.observe(recorder.duration, handler)
+        if not response.streaming:
+            response_size.observe(len(response.content), handler)
+        elif response.has_header("Content-Length"):
+            response_size.observe(int(response["Content-Length"]), handler)
@@ -0,0 +1,228 @@
+"""
+Content-negotiated response compression and rate limit headers.
+
+``CompressionMiddleware`` picks the best encoding the client accepts, Brotli
+when the ``brotli`` package is installed and gzip otherwise, and compresses
+text-like responses of at least ``COMPRESSION_MIN_SIZE`` bytes. Streaming
+responses are compressed chunk by chunk as they are sent. Partial content,
+already encoded bodies and file bodies handed to the web server
+(``MEDIA_OFFLOAD_HEADER``) are left alone.
+
+``RateLimitHeadersMiddleware`` reports the request's most restrictive
+throttle bucket, see api/throttling.py. ``ReplicaRoutingMiddleware`` lets
+safe requests read from the replicas, see api/routers.py.
+
+All three support sync and async requests, so ASGI deployments do not switch to a
+thread for them (see api/asyncviews.py).
+"""
+import math
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from . import routers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Media types worth compressing; images, video and archives already are
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.oai.openapi",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def accepted_encodings(header):
+    """
+    ``{encoding: q}`` for the codings of an ``Accept-Encoding`` header.
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """
+    The coding to use for a request's ``Accept-Encoding``, or None.
+    """
+    accepted = accepted_encodings(header)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [
+        (accepted.get(coding, accepted.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(available)
+    ]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+def brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def brotli_async_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    async for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def gzip_async_sequence(sequence, max_random_bytes):
+    async for chunk in sequence:
+        yield compress_string(chunk, max_random_bytes=max_random_bytes)
+
+
+class HybridMiddleware:
+    """
+    Base class of middleware that post-processes responses in
+    ``process_response()``, in sync and async mode alike.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        raise NotImplementedError
+
+
+class CompressionMiddleware(HybridMiddleware):
+    # Random filename padding in gzip headers against BREACH, as in GZipMiddleware
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if not self.compressible(response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                if encoding == "br":
+                    response.streaming_content = brotli_async_sequence(response.streaming_content, settings.COMPRESSION_BROTLI_QUALITY)
+                else:
+                    response.streaming_content = gzip_async_sequence(response.streaming_content, self.max_random_bytes)
+            elif encoding == "br":
+                response.streaming_content = brotli_sequence(response.streaming_content, settings.COMPRESSION_BROTLI_QUALITY)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, max_random_bytes=self.max_random_bytes)
+            # The compressed size is unknown until the last chunk
+            del response.headers["Content-Length"]
+        else:
+            if encoding == "br":
+                compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The compressed body differs byte for byte, so a strong ETag becomes weak
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def compressible(self, response):
+        if response.status_code == 206 or response.has_header("Content-Encoding") or response.has_header("Content-Range"):
+            return False
+        if settings.MEDIA_OFFLOAD_HEADER and response.has_header(settings.MEDIA_OFFLOAD_HEADER):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if response.streaming:
+            # Streamed files still carry their size; small ones are not worth it
+            length = response.get("Content-Length")
+            return length is None or int(length) >= settings.COMPRESSION_MIN_SIZE
+        return len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+
+class RateLimitHeadersMiddleware(HybridMiddleware):
+    """
+    ``X-RateLimit-Limit``, ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset``
+    (seconds until the bucket is full) of the bucket with the fewest tokens left.
+    """
+    def process_response(self, request, response):
+        states = getattr(request, "rate_limits", None)
+        if states:
+            state = min(states, key=lambda state: (state.remaining, -state.reset))
+            response.headers["X-RateLimit-Limit"] = str(state.capacity)
+            response.headers["X-RateLimit-Remaining"] = str(state.remaining)
+            response.headers["X-RateLimit-Reset"] = str(math.ceil(state.reset))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of safe requests to the replicas, and pin clients to the
+    primary after their successful writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routers.replicas(routers.reads_from_replicas(request)):
+            response = self.get_response(request)
+        self.process_response(request, response)
+        return response
+
+    async def __acall__(self, request):
+        with routers.replicas(routers.reads_from_replicas(request)):
+            response = await self.get_response(request)
+        self.process_response(request, response)
+        return response
+
+    def process_response(self, request, response):
+        if settings.DATABASE_REPLICAS and request.method not in routers.SAFE_METHODS and response.status_code < 400:
+            routers.pin(request)
+
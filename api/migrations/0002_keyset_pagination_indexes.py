@@ -0,0 +1,54 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['created_at', 'id'], name='contact_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['created_at', 'id'], name='customuser_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(fields=['created_at', 'id'], name='education_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(fields=['created_at', 'id'], name='experience_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['created_at', 'id'], name='portfolio_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_at', 'id'], name='project_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['created_at', 'id'], name='skill_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sociallink',
+            index=models.Index(fields=['created_at', 'id'], name='sociallink_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['created_at', 'id'], name='template_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(fields=['created_at', 'id'], name='testimonial_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_keyset_pagination_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'created_at'], name='contact_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='contact_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('is_staff', False), ('is_superuser', False)), fields=['created_at', 'id'], name='customuser_live_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['portfolio', 'created_at'], name='education_live_portfolio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='education_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['portfolio', 'created_at'], name='experience_live_portfolio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='experience_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'created_at'], name='portfolio_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='portfolio_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['portfolio', 'created_at'], name='project_live_portfolio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='project_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['portfolio', 'created_at'], name='skill_live_portfolio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='skill_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sociallink',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'created_at'], name='sociallink_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sociallink',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='sociallink_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='template_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['user', 'created_at'], name='testimonial_live_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_at', 'id'], name='testimonial_live_created_idx'),
+        ),
+    ]
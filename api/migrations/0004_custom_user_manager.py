@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:17
+
+import api.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_active_row_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', api.models.CustomUserManager()),
+            ],
+        ),
+    ]
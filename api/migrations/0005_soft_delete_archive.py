@@ -0,0 +1,183 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:18
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_custom_user_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('user_id', models.UUIDField(db_index=True)),
+                ('name', models.CharField(max_length=255)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=255)),
+                ('additional_phone', models.CharField(blank=True, max_length=255, null=True)),
+                ('address', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_contact_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='EducationArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('portfolio_id', models.UUIDField(db_index=True)),
+                ('degree', models.CharField(max_length=255)),
+                ('institution', models.CharField(max_length=255)),
+                ('location', models.CharField(blank=True, max_length=255, null=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('is_current', models.BooleanField(default=False)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_education_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExperienceArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('portfolio_id', models.UUIDField(db_index=True)),
+                ('job_title', models.CharField(max_length=255)),
+                ('company_name', models.CharField(max_length=255)),
+                ('location', models.CharField(blank=True, max_length=255, null=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('is_current', models.BooleanField(default=False)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_experience_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('portfolio_id', models.UUIDField(db_index=True)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('tech_stack', models.CharField(blank=True, max_length=255, null=True)),
+                ('role', models.CharField(blank=True, max_length=255, null=True)),
+                ('github_url', models.URLField(blank=True, null=True)),
+                ('live_demo_url', models.URLField(blank=True, null=True)),
+                ('image', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_project_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='SkillArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('portfolio_id', models.UUIDField(db_index=True)),
+                ('name', models.CharField(max_length=100)),
+                ('proficiency', models.CharField(choices=[('Beginner', 'Beginner'), ('Intermediate', 'Intermediate'), ('Advanced', 'Advanced'), ('Expert', 'Expert')], max_length=50)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_skill_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='SocialLinkArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('url', models.URLField()),
+                ('user_id', models.UUIDField(db_index=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_sociallink_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='TestimonialArchive',
+            fields=[
+                ('archived_at', models.DateTimeField(db_index=True)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('user_id', models.UUIDField(db_index=True)),
+                ('author_name', models.CharField(max_length=255)),
+                ('author_position', models.CharField(blank=True, max_length=255, null=True)),
+                ('author_company', models.CharField(blank=True, max_length=255, null=True)),
+                ('author_photo', models.CharField(blank=True, max_length=100, null=True)),
+                ('testimonial_text', models.TextField()),
+                ('author_linkedin', models.URLField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'api_testimonial_archive',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='contact_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='education',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='education_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='experience_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='project_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='skill_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sociallink',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='sociallink_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimonial',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='testimonial_trash_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COLUMNS = ("title", "bio", "projects", "experiences", "educations", "skills")
+
+SQLITE_INDEX = [
+    # External-content FTS5 table over api_searchdocument, kept in sync by triggers.
+    # The prefix indexes serve the prefix match on the last word of a query.
+    "CREATE VIRTUAL TABLE api_searchdocument_fts USING fts5({columns}, content='api_searchdocument', "
+    "content_rowid='rowid', tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER api_searchdocument_ai AFTER INSERT ON api_searchdocument BEGIN "
+    "INSERT INTO api_searchdocument_fts(rowid, {columns}) VALUES (new.rowid, {new}); END",
+    "CREATE TRIGGER api_searchdocument_ad AFTER DELETE ON api_searchdocument BEGIN "
+    "INSERT INTO api_searchdocument_fts(api_searchdocument_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old}); END",
+    "CREATE TRIGGER api_searchdocument_au AFTER UPDATE ON api_searchdocument BEGIN "
+    "INSERT INTO api_searchdocument_fts(api_searchdocument_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old}); "
+    "INSERT INTO api_searchdocument_fts(rowid, {columns}) VALUES (new.rowid, {new}); END",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS api_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS api_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS api_searchdocument_au",
+    "DROP TABLE IF EXISTS api_searchdocument_fts",
+]
+
+# Weights A-D, matching the bm25() weights in api/search.py
+POSTGRESQL_INDEX = [
+    "ALTER TABLE api_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', title), 'A') || "
+    "setweight(to_tsvector('english', skills), 'B') || "
+    "setweight(to_tsvector('english', experiences), 'B') || "
+    "setweight(to_tsvector('english', projects), 'C') || "
+    "setweight(to_tsvector('english', educations), 'C') || "
+    "setweight(to_tsvector('english', bio), 'D')) STORED",
+    "CREATE INDEX api_searchdocument_vector_idx ON api_searchdocument USING GIN (search_vector)",
+]
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS api_searchdocument_vector_idx",
+    "ALTER TABLE api_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(sqlite, postgresql):
+    def run(apps, schema_editor):
+        statements = {"sqlite": sqlite, "postgresql": postgresql}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement.format(
+                columns=", ".join(COLUMNS),
+                new=", ".join(f"new.{column}" for column in COLUMNS),
+                old=", ".join(f"old.{column}" for column in COLUMNS),
+            ))
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_content_addressed_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('portfolio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='api.portfolio')),
+                ('title', models.TextField(blank=True, default='')),
+                ('bio', models.TextField(blank=True, default='')),
+                ('projects', models.TextField(blank=True, default='')),
+                ('experiences', models.TextField(blank=True, default='')),
+                ('educations', models.TextField(blank=True, default='')),
+                ('skills', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Other backends fall back to unindexed lookups in api/search.py
+        migrations.RunPython(
+            run_for_vendor(SQLITE_INDEX, POSTGRESQL_INDEX),
+            run_for_vendor(SQLITE_DROP, POSTGRESQL_DROP),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:40
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_project_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillStat',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('skill', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+                ('proficiency', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('count__gt', 0)), fields=['-count'], name='skillstat_popular_idx')],
+                'constraints': [models.UniqueConstraint(fields=('skill', 'proficiency'), name='skillstat_skill_proficiency_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 12:54
+
+import uuid
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def add_totals(apps, schema_editor):
+    """
+    One total row (empty proficiency) per skill of the existing counters.
+    """
+    SkillStat = apps.get_model("api", "SkillStat")
+    rows = SkillStat.objects.exclude(proficiency="").values("skill").annotate(total=Sum("count")).order_by()
+    names = dict(SkillStat.objects.exclude(proficiency="").values_list("skill", "name"))
+    SkillStat.objects.bulk_create([
+        SkillStat(id=uuid.uuid4(), skill=row["skill"], name=names[row["skill"]], proficiency="", count=row["total"])
+        for row in rows
+    ])
+
+
+def remove_totals(apps, schema_editor):
+    apps.get_model("api", "SkillStat").objects.filter(proficiency="").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_request_profiles'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='skillstat',
+            name='skillstat_popular_idx',
+        ),
+        migrations.AddIndex(
+            model_name='skillstat',
+            index=models.Index(condition=models.Q(('count__gt', 0)), fields=['proficiency', '-count', 'skill'], name='skillstat_popular_idx'),
+        ),
+        migrations.RunPython(add_totals, remove_totals),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:01
+
+import os
+
+from django.db import migrations, models
+
+
+def record_existing(apps, schema_editor):
+    """
+    Record the derivatives already rendered for the stored images.
+    """
+    from api import images
+
+    for label, field_names in images.IMAGE_FIELDS.items():
+        model = apps.get_model(label)
+        for field_name in field_names:
+            storage = model._meta.get_field(field_name).storage
+            rows = model._base_manager.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+            for pk, name in rows.values_list("pk", field_name).iterator():
+                try:
+                    targets = images.derivative_targets(storage, name)
+                except NotImplementedError:
+                    return
+                variants = images.written_variants(name, targets, [path for _, _, path in targets if os.path.exists(path)])
+                if variants:
+                    model._base_manager.filter(pk=pk).update(**{images.variants_field(field_name): variants})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_skill_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='projectarchive',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='preview_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='testimonial',
+            name='author_photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='testimonialarchive',
+            name='author_photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(record_existing, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,15 @@
-from datetime import datetime
+import os
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent once per table after a set-based soft delete or restore, with the affected ``pks``
+soft_deleted = Signal()
+restored = Signal()
+
 
 class DeletedQuerySet(models.QuerySet):
     def active(self):
@@ -11,6 +18,87 @@ class DeletedQuerySet(models.QuerySet):
     def deleted(self):
         return self.filter(is_deleted=True)
 
+    def soft_delete(self, deleted_at=None):
+        """
+        Soft delete every active row in the queryset with a single UPDATE per table.
+        Rows reachable through the model's ``soft_delete_cascade`` related names are
+        soft-deleted in the same transaction with the same ``deleted_at`` stamp.
+        Returns the number of rows soft-deleted in this table.
+        """
+        with transaction.atomic(using=self.db):
+            return self._soft_delete(deleted_at or timezone.now())
+
+    def restore(self):
+        """
+        Restore every soft-deleted row in the queryset with a single UPDATE per table.
+        Cascaded rows are restored only if they carry their parent's ``deleted_at``
+        stamp, so rows deleted on their own beforehand stay deleted.
+        Returns the number of rows restored in this table.
+        """
+        with transaction.atomic(using=self.db):
+            return self._restore()
+
+    def hard_purge(self):
+        """
+        Permanently delete the soft-deleted rows in the queryset, and their
+        database-level cascades. Returns the same tuple as ``QuerySet.delete()``.
+        """
+        return models.QuerySet.delete(self.deleted())
+
+    # Like delete(), these must be called on an explicit queryset, never on the manager
+    soft_delete.queryset_only = True
+    restore.queryset_only = True
+    hard_purge.queryset_only = True
+
+    def _cascade_relations(self):
+        for related_name in getattr(self.model, "soft_delete_cascade", ()):
+            relation = self.model._meta.get_field(related_name)
+            yield relation.related_model, relation.field.name
+
+    def _soft_delete(self, stamp):
+        pks = list(self.active().values_list("pk", flat=True))
+        if not pks:
+            return 0
+        for related_model, field_name in self._cascade_relations():
+            related_model.objects.filter(**{f"{field_name}__in": pks})._soft_delete(stamp)
+        count = self.model._base_manager.using(self.db).filter(pk__in=pks).update(is_deleted=True, deleted_at=stamp)
+        soft_deleted.send(sender=self.model, pks=pks, using=self.db)
+        return count
+
+    def _restore(self):
+        pks = list(self.deleted().values_list("pk", flat=True))
+        if not pks:
+            return 0
+        # Children first: they are matched against the parent's stamp before it is cleared
+        for related_model, field_name in self._cascade_relations():
+            same_stamp = self.model._base_manager.using(self.db).filter(
+                pk=models.OuterRef(field_name), pk__in=pks, deleted_at=models.OuterRef("deleted_at"),
+            )
+            related_model.objects.filter(models.Exists(same_stamp))._restore()
+        count = self.model._base_manager.using(self.db).filter(pk__in=pks).update(is_deleted=False, deleted_at=None)
+        restored.send(sender=self.model, pks=pks, using=self.db)
+        return count
+
+
+class CustomUserManager(UserManager.from_queryset(DeletedQuerySet)):
+    pass
+
+
+class PortfolioQuerySet(DeletedQuerySet):
+    def with_document(self):
+        """
+        Load a portfolio together with its template and every active child
+        collection in a fixed number of queries, whatever the number of rows.
+        """
+        return self.select_related("template", "user").prefetch_related(
+            models.Prefetch("projects", queryset=Project.objects.active().prefetch_related("tags").order_by("created_at"), to_attr="active_projects"),
+            models.Prefetch("skills", queryset=Skill.objects.active().order_by("created_at"), to_attr="active_skills"),
+            models.Prefetch("experiences", queryset=Experience.objects.active().order_by("created_at"), to_attr="active_experiences"),
+            models.Prefetch("educations", queryset=Education.objects.active().order_by("created_at"), to_attr="active_educations"),
+            models.Prefetch("user__testimonials", queryset=Testimonial.objects.active().order_by("created_at"), to_attr="active_testimonials"),
+            models.Prefetch("user__contacts", queryset=Contact.objects.active().order_by("created_at"), to_attr="active_contacts"),
+            models.Prefetch("user__social_links", queryset=SocialLink.objects.active().order_by("created_at"), to_attr="active_social_links"),
+        )
 
 
 class CustomUser(AbstractUser):
@@ -22,21 +110,34 @@ class CustomUser(AbstractUser):
     deleted_at = models.DateTimeField(null=True, blank=True)  # Timestamp for soft delete
     is_deleted = models.BooleanField(default=False)  # Soft delete status
 
+    objects = CustomUserManager()
+
+    # Related names soft-deleted and restored together with the user
+    soft_delete_cascade = ("portfolios", "testimonials", "contacts", "social_links")
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="customuser_created_at_id_idx"),
+            # Non-staff user listing in UserViewSet
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False, is_staff=False, is_superuser=False), name="customuser_live_public_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of deleting the user, mark them as deleted.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
 
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted user by clearing the deleted_at timestamp and setting is_deleted to False.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
 
     def __str__(self):
         return self.username
@@ -46,6 +147,7 @@ class Template(models.Model):
     name = models.CharField(max_length=255)  # Name of the template
     description = models.TextField(null=True, blank=True)  # Short description of the template
     preview_image = models.ImageField(upload_to='templates/', null=True, blank=True)  # Preview image of the React template
+    preview_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Rendered derivatives of preview_image, see api/images.py
     demo_url = models.URLField(null=True, blank=True)  # Link to a live demo of the React template (Netlify, Vercel, etc.)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -54,21 +156,29 @@ class Template(models.Model):
 
     objects = DeletedQuerySet().as_manager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="template_created_at_id_idx"),
+            # Lookups of rows that are not soft-deleted
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="template_live_created_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of removing the template, set is_deleted to True and mark deleted_at timestamp.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
 
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted template by setting is_deleted to False and clearing the deleted_at timestamp.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
 
     def __str__(self):
         return self.name
@@ -80,44 +190,72 @@ class Portfolio(models.Model):
     title = models.CharField(max_length=255)  # Portfolio title (e.g., "John Doe's Developer Portfolio")
     bio = models.TextField(null=True, blank=True)  # Short bio or professional summary
     profile_image = models.ImageField(upload_to='portfolio/images/', null=True, blank=True)  # Profile image or avatar
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Rendered derivatives of profile_image, see api/images.py
     resume = models.FileField(upload_to='portfolio/resumes/', null=True, blank=True)  # Resume upload field (optional)
     created_at = models.DateTimeField(auto_now_add=True)  # Portfolio creation date
     updated_at = models.DateTimeField(auto_now=True)  # Portfolio last update date
     deleted_at = models.DateTimeField(null=True, blank=True)  # Soft delete timestamp
     is_deleted = models.BooleanField(default=False)  # Soft delete flag
 
-    objects = DeletedQuerySet().as_manager()
+    objects = PortfolioQuerySet().as_manager()
+
+    # Related names soft-deleted and restored together with the portfolio
+    soft_delete_cascade = ("projects", "skills", "experiences", "educations")
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="portfolio_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["user", "created_at"], condition=models.Q(is_deleted=False), name="portfolio_live_user_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="portfolio_live_created_idx"),
+        ]
 
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of removing the portfolio, set is_deleted to True and mark deleted_at timestamp.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
 
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted portfolio by setting is_deleted to False and clearing the deleted_at timestamp.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
 
     def __str__(self):
         return f"{self.user.username}'s Portfolio"
 
 
+class Tag(models.Model):
+    """
+    A normalized technology parsed from ``Project.tech_stack``, see api/tags.py.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    slug = models.CharField(max_length=100, unique=True)  # Normalized name used for filtering (e.g., "react", "node.js")
+    name = models.CharField(max_length=100)  # Name as first written (e.g., "React")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Project(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     portfolio = models.ForeignKey('Portfolio', on_delete=models.CASCADE, related_name='projects')  # Link to Portfolio
     name = models.CharField(max_length=255)  # Name of the project
     description = models.TextField()  # Detailed description of the project
     tech_stack = models.CharField(max_length=255, null=True, blank=True)  # Technologies used (e.g., React, Django)
+    tags = models.ManyToManyField(Tag, related_name="projects", blank=True, editable=False)  # Parsed from tech_stack on save
     role = models.CharField(max_length=255, null=True, blank=True)  # User's role in the project (e.g., Frontend, Backend)
     github_url = models.URLField(null=True, blank=True)  # GitHub repository URL for the project
     live_demo_url = models.URLField(null=True, blank=True)  # Live demo URL (if applicable)
     image = models.ImageField(upload_to='portfolio/projects/', null=True, blank=True)  # Optional image or screenshot of the project
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Rendered derivatives of image, see api/images.py
     created_at = models.DateTimeField(auto_now_add=True)  # Project creation date
     updated_at = models.DateTimeField(auto_now=True)  # Last update date
     deleted_at = models.DateTimeField(null=True, blank=True)  # Soft delete timestamp
@@ -125,21 +263,32 @@ class Project(models.Model):
 
     objects = DeletedQuerySet().as_manager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="project_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["portfolio", "created_at"], condition=models.Q(is_deleted=False), name="project_live_portfolio_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="project_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="project_trash_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of removing the project, set is_deleted to True and mark deleted_at timestamp.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
 
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted project by setting is_deleted to False and clearing the deleted_at timestamp.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
 
     def __str__(self):
         return self.name
@@ -161,21 +310,39 @@ class Skill(models.Model):
 
     objects = DeletedQuerySet().as_manager()
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="skill_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["portfolio", "created_at"], condition=models.Q(is_deleted=False), name="skill_live_portfolio_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="skill_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="skill_trash_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The rollup receivers in api/signals.py read the stored row before the save
+        # and count the difference after it: both run in this transaction, with the
+        # row locked, so concurrent edits cannot count the same change twice
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of removing the skill, set is_deleted to True and mark deleted_at timestamp.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
     
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted skill by setting is_deleted to False and clearing the deleted_at timestamp.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
     
     def __str__(self):
         return self.name
@@ -199,21 +366,32 @@ class Experience(models.Model):
 
     objects = DeletedQuerySet().as_manager()
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="experience_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["portfolio", "created_at"], condition=models.Q(is_deleted=False), name="experience_live_portfolio_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="experience_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="experience_trash_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of removing the experience, set is_deleted to True and mark deleted_at timestamp.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
     
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted experience by setting is_deleted to False and clearing the deleted_at timestamp.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
     
     def __str__(self):
         return self.job_title
@@ -237,21 +415,32 @@ class Education(models.Model):
     
     objects = DeletedQuerySet().as_manager()
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="education_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["portfolio", "created_at"], condition=models.Q(is_deleted=False), name="education_live_portfolio_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="education_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="education_trash_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: Instead of removing the education, set is_deleted to True and mark deleted_at timestamp.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
     
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted education by setting is_deleted to False and clearing the deleted_at timestamp.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
     
     def __str__(self):
         return self.degree
@@ -265,6 +454,7 @@ class Testimonial(models.Model):
     author_position = models.CharField(max_length=255, null=True, blank=True)
     author_company = models.CharField(max_length=255, null=True, blank=True)
     author_photo = models.ImageField(upload_to='testimonials/', null=True, blank=True)
+    author_photo_variants = models.JSONField(default=dict, blank=True, editable=False)  # Rendered derivatives of author_photo, see api/images.py
     testimonial_text = models.TextField()
     author_linkedin = models.URLField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -274,24 +464,35 @@ class Testimonial(models.Model):
 
     objects = DeletedQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="testimonial_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["user", "created_at"], condition=models.Q(is_deleted=False), name="testimonial_live_user_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="testimonial_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="testimonial_trash_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: instead of removing the record from the database,
         mark it as deleted by setting the 'is_deleted' field to True and
         recording the timestamp in 'deleted_at'.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
 
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted testimonial by setting 'is_deleted' to False
         and clearing 'deleted_at'.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
 
     def __str__(self):
         return f"{self.author_name} - {self.user.username}"
@@ -311,24 +512,35 @@ class Contact(models.Model):
 
     objects = DeletedQuerySet.as_manager()
     
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="contact_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["user", "created_at"], condition=models.Q(is_deleted=False), name="contact_live_user_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="contact_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="contact_trash_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: instead of removing the record from the database,
         mark it as deleted by setting the 'is_deleted' field to True and
         recording the timestamp in 'deleted_at'.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
     
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted contact by setting 'is_deleted' to False
         and clearing 'deleted_at'.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
     
     def __str__(self):
         return f"{self.name} - {self.user.username}"
@@ -345,24 +557,231 @@ class SocialLink(models.Model):
 
     objects = DeletedQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order, see api/pagination.py
+            models.Index(fields=["created_at", "id"], name="sociallink_created_at_id_idx"),
+            # Owner-scoped lookups of rows that are not soft-deleted
+            models.Index(fields=["user", "created_at"], condition=models.Q(is_deleted=False), name="sociallink_live_user_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_deleted=False), name="sociallink_live_created_idx"),
+            # Soft-deleted rows in deletion order, for the archival job in api/archive.py
+            models.Index(fields=["deleted_at", "id"], condition=models.Q(is_deleted=True), name="sociallink_trash_idx"),
+        ]
+
     def delete(self, *args, **kwargs):
         """
         Soft delete: instead of removing the record from the database,
         mark it as deleted by setting the 'is_deleted' field to True and
         recording the timestamp in 'deleted_at'.
         """
+        self.deleted_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).soft_delete(deleted_at=self.deleted_at)
         self.is_deleted = True
-        self.deleted_at = datetime.now()
-        self.save()
 
     def restore(self, *args, **kwargs):
         """
         Restore a soft-deleted social link by setting 'is_deleted' to False
         and clearing 'deleted_at'.
         """
+        type(self).objects.filter(pk=self.pk).restore()
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
     
     def __str__(self):
-        return f"{self.name} - {self.user.username}"
\ No newline at end of file
+        return f"{self.name} - {self.user.username}"
+
+
+def archive_model(model):
+    """
+    Build the archive table for ``model``: the same columns with foreign keys kept
+    as plain ids (the parent row may be gone), file fields as stored names, no
+    auto timestamps, plus ``archived_at``.
+    """
+    attrs = {
+        "__module__": __name__,
+        "archived_at": models.DateTimeField(db_index=True),
+        "Meta": type("Meta", (), {"db_table": f"{model._meta.db_table}_archive"}),
+    }
+    for field in model._meta.concrete_fields:
+        if field.is_relation:
+            attrs[field.attname] = models.UUIDField(db_index=True)
+        elif isinstance(field, models.FileField):
+            attrs[field.name] = models.CharField(max_length=field.max_length, null=True, blank=True)
+        else:
+            _, _, args, kwargs = field.deconstruct()
+            kwargs.pop("auto_now", None)
+            kwargs.pop("auto_now_add", None)
+            attrs[field.name] = field.__class__(*args, **kwargs)
+    return type(f"{model.__name__}Archive", (models.Model,), attrs)
+
+
+# Archive tables for soft-deleted rows past their retention period, see api/archive.py
+ProjectArchive = archive_model(Project)
+SkillArchive = archive_model(Skill)
+ExperienceArchive = archive_model(Experience)
+EducationArchive = archive_model(Education)
+TestimonialArchive = archive_model(Testimonial)
+ContactArchive = archive_model(Contact)
+SocialLinkArchive = archive_model(SocialLink)
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work, queued with ``api.jobs.enqueue()`` and run by ``manage.py runworker``.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.CharField(max_length=255)  # Dotted path of the function to call
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)  # Attempts started so far
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # Not claimed before this time (retry backoff)
+    locked_by = models.CharField(max_length=255, null=True, blank=True)  # Worker that claimed the job
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim order of runnable jobs
+            models.Index(fields=["run_after", "created_at"], condition=models.Q(status="queued"), name="job_ready_idx"),
+            # Stale claims of crashed workers
+            models.Index(fields=["locked_at"], condition=models.Q(status="running"), name="job_running_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class Blob(models.Model):
+    """
+    A file kept by ``api.storage.ContentAddressedStorage``, shared by every row
+    that uploaded the same content. ``refcount`` is maintained by ``api.blobs``.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255, unique=True)  # Storage name, blobs/<aa>/<sha256><ext>
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)  # Live and archived rows referencing the blob
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)  # Last upload of this content
+
+    class Meta:
+        indexes = [
+            # Garbage collection candidates
+            models.Index(fields=["last_used_at"], condition=models.Q(refcount__lte=0), name="blob_unreferenced_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of one active portfolio, rebuilt by ``api.search.reindex()``.
+
+    The full-text index itself lives outside the ORM, see migration
+    0008_search_document: an FTS5 table kept in sync by triggers on SQLite, a
+    generated ``tsvector`` column with a GIN index on PostgreSQL.
+    """
+    portfolio = models.OneToOneField(Portfolio, on_delete=models.CASCADE, primary_key=True, related_name="search_document")
+    title = models.TextField(blank=True, default="")  # Portfolio title
+    bio = models.TextField(blank=True, default="")  # Portfolio bio
+    projects = models.TextField(blank=True, default="")  # Project names, descriptions, tech stacks and roles
+    experiences = models.TextField(blank=True, default="")  # Job titles, companies, locations and descriptions
+    educations = models.TextField(blank=True, default="")  # Degrees and institutions
+    skills = models.TextField(blank=True, default="")  # Skill names
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
+class SkillStat(models.Model):
+    """
+    Number of active skills per normalized skill name and proficiency, and in
+    total per skill (empty proficiency), kept up to date by ``api.rollups`` so
+    that popularity needs no GROUP BY over ``Skill``.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    skill = models.CharField(max_length=100)  # Normalized name, see api.tags.normalize
+    name = models.CharField(max_length=100)  # Name as first written (e.g., "Python")
+    proficiency = models.CharField(max_length=50)  # Empty for the skill's total
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["skill", "proficiency"], name="skillstat_skill_proficiency_uniq"),
+        ]
+        indexes = [
+            # Most popular skills first, from their total rows (proficiency "")
+            models.Index(fields=["proficiency", "-count", "skill"], condition=models.Q(count__gt=0), name="skillstat_popular_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.proficiency or 'total'}): {self.count}"
+
+
+class ThrottleBucket(models.Model):
+    """
+    Token bucket of one throttle key, shared by every worker process when
+    ``THROTTLE_BACKEND`` is ``database``. Times are Unix timestamps in seconds,
+    so the refill can be computed inside a single UPDATE, see api/throttling.py.
+    """
+    key = models.CharField(max_length=255, primary_key=True)  # e.g. "user:<uuid>" or "ip:203.0.113.7"
+    tokens = models.FloatField()  # Tokens left at updated_at
+    updated_at = models.FloatField()
+    full_at = models.FloatField(db_index=True)  # When the bucket is full again; rows past it can be purged
+
+    def __str__(self):
+        return self.key
+
+
+class RequestProfile(models.Model):
+    """
+    Sampled call stacks of one request, see api/profiling.py. The stacks are in
+    ``PROFILE_DIR``/``file`` in the folded format.
+    """
+    REQUESTED = "requested"
+    SAMPLED = "sampled"
+    TRIGGER_CHOICES = [
+        (REQUESTED, "Requested by staff"),
+        (SAMPLED, "Random sample"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)  # Including the query string
+    handler = models.CharField(max_length=255, db_index=True)  # e.g. "ProjectViewSet.list"
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    samples = models.PositiveIntegerField()  # Stacks recorded, one per PROFILE_INTERVAL
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    file = models.CharField(max_length=255)  # Name in PROFILE_DIR
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms} ms)"
+
+    @property
+    def path_on_disk(self):
+        return os.path.join(settings.PROFILE_DIR, self.file)
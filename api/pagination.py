@@ -0,0 +1,206 @@
+from datetime import datetime
+from uuid import UUID
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, Cursor, CursorPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the unique ``(created_at, id)`` pair.
+
+    Every page is a single indexed range scan: the cursor holds the position of
+    the last (or first) row returned and the next page filters past it, so there
+    is no OFFSET and no COUNT(*) however deep the client pages.
+
+    Views may set ``max_page_size`` to override the cap on ``?page_size=``.
+    ``?count=true`` opts in to a ``count`` of the whole result set, which costs
+    one COUNT(*) query.
+    """
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        if self.wants_count(request):
+            self.count = queryset.count()
+        return self.set_page(list(page_queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset()`` for async views, querying with the async ORM.
+        """
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        if self.wants_count(request):
+            self.count = await queryset.acount()
+        return self.set_page([row async for row in page_queryset[:self.page_size + 1]])
+
+    def page_queryset(self, queryset, request, view):
+        """
+        Parse the request and return ``queryset`` from the cursor on, in page
+        order, or None when pagination is off.
+        """
+        self.request = request
+        self.max_page_size = getattr(view, "max_page_size", self.max_page_size)
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        self.position = self.cursor.position if self.cursor is not None else None
+        self.count = None
+
+        if self.position is not None:
+            queryset = queryset.filter(self.position_filter(*self.parse_position(self.position), self.reverse))
+        if self.reverse:
+            return queryset.order_by("created_at", "id")
+        return queryset.order_by(*self.ordering)
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, "").lower() in ("1", "true", "yes")
+
+    def set_page(self, results):
+        # One extra row was fetched to learn whether another page follows
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def position_filter(self, created_at, pk, reverse):
+        # Rows strictly after (created_at, id) in the requested direction
+        if reverse:
+            return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+    def parse_position(self, position):
+        try:
+            created_at, pk = position.split("|")
+            return datetime.fromisoformat(created_at), UUID(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            created_at, pk = instance["created_at"], instance["id"]
+        else:
+            created_at, pk = instance.created_at, instance.pk
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+        return f"{created_at}|{pk}"
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Paged backwards past the start; continue from the same position
+            return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.cursor.position))
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.cursor.position))
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
+        payload = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            payload["count"] = self.count
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {"type": "integer", "example": 123}
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            "name": self.count_query_param,
+            "required": False,
+            "in": "query",
+            "description": "Set to true to include the total number of results (runs a COUNT query).",
+            "schema": {"type": "boolean"},
+        })
+        return parameters
+
+
+class RankedPagination(BasePagination):
+    """
+    Page-number pagination for ranked search hits, which have no stable keyset.
+
+    The search backend is asked for one row more than the page size to learn
+    whether another page follows, so no COUNT(*) is run. Pages deeper than
+    ``max_page`` are refused: ranking has to score every match before the
+    offset, so deep pages get slower while nobody reads them.
+    """
+    page_size = 20
+    max_page_size = 50
+    max_page = 50
+    page_query_param = "page"
+    page_size_query_param = "page_size"
+
+    def paginate_hits(self, search, request):
+        """
+        Call ``search(limit, offset)`` for the requested page and return its hits.
+        """
+        self.request = request
+        try:
+            self.page_number = _positive_int(request.query_params.get(self.page_query_param, 1), strict=True)
+            self.page_size = _positive_int(
+                request.query_params.get(self.page_size_query_param, self.page_size), strict=True, cutoff=self.max_page_size,
+            )
+        except ValueError:
+            raise NotFound("Invalid page.")
+        if self.page_number > self.max_page:
+            raise NotFound("Invalid page.")
+        hits = search(self.page_size + 1, (self.page_number - 1) * self.page_size)
+        self.has_next = len(hits) > self.page_size and self.page_number < self.max_page
+        return hits[:self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
@@ -0,0 +1,219 @@
+"""
+On-demand sampling profiler for single requests.
+
+With ``PROFILING_ENABLED``, ``ProfilingMiddleware`` profiles a request when a
+staff user asks for it with an ``X-Profile`` header or a ``profile`` query
+parameter (session or JWT authenticated), or at random for a
+``PROFILE_SAMPLE_RATE`` fraction of all requests. Without it the middleware
+removes itself from the chain, so it costs nothing.
+
+While the request runs, a thread records the request thread's call stack every
+``PROFILE_INTERVAL`` seconds. The middleware sits last, so the stacks cover the
+whole DRF dispatch: authentication, permissions, ``get_queryset``,
+serialization and rendering. Under ASGI the handler hops between the event loop
+and ``sync_to_async`` threads, so every busy thread is recorded, including
+those of concurrent requests.
+
+Stacks are written to ``PROFILE_DIR`` in the folded format, one
+``frame;frame;frame count`` line per distinct stack, which speedscope,
+flamegraph.pl and inferno turn into flame graphs. Each profile gets a
+``RequestProfile`` row, listed in the admin, and the response an
+``X-Profile-Id`` header. ``manage.py purge_profiles`` deletes old ones.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import APIException
+
+from . import instrumentation, metrics
+from .authentication import CachedJWTAuthentication
+from .models import RequestProfile
+
+# Innermost frames of threads waiting for work, as (file name, function)
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"), ("base_events.py", "_run_once")}
+
+
+def frame_label(frame):
+    """
+    ``function (path:line)`` with ``path`` relative to the repository or to
+    ``site-packages``.
+    """
+    code = frame.f_code
+    path = code.co_filename
+    if "site-packages" in path:
+        path = path.rsplit("site-packages" + os.sep, 1)[-1]
+    elif path.startswith(str(settings.BASE_DIR)):
+        path = os.path.relpath(path, settings.BASE_DIR)
+    # Semicolons separate the frames of a folded stack
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+def fold(frame, root=None):
+    """
+    The folded stack of ``frame``, outermost first. Frames below the one
+    running ``root``'s code are left out.
+    """
+    labels = []
+    while frame is not None:
+        if frame.f_code is root:
+            break
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Count the call stacks of ``thread_ids`` (every busy thread when None)
+    every ``interval`` seconds, until ``stop()``.
+    """
+    def __init__(self, thread_ids=None, interval=0.001, root=None):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.root = root
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                if self.thread_ids is None and (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = fold(frame, self.root)
+                if stack:
+                    self.stacks[stack] += 1
+
+
+def hottest_functions(path, limit=15):
+    """
+    ``[(frame, own samples, total samples)]`` of the folded profile at
+    ``path``, for the frames with the most samples of their own.
+    """
+    own, total = Counter(), Counter()
+    with open(path) as file:
+        for line in file:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            frames = stack.split(";")
+            own[frames[-1]] += int(count)
+            for frame in set(frames):
+                total[frame] += int(count)
+    return [(frame, count, total[frame]) for frame, count in own.most_common(limit)]
+
+
+def requested(request):
+    return "HTTP_X_PROFILE" in request.META or "profile" in request.GET
+
+
+def staff_user(request):
+    """
+    The staff user of ``request``'s session or JWT, or None.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except APIException:
+            return None
+        user = result[0] if result else None
+    return user if user is not None and user.is_staff else None
+
+
+def write_profile(request, response, trigger, user, stacks, duration):
+    profile = RequestProfile(
+        method=request.method[:10],
+        path=request.get_full_path()[:2048],
+        handler=metrics.handler_name(request),
+        status=response.status_code,
+        duration_ms=round(duration * 1000, 2),
+        samples=sum(stacks.values()),
+        trigger=trigger,
+        user=user,
+    )
+    profile.file = f"{profile.created_at:%Y%m%d-%H%M%S}-{profile.pk}.folded"
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    with open(profile.path_on_disk, "w") as file:
+        file.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    # Recorded apart, so saving the profile does not count against the view's query budget
+    with instrumentation.record_queries():
+        profile.save()
+    return profile
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        user = staff_user(request) if requested(request) else None
+        trigger = self.trigger(user)
+        if trigger is None:
+            return self.get_response(request)
+
+        sampler = StackSampler({threading.get_ident()}, settings.PROFILE_INTERVAL, root=self.__call__.__code__).start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            stacks = sampler.stop()
+        profile = write_profile(request, response, trigger, user, stacks, duration)
+        response.headers["X-Profile-Id"] = str(profile.pk)
+        return response
+
+    async def __acall__(self, request):
+        user = await sync_to_async(staff_user)(request) if requested(request) else None
+        trigger = self.trigger(user)
+        if trigger is None:
+            return await self.get_response(request)
+
+        sampler = StackSampler(None, settings.PROFILE_INTERVAL).start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = time.perf_counter() - started
+            stacks = sampler.stop()
+        profile = await sync_to_async(write_profile)(request, response, trigger, user, stacks, duration)
+        response.headers["X-Profile-Id"] = str(profile.pk)
+        return response
+
+    def trigger(self, user):
+        """
+        Why the request is profiled, or None. ``user`` is the staff user who
+        asked for a profile, if any.
+        """
+        if user is not None:
+            return RequestProfile.REQUESTED
+        if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            return RequestProfile.SAMPLED
+        return None
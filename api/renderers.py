@@ -0,0 +1,44 @@
+"""
+JSON renderer backed by orjson, with the stdlib renderer as fallback.
+
+orjson encodes UUIDs, dates, datetimes and dataclasses natively, several times
+faster than ``json.dumps``. The output is the same as DRF's ``JSONRenderer``
+with ``COMPACT_JSON`` and ``UNICODE_JSON``: compact separators, UTF-8, UTC
+datetimes ending in ``Z`` and ``\\u2028``/``\\u2029`` escaped. Whatever orjson
+cannot encode natively (``Decimal``, lazy translations, querysets, ...) goes
+through DRF's ``JSONEncoder``. Two differences remain: NaN and infinity are
+rendered as ``null`` instead of being refused, and integers beyond 64 bits are
+refused.
+
+Without orjson installed, or for indented output (e.g. the browsable API),
+rendering falls back to the stdlib.
+"""
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b"\\u2028").replace(PARAGRAPH_SEPARATOR, b"\\u2029")
+        return ret
@@ -0,0 +1,145 @@
+"""
+Skill popularity rollups.
+
+``SkillStat`` holds one counter per normalized skill name and proficiency. The
+signal handlers in ``api/signals.py`` pass every change of an active skill to
+``apply_skill_deltas()`` inside the transaction that made it, so the counters
+move together with the rows: ``Skill.save()`` opens one around the save, whose
+handlers read the stored row with ``select_for_update()``, so two concurrent
+edits of a skill count their changes one after the other; soft deletes,
+restores and deletes already run in one. ``reconcile_skill_stats()``
+recomputes the counters from ``Skill`` and repairs any drift, e.g. from bulk
+``update()`` calls.
+
+Each skill also has a total row, with ``TOTAL`` as its proficiency, so the most
+used skills are the first rows of an index instead of a sum over all of them.
+"""
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Skill, SkillStat
+from .tags import normalize
+
+
+# Proficiency of the per-skill total rows
+TOTAL = ""
+
+
+def skill_key(name, proficiency):
+    return normalize(name or ""), proficiency
+
+
+def _increment(keys, now):
+    # One UPDATE for any number of keys
+    deltas = [When(skill=skill, proficiency=proficiency, then=Value(delta)) for (skill, proficiency), delta in keys.items()]
+    match = Q(*[Q(skill=skill, proficiency=proficiency) for skill, proficiency in keys], _connector=Q.OR)
+    return SkillStat.objects.filter(match).update(count=F("count") + Case(*deltas, default=Value(0)), updated_at=now)
+
+
+def with_totals(deltas):
+    """
+    ``deltas`` plus the change of each skill's total.
+    """
+    totals = Counter(deltas)
+    for (skill, proficiency), delta in deltas.items():
+        totals[skill, TOTAL] += delta
+    return totals
+
+
+def apply_skill_deltas(deltas, names=None):
+    """
+    Add ``deltas`` (a mapping of ``(skill, proficiency)`` keys to counts) to the
+    rollup and to the skills' totals. ``names`` gives display names for keys
+    seen for the first time.
+    """
+    keys = {key: delta for key, delta in with_totals(deltas).items() if delta and key[0]}
+    if not keys:
+        return
+    names = names or {}
+    now = timezone.now()
+    if _increment(keys, now) == len(keys):
+        return
+    # First skills with these keys; concurrent inserts of the same key are ignored
+    existing = set(SkillStat.objects.filter(
+        Q(*[Q(skill=skill, proficiency=proficiency) for skill, proficiency in keys], _connector=Q.OR)
+    ).values_list("skill", "proficiency"))
+    missing = {key: delta for key, delta in keys.items() if key not in existing}
+    SkillStat.objects.bulk_create(
+        [SkillStat(skill=skill, proficiency=proficiency, name=names.get(skill, skill), count=0) for skill, proficiency in missing],
+        ignore_conflicts=True,
+    )
+    _increment(missing, now)
+
+
+def count_skills(rows):
+    """
+    ``(deltas, names)`` for an iterable of ``(name, proficiency)`` pairs.
+    """
+    deltas = Counter()
+    names = {}
+    for name, proficiency in rows:
+        key = skill_key(name, proficiency)
+        deltas[key] += 1
+        names.setdefault(key[0], name.strip())
+    return deltas, names
+
+
+def reconcile_skill_stats():
+    """
+    Recompute every counter from the active skills and fix the ones that
+    drifted. Returns the number of counters corrected.
+    """
+    using = router.db_for_write(SkillStat)
+    with transaction.atomic(using=using):
+        stats = {(stat.skill, stat.proficiency): stat for stat in SkillStat.objects.select_for_update()}
+        actual = Counter()
+        names = {}
+        grouped = Skill.objects.active().values_list("name", "proficiency").annotate(total=Count("pk")).order_by()
+        for name, proficiency, total in grouped:
+            key = skill_key(name, proficiency)
+            actual[key] += total
+            names.setdefault(key[0], name.strip())
+        actual = with_totals(actual)
+
+        fixed = 0
+        now = timezone.now()
+        for key, stat in stats.items():
+            if stat.count != actual[key]:
+                SkillStat.objects.filter(pk=stat.pk).update(count=actual[key], updated_at=now)
+                fixed += 1
+        missing = [
+            SkillStat(skill=skill, proficiency=proficiency, name=names[skill], count=total)
+            for (skill, proficiency), total in actual.items()
+            if (skill, proficiency) not in stats and skill
+        ]
+        SkillStat.objects.bulk_create(missing)
+        return fixed + len(missing)
+
+
+def skill_popularity(skill=None, limit=50):
+    """
+    The ``limit`` most used skills (or just ``skill``) with their counts per
+    proficiency, read from the rollup only: the top totals, then the
+    proficiency rows of those skills.
+    """
+    totals = SkillStat.objects.filter(proficiency=TOTAL, count__gt=0)
+    if skill:
+        totals = totals.filter(skill=normalize(skill))
+    proficiencies = [value for value, _ in Skill._meta.get_field("proficiency").choices]
+    skills = {
+        stat.skill: {
+            "skill": stat.skill,
+            "name": stat.name,
+            "total": stat.count,
+            "proficiency": dict.fromkeys(proficiencies, 0),
+        }
+        for stat in totals.order_by("-count", "skill").only("skill", "name", "count")[:limit]
+    }
+    if skills:
+        rows = SkillStat.objects.filter(skill__in=skills, count__gt=0).exclude(proficiency=TOTAL)
+        for skill_name, proficiency, count in rows.values_list("skill", "proficiency", "count"):
+            skills[skill_name]["proficiency"][proficiency] = count
+    return list(skills.values())
@@ -0,0 +1,128 @@
+"""
+Read-replica routing.
+
+``ReplicaRouter`` sends the reads of safe requests (GET, HEAD, OPTIONS) to a
+random alias in ``DATABASE_REPLICAS`` and everything else to ``default``: all
+writes, reads of unsafe requests, reads inside transactions and reads outside
+requests (management commands, the job worker).
+
+After a successful write, ``ReplicaRoutingMiddleware`` pins the client to the
+primary for ``REPLICA_PIN_SECONDS``, long enough for the replicas to catch up,
+so editors see their own changes immediately. Clients are told apart by the
+user id of their JWT, so a refreshed token keeps the pin, else by their
+session cookie or IP address. Pins are kept in the ``REPLICA_PIN_CACHE``
+cache, which every worker process shares: the next request of the client
+usually lands on another worker.
+
+Code that caches what it reads (portfolio snapshots, the JWT user cache) reads
+inside ``primary()``, so a lagging replica cannot be cached past the write's
+invalidation.
+"""
+import contextlib
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+PIN_KEY = "replica-pin:v1:{}"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Whether reads of the current request may go to a replica
+_use_replicas = ContextVar("use_replicas", default=False)
+
+
+@contextlib.contextmanager
+def replicas(enabled=True):
+    """
+    Let reads in the block go to a replica (or not, with ``enabled=False``).
+    """
+    token = _use_replicas.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+def primary():
+    """
+    Read from the primary within the block.
+    """
+    return replicas(False)
+
+
+def token_user_id(request):
+    """
+    The user id of ``request``'s valid JWT, or None. Read from the token alone,
+    before any authentication has run.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except InvalidToken:
+        return None
+
+
+def client_key(request):
+    user_id = token_user_id(request)
+    if user_id is not None:
+        return f"user:{user_id}"
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return "session:" + hashlib.sha256(session_key.encode()).hexdigest()
+    return "ip:" + request.META.get("REMOTE_ADDR", "")
+
+
+def is_pinned(request):
+    return caches[settings.REPLICA_PIN_CACHE].get(PIN_KEY.format(client_key(request))) is not None
+
+
+def pin(request):
+    """
+    Keep the client's reads on the primary for the next ``REPLICA_PIN_SECONDS``.
+    """
+    caches[settings.REPLICA_PIN_CACHE].set(PIN_KEY.format(client_key(request)), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def reads_from_replicas(request):
+    """
+    Whether the reads of ``request`` may go to a replica.
+    """
+    return bool(settings.DATABASE_REPLICAS) and request.method in SAFE_METHODS and not is_pinned(request)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get() or not settings.DATABASE_REPLICAS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related rows come from where the instance was read
+            return instance._state.db
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the primary's schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
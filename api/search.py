@@ -0,0 +1,184 @@
+"""
+Ranked full-text search over portfolios.
+
+Every active portfolio has a ``SearchDocument`` holding the text of its title,
+bio, projects, experiences, educations and skills. The signal handlers in
+``api/signals.py`` call ``schedule_reindex()`` whenever one of those rows is
+saved, soft-deleted or restored; each portfolio is reindexed once, when the
+transaction commits. Queries run against:
+
+- SQLite: the FTS5 table ``api_searchdocument_fts``, ranked with ``bm25()``.
+- PostgreSQL: the generated ``search_vector`` column and its GIN index, ranked
+  with ``ts_rank_cd()``.
+
+Other backends get unranked ``icontains`` matching.
+"""
+import contextlib
+import re
+import uuid
+from functools import partial
+
+from asgiref.local import Local
+from django.db import connections, router, transaction
+from django.db.models import Prefetch, Q
+
+from .models import Education, Experience, Portfolio, Project, SearchDocument, Skill
+
+# Column weights, highest first; PostgreSQL uses the A-D labels of migration 0008
+COLUMN_WEIGHTS = {
+    "title": 10.0,
+    "skills": 6.0,
+    "experiences": 4.0,
+    "projects": 3.0,
+    "educations": 2.0,
+    "bio": 1.0,
+}
+COLUMNS = ("title", "bio", "projects", "experiences", "educations", "skills")
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+# Portfolio ids waiting for the current transaction to commit, per database
+_pending = Local()
+
+
+def _join(*values):
+    return " ".join(value for value in values if value)
+
+
+def build_document(portfolio):
+    """
+    Unsaved ``SearchDocument`` for a portfolio loaded by ``reindex()``.
+    """
+    return SearchDocument(
+        portfolio=portfolio,
+        title=portfolio.title or "",
+        bio=portfolio.bio or "",
+        projects="\n".join(
+            _join(project.name, project.description, project.tech_stack, project.role)
+            for project in portfolio.search_projects
+        ),
+        experiences="\n".join(
+            _join(experience.job_title, experience.company_name, experience.location, experience.description)
+            for experience in portfolio.search_experiences
+        ),
+        educations="\n".join(_join(education.degree, education.institution) for education in portfolio.search_educations),
+        skills="\n".join(skill.name for skill in portfolio.search_skills),
+    )
+
+
+def reindex(portfolio_ids):
+    """
+    Rebuild the search documents of ``portfolio_ids``; soft-deleted or missing
+    portfolios lose theirs. Runs a fixed number of queries for any number of ids.
+    """
+    ids = set(portfolio_ids)
+    if not ids:
+        return
+    portfolios = Portfolio.objects.filter(pk__in=ids, is_deleted=False).only("pk", "title", "bio").prefetch_related(
+        Prefetch("projects", queryset=Project.objects.active().only("portfolio_id", "name", "description", "tech_stack", "role"), to_attr="search_projects"),
+        Prefetch("experiences", queryset=Experience.objects.active().only("portfolio_id", "job_title", "company_name", "location", "description"), to_attr="search_experiences"),
+        Prefetch("educations", queryset=Education.objects.active().only("portfolio_id", "degree", "institution"), to_attr="search_educations"),
+        Prefetch("skills", queryset=Skill.objects.active().only("portfolio_id", "name"), to_attr="search_skills"),
+    )
+    documents = [build_document(portfolio) for portfolio in portfolios]
+    gone = ids - {document.portfolio_id for document in documents}
+    # Documents are upserted in place; each statement is atomic on its own
+    both = gone and documents
+    with transaction.atomic(using=router.db_for_write(SearchDocument)) if both else contextlib.nullcontext():
+        if gone:
+            SearchDocument.objects.filter(portfolio_id__in=gone).delete()
+        if documents:
+            SearchDocument.objects.bulk_create(
+                documents, update_conflicts=True, unique_fields=["portfolio"], update_fields=[*COLUMNS, "updated_at"],
+            )
+
+
+def schedule_reindex(portfolio_ids):
+    """
+    Reindex ``portfolio_ids`` once the current transaction commits, or right
+    away outside one. Every id scheduled in a transaction goes into a single
+    ``reindex()``, however many of a portfolio's rows the transaction changed.
+    """
+    using = router.db_for_write(SearchDocument)
+    if not hasattr(_pending, "ids"):
+        _pending.ids = {}
+    _pending.ids.setdefault(using, set()).update(portfolio_ids)
+    # The first callback to run reindexes everything pending, the rest find
+    # nothing left. Ids left by a rolled back transaction go with the next one.
+    transaction.on_commit(partial(_reindex_pending, using), using=using)
+
+
+def _reindex_pending(using):
+    ids = _pending.ids.pop(using, None)
+    if ids:
+        reindex(ids)
+
+
+def rebuild(batch_size=500):
+    """
+    Reindex every active portfolio and drop the documents of deleted ones.
+    Returns the number of portfolios indexed.
+    """
+    SearchDocument.objects.filter(portfolio__is_deleted=True).delete()
+    ids = Portfolio.objects.active().order_by("pk").values_list("pk", flat=True)
+    indexed = 0
+    batch = []
+    for pk in ids.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) == batch_size:
+            reindex(batch)
+            indexed += len(batch)
+            batch = []
+    reindex(batch)
+    return indexed + len(batch)
+
+
+def query_terms(query):
+    return [term.lower() for term in TERM_RE.findall(query or "")]
+
+
+def _fts5_query(terms):
+    # Every term must match; the last one also matches as a prefix while typing
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(query, limit=20, offset=0):
+    """
+    ``(portfolio_id, score)`` pairs of the best matches for ``query``, highest
+    score first. Every word of the query must occur in the portfolio.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    using = router.db_for_read(SearchDocument)
+    connection = connections[using]
+    table = connection.ops.quote_name(SearchDocument._meta.db_table)
+
+    if connection.vendor == "sqlite":
+        fts = connection.ops.quote_name(f"{SearchDocument._meta.db_table}_fts")
+        weights = ", ".join(str(COLUMN_WEIGHTS[column]) for column in COLUMNS)
+        sql = (
+            f"SELECT document.portfolio_id, bm25({fts}, {weights}) AS rank "
+            f"FROM {fts} JOIN {table} AS document ON document.rowid = {fts}.rowid "
+            f"WHERE {fts} MATCH %s ORDER BY rank, document.portfolio_id LIMIT %s OFFSET %s"
+        )
+        params = [_fts5_query(terms), limit, offset]
+    elif connection.vendor == "postgresql":
+        sql = (
+            f"SELECT portfolio_id, -ts_rank_cd(search_vector, query, 32) AS rank "
+            f"FROM {table}, websearch_to_tsquery('english', %s) AS query "
+            f"WHERE search_vector @@ query ORDER BY rank, portfolio_id LIMIT %s OFFSET %s"
+        )
+        params = [query, limit, offset]
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(*[Q(**{f"{column}__icontains": term}) for column in COLUMNS], _connector=Q.OR)
+        rows = SearchDocument.objects.using(using).filter(condition).order_by("-updated_at", "pk")
+        return [(pk, 0.0) for pk in rows.values_list("pk", flat=True)[offset:offset + limit]]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        # SQLite returns the UUID as hex, PostgreSQL as a UUID
+        return [(uuid.UUID(str(pk)), -rank) for pk, rank in cursor.fetchall()]
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from . import images
+from .fieldsets import SparseFieldsetMixin
 from .models import (
     Portfolio,
     Project,
@@ -13,11 +15,27 @@ from .models import (
 )
 
 
+# Image Variants Field
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only URLs of the resized derivatives of the image field ``image_field``,
+    as ``{format: {width: url}}``, read from the variants recorded on the row.
+    """
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        return images.variant_urls(value, storage, self.context.get("request"))
+
+
 # User Serializer
 User = get_user_model()
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = [
@@ -33,8 +51,21 @@ class CustomUserSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "username", "email"]
 
 
+class PublicUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    The owner of a row as shown by ``?expand=user``: no email or staff flags,
+    which ``UserViewSet`` only shows the users themselves and staff.
+    """
+    class Meta:
+        model = User
+        fields = ["id", "username", "first_name", "last_name"]
+        read_only_fields = fields
+
+
 # Template Serializer
-class TemplateSerializer(serializers.ModelSerializer):
+class TemplateSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    preview_image_variants = ImageVariantsField(image_field="preview_image")
+
     class Meta:
         model = Template
         fields = [
@@ -42,6 +73,7 @@ class TemplateSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "preview_image",
+            "preview_image_variants",
             "demo_url",
             "created_at",
             "updated_at",
@@ -50,7 +82,9 @@ class TemplateSerializer(serializers.ModelSerializer):
 
 
 # Portfolio Serializer
-class PortfolioSerializer(serializers.ModelSerializer):
+class PortfolioSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    profile_image_variants = ImageVariantsField(image_field="profile_image")
+
     class Meta:
         model = Portfolio
         fields = [
@@ -60,15 +94,21 @@ class PortfolioSerializer(serializers.ModelSerializer):
             "title",
             "bio",
             "profile_image",
+            "profile_image_variants",
             "resume",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"user": PublicUserSerializer, "template": TemplateSerializer}
 
 
 # Project Serializer
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField(image_field="image")
+    # Normalized from tech_stack on save, which stays the writable field
+    tags = serializers.SlugRelatedField(slug_field="slug", many=True, read_only=True)
+
     class Meta:
         model = Project
         fields = [
@@ -77,18 +117,21 @@ class ProjectSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "tech_stack",
+            "tags",
             "role",
             "github_url",
             "live_demo_url",
             "image",
+            "image_variants",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"portfolio": PortfolioSerializer}
 
 
 # Skill Serializer
-class SkillSerializer(serializers.ModelSerializer):
+class SkillSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Skill
         fields = [
@@ -100,10 +143,11 @@ class SkillSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"portfolio": PortfolioSerializer}
 
 
 # Experience Serializer
-class ExperienceSerializer(serializers.ModelSerializer):
+class ExperienceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Experience
         fields = [
@@ -120,10 +164,11 @@ class ExperienceSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"portfolio": PortfolioSerializer}
 
 
 # Education Serializer
-class EducationSerializer(serializers.ModelSerializer):
+class EducationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Education
         fields = [
@@ -140,10 +185,13 @@ class EducationSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"portfolio": PortfolioSerializer}
 
 
 # Testimonial Serializer
-class TestimonialSerializer(serializers.ModelSerializer):
+class TestimonialSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    author_photo_variants = ImageVariantsField(image_field="author_photo")
+
     class Meta:
         model = Testimonial
         fields = [
@@ -153,16 +201,18 @@ class TestimonialSerializer(serializers.ModelSerializer):
             "author_position",
             "author_company",
             "author_photo",
+            "author_photo_variants",
             "testimonial_text",
             "author_linkedin",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"user": PublicUserSerializer}
 
 
 #  Contact Serializer
-class ContactSerializer(serializers.ModelSerializer):
+class ContactSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Contact
         fields = [
@@ -177,10 +227,11 @@ class ContactSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"user": PublicUserSerializer}
 
 
 # SocialLink Serializer
-class SocialLinkSerializer(serializers.ModelSerializer):
+class SocialLinkSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = SocialLink
         fields = [
@@ -192,3 +243,51 @@ class SocialLinkSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        expandable_fields = {"user": PublicUserSerializer}
+
+
+# Portfolio Document Serializer
+class PortfolioDocumentSerializer(PortfolioSerializer):
+    """
+    Read-only nested document of a portfolio, its template and every active child
+    collection. Expects instances loaded with ``Portfolio.objects.with_document()``.
+    """
+    template = TemplateSerializer(read_only=True)
+    projects = ProjectSerializer(source="active_projects", many=True, read_only=True)
+    skills = SkillSerializer(source="active_skills", many=True, read_only=True)
+    experiences = ExperienceSerializer(source="active_experiences", many=True, read_only=True)
+    educations = EducationSerializer(source="active_educations", many=True, read_only=True)
+    testimonials = TestimonialSerializer(source="user.active_testimonials", many=True, read_only=True)
+    contacts = ContactSerializer(source="user.active_contacts", many=True, read_only=True)
+    social_links = SocialLinkSerializer(source="user.active_social_links", many=True, read_only=True)
+
+    class Meta(PortfolioSerializer.Meta):
+        fields = PortfolioSerializer.Meta.fields + [
+            "projects",
+            "skills",
+            "experiences",
+            "educations",
+            "testimonials",
+            "contacts",
+            "social_links",
+        ]
+        read_only_fields = fields
+
+
+# Search Result Serializer
+class SearchResultSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    A portfolio matched by ``/api/search/``. Expects ``scores`` in the context,
+    mapping portfolio ids to their rank.
+    """
+    username = serializers.CharField(source="user.username", read_only=True)
+    score = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Portfolio
+        fields = ["id", "user", "username", "title", "bio", "profile_image", "score"]
+        read_only_fields = fields
+        expandable_fields = {"user": PublicUserSerializer}
+
+    def get_score(self, obj) -> float:
+        return round(self.context["scores"][obj.pk], 6)
@@ -0,0 +1,285 @@
+import contextlib
+import os
+from collections import Counter
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blobs, images, jobs, rollups, search, snapshots, tags
+from .authentication import user_cache
+from .models import (
+    CustomUser, Portfolio, Project, Skill, Experience, Education,
+    Contact, SocialLink, Testimonial, Template, RequestProfile, restored, soft_deleted
+)
+
+PORTFOLIO_CHILD_MODELS = (Project, Skill, Experience, Education)
+USER_CHILD_MODELS = (Testimonial, Contact, SocialLink)
+
+
+def portfolio_ids_for_user(user_id):
+    return list(Portfolio.objects.filter(user_id=user_id).values_list("pk", flat=True))
+
+
+def portfolio_ids_for_template(template_id):
+    return list(Portfolio.objects.filter(template_id=template_id).values_list("pk", flat=True))
+
+
+# Snapshot invalidation
+# post_save/post_delete cover single rows, soft_deleted/restored cover the
+# set-based soft delete and restore of DeletedQuerySet.
+@receiver([post_save, post_delete], sender=Portfolio)
+def invalidate_portfolio_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate([instance.pk])
+
+
+@receiver([soft_deleted, restored], sender=Portfolio)
+def invalidate_portfolio_snapshots(sender, pks, **kwargs):
+    snapshots.invalidate(pks)
+
+
+def invalidate_portfolio_child_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate([instance.portfolio_id])
+
+
+def invalidate_portfolio_child_snapshots(sender, pks, **kwargs):
+    snapshots.invalidate(set(sender._base_manager.filter(pk__in=pks).values_list("portfolio_id", flat=True)))
+
+
+def invalidate_user_child_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate(portfolio_ids_for_user(instance.user_id))
+
+
+def invalidate_user_child_snapshots(sender, pks, **kwargs):
+    user_ids = sender._base_manager.filter(pk__in=pks).values("user_id")
+    snapshots.invalidate(list(Portfolio.objects.filter(user_id__in=user_ids).values_list("pk", flat=True)))
+
+
+@receiver([post_save, post_delete], sender=Template)
+def invalidate_template_snapshot(sender, instance, **kwargs):
+    snapshots.invalidate(portfolio_ids_for_template(instance.pk))
+
+
+@receiver([soft_deleted, restored], sender=Template)
+def invalidate_template_snapshots(sender, pks, **kwargs):
+    snapshots.invalidate(list(Portfolio.objects.filter(template_id__in=pks).values_list("pk", flat=True)))
+
+
+for model in PORTFOLIO_CHILD_MODELS:
+    post_save.connect(invalidate_portfolio_child_snapshot, sender=model)
+    post_delete.connect(invalidate_portfolio_child_snapshot, sender=model)
+    soft_deleted.connect(invalidate_portfolio_child_snapshots, sender=model)
+    restored.connect(invalidate_portfolio_child_snapshots, sender=model)
+
+for model in USER_CHILD_MODELS:
+    post_save.connect(invalidate_user_child_snapshot, sender=model)
+    post_delete.connect(invalidate_user_child_snapshot, sender=model)
+    soft_deleted.connect(invalidate_user_child_snapshots, sender=model)
+    restored.connect(invalidate_user_child_snapshots, sender=model)
+
+
+# Search index
+# Each portfolio's document is rebuilt once, after the transaction that changed it commits.
+@receiver(post_save, sender=Portfolio)
+def reindex_portfolio(sender, instance, **kwargs):
+    search.schedule_reindex([instance.pk])
+
+
+@receiver([soft_deleted, restored], sender=Portfolio)
+def reindex_portfolios(sender, pks, **kwargs):
+    search.schedule_reindex(pks)
+
+
+def reindex_portfolio_child(sender, instance, **kwargs):
+    search.schedule_reindex([instance.portfolio_id])
+
+
+def reindex_portfolio_children(sender, pks, **kwargs):
+    search.schedule_reindex(sender._base_manager.filter(pk__in=pks).values_list("portfolio_id", flat=True))
+
+
+for model in PORTFOLIO_CHILD_MODELS:
+    post_save.connect(reindex_portfolio_child, sender=model)
+    post_delete.connect(reindex_portfolio_child, sender=model)
+    soft_deleted.connect(reindex_portfolio_children, sender=model)
+    restored.connect(reindex_portfolio_children, sender=model)
+
+
+# Project tags
+@receiver(post_save, sender=Project)
+def sync_project_tags(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or "tech_stack" in update_fields:
+        tags.sync_project_tags([instance])
+
+
+@receiver(restored, sender=Project)
+def sync_restored_project_tags(sender, pks, **kwargs):
+    # Projects restored from the archive come back without their tag links
+    tags.sync_project_tags(sender._base_manager.filter(pk__in=pks).only("pk", "tech_stack"))
+
+
+# Skill rollups
+# Only active skills are counted, so a save moves a skill between counters
+# when its name or proficiency changes, or when is_deleted flips. Skill.save()
+# runs both receivers in one transaction.
+SKILL_ROLLUP_FIELDS = ("name", "proficiency", "is_deleted")
+
+
+@receiver(pre_save, sender=Skill)
+def remember_skill_state(sender, instance, update_fields=None, **kwargs):
+    instance._stored_skill = None
+    if instance._state.adding or (update_fields is not None and not set(update_fields) & set(SKILL_ROLLUP_FIELDS)):
+        return
+    # Locked until the save commits: a concurrent edit waits and then reads this one's result
+    stored = sender._base_manager.select_for_update().filter(pk=instance.pk)
+    instance._stored_skill = stored.values_list(*SKILL_ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Skill)
+def count_saved_skill(sender, instance, created, **kwargs):
+    stored = getattr(instance, "_stored_skill", None)
+    if stored is None and not created:
+        return
+    deltas = Counter()
+    if stored is not None and not stored[2]:
+        deltas[rollups.skill_key(stored[0], stored[1])] -= 1
+    if not instance.is_deleted:
+        deltas[rollups.skill_key(instance.name, instance.proficiency)] += 1
+    rollups.apply_skill_deltas(deltas, {rollups.skill_key(instance.name, instance.proficiency)[0]: instance.name.strip()})
+
+
+@receiver(post_delete, sender=Skill)
+def uncount_deleted_skill(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        rollups.apply_skill_deltas({rollups.skill_key(instance.name, instance.proficiency): -1})
+
+
+@receiver([soft_deleted, restored], sender=Skill)
+def count_soft_deleted_skills(sender, pks, signal, **kwargs):
+    deltas, names = rollups.count_skills(sender._base_manager.filter(pk__in=pks).values_list("name", "proficiency"))
+    if signal is soft_deleted:
+        deltas = {key: -count for key, count in deltas.items()}
+    rollups.apply_skill_deltas(deltas, names)
+
+
+# Authenticated user cache
+# Any save may change the password or the staff and superuser flags; a login
+# that only stamps last_login does not.
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        user_cache.invalidate([instance.pk])
+
+
+@receiver([soft_deleted, restored], sender=CustomUser)
+def invalidate_cached_users(sender, pks, **kwargs):
+    user_cache.invalidate(pks)
+
+
+# Image derivatives
+# Variants are recorded on the row once rendered. Rendering finishes after the
+# snapshot may have been rebuilt, so the snapshot is dropped again then.
+SNAPSHOT_INVALIDATORS = {
+    Portfolio: invalidate_portfolio_snapshot,
+    Project: invalidate_portfolio_child_snapshot,
+    Testimonial: invalidate_user_child_snapshot,
+    Template: invalidate_template_snapshot,
+}
+
+
+def forget_stale_variants(sender, instance, **kwargs):
+    # A replaced image keeps none of the old one's variants; cleared in the same UPDATE
+    deferred = instance.get_deferred_fields()
+    for field_name in images.IMAGE_FIELDS[sender._meta.label]:
+        variants_name = images.variants_field(field_name)
+        if field_name in deferred or variants_name in deferred:
+            continue
+        if not images.variants_current(getattr(instance, variants_name), getattr(instance, field_name).name):
+            setattr(instance, variants_name, {})
+
+
+def schedule_image_derivatives(sender, instance, **kwargs):
+    deferred = instance.get_deferred_fields()
+    for field_name in images.IMAGE_FIELDS[sender._meta.label]:
+        fieldfile = getattr(instance, field_name)
+        variants_name = images.variants_field(field_name)
+        if not fieldfile:
+            continue
+        if variants_name not in deferred and images.variants_current(getattr(instance, variants_name), fieldfile.name):
+            continue
+        args = (sender._meta.label, str(instance.pk), field_name, fieldfile.name)
+        if settings.IMAGE_RENDER_INLINE:
+            transaction.on_commit(partial(render_image_derivatives, *args))
+        else:
+            # Queued in the same transaction: the job exists exactly when the upload does
+            jobs.enqueue(render_image_derivatives, *args)
+
+
+def render_image_derivatives(label, pk, field_name, name):
+    """
+    Render the derivatives of the image ``name``, unless the row ``pk`` of
+    ``label`` no longer holds it, and record them. Runs as a job.
+    """
+    model = apps.get_model(label)
+    instance = model._base_manager.filter(pk=pk, **{field_name: name}).first()
+    if instance is None:
+        return
+    variants = images.build_derivatives(getattr(instance, field_name))
+    if variants:
+        image_rendered(model, instance, field_name, name, variants)
+
+
+def image_rendered(sender, instance, field_name, name, variants):
+    """
+    Record the ``variants`` of the image ``name`` on ``instance`` and drop the
+    snapshot that lacks them.
+    """
+    images.record_variants(sender, instance.pk, field_name, name, variants)
+    if getattr(instance, field_name).name == name:
+        setattr(instance, images.variants_field(field_name), variants)
+    SNAPSHOT_INVALIDATORS[sender](sender, instance)
+
+
+for label in images.IMAGE_FIELDS:
+    pre_save.connect(forget_stale_variants, sender=apps.get_model(label))
+    post_save.connect(schedule_image_derivatives, sender=apps.get_model(label))
+
+
+# Blob reference counts
+# The names a row referenced before the save are read back from the database,
+# because by post_save the field already holds the new name.
+def remember_stored_files(sender, instance, update_fields=None, **kwargs):
+    field_names = blobs.file_fields(sender)
+    if instance._state.adding or (update_fields is not None and not set(update_fields) & set(field_names)):
+        instance._stored_files = None
+        return
+    stored = sender._base_manager.filter(pk=instance.pk).values_list(*field_names).first() or ()
+    instance._stored_files = [name for name in stored if name]
+
+
+def count_file_references(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_stored_files", None)
+    if previous is None and not created:
+        return
+    blobs.adjust(added=blobs.stored_names(instance), removed=previous or ())
+
+
+def release_file_references(sender, instance, **kwargs):
+    blobs.adjust(removed=blobs.stored_names(instance))
+
+
+for model in apps.get_app_config("api").get_models():
+    if blobs.file_fields(model):
+        pre_save.connect(remember_stored_files, sender=model)
+        post_save.connect(count_file_references, sender=model)
+        post_delete.connect(release_file_references, sender=model)
+
+
+# Request profiles
+@receiver(post_delete, sender=RequestProfile)
+def remove_profile_file(sender, instance, **kwargs):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(instance.path_on_disk)
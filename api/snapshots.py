@@ -0,0 +1,174 @@
+"""
+Precomputed portfolio documents.
+
+A snapshot is the serialized output of ``PortfolioDocumentSerializer`` for one
+portfolio, kept in the cache configured by ``PORTFOLIO_SNAPSHOT_CACHE``.
+Snapshots are built lazily on first read (or ahead of time by the
+``warm_snapshots`` command) and dropped by the signal handlers in
+``api/signals.py`` whenever a row attached to the portfolio changes.
+
+Snapshots are built without a request, so media fields hold URLs without a
+scheme and host; ``absolute_media_urls()`` completes them for each response.
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import images, metrics
+from .models import Portfolio
+from .routers import primary
+from .serializers import PortfolioDocumentSerializer
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "portfolio-snapshot:v1:{}"
+
+# Media fields of a document, by the key holding their rows (None for the portfolio itself)
+MEDIA_FIELDS = {
+    None: ("profile_image", "resume"),
+    "template": ("preview_image",),
+    "projects": ("image",),
+    "testimonials": ("author_photo",),
+}
+
+
+class SnapshotStats:
+    """
+    Per-process hit/miss counters for the snapshot cache.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.builds = 0
+            self.invalidations = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "builds": self.builds,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+stats = SnapshotStats()
+
+
+def get_cache():
+    return caches[settings.PORTFOLIO_SNAPSHOT_CACHE]
+
+
+def snapshot_key(portfolio_id):
+    return SNAPSHOT_KEY.format(portfolio_id)
+
+
+def build_snapshots(portfolio_ids):
+    """
+    Serialize the given active portfolios and store their snapshots.
+    Returns a dict of portfolio id to document; deleted or unknown ids are left out.
+    """
+    documents = {}
+    # A lagging replica could cache a document the last write already invalidated
+    with primary():
+        for portfolio in Portfolio.objects.active().with_document().filter(pk__in=portfolio_ids):
+            documents[str(portfolio.pk)] = PortfolioDocumentSerializer(portfolio).data
+    if documents:
+        get_cache().set_many({snapshot_key(pk): data for pk, data in documents.items()})
+        stats.incr("builds", len(documents))
+    return documents
+
+
+def record_lookup(data, duration):
+    hit = data is not None
+    stats.incr("hits" if hit else "misses")
+    metrics.cache_duration.observe(duration, "snapshots", "hit" if hit else "miss")
+
+
+def get_snapshot(portfolio_id):
+    """
+    Return the snapshot of an active portfolio, building it on a miss.
+    Returns None if the portfolio does not exist or is soft-deleted.
+    """
+    started = time.perf_counter()
+    data = get_cache().get(snapshot_key(portfolio_id))
+    record_lookup(data, time.perf_counter() - started)
+    if data is not None:
+        return data
+    return build_snapshots([portfolio_id]).get(str(portfolio_id))
+
+
+async def aget_snapshot(portfolio_id):
+    """
+    ``get_snapshot()`` for async views. A miss is built in a worker thread.
+    """
+    started = time.perf_counter()
+    data = await get_cache().aget(snapshot_key(portfolio_id))
+    record_lookup(data, time.perf_counter() - started)
+    if data is not None:
+        return data
+    documents = await sync_to_async(build_snapshots)([portfolio_id])
+    return documents.get(str(portfolio_id))
+
+
+def invalidate(portfolio_ids):
+    """
+    Drop the snapshots of the given portfolios.
+
+    The keys are deleted immediately and again once the surrounding transaction
+    commits, so a reader that rebuilt from the pre-commit state does not leave a
+    stale snapshot behind.
+    """
+    keys = [snapshot_key(pk) for pk in portfolio_ids if pk is not None]
+    if not keys:
+        return
+    cache = get_cache()
+    cache.delete_many(keys)
+    stats.incr("invalidations", len(keys))
+    transaction.on_commit(lambda: cache.delete_many(keys))
+    logger.debug("Invalidated %d portfolio snapshot(s)", len(keys))
+
+
+def absolute_media_urls(document, request):
+    """
+    Copy of ``document`` with its media and variant URLs made absolute for
+    ``request``, as the other endpoints return them.
+    """
+    document = _absolute_row(document, MEDIA_FIELDS[None], request)
+    for key, field_names in MEDIA_FIELDS.items():
+        value = document.get(key) if key else None
+        if isinstance(value, list):
+            document[key] = [_absolute_row(row, field_names, request) for row in value]
+        elif value:
+            document[key] = _absolute_row(value, field_names, request)
+    return document
+
+
+def _absolute_row(row, field_names, request):
+    row = dict(row)
+    for name in field_names:
+        if row.get(name):
+            row[name] = request.build_absolute_uri(row[name])
+        variants = row.get(images.variants_field(name))
+        if variants:
+            row[images.variants_field(name)] = {
+                fmt: {width: request.build_absolute_uri(url) for width, url in widths.items()}
+                for fmt, widths in variants.items()
+            }
+    return row
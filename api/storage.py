@@ -0,0 +1,82 @@
+"""
+Content-addressed storage for uploaded files.
+
+Every upload is stored once under ``blobs/<aa>/<sha256><ext>``, whatever field
+or ``upload_to`` it came from, so the same resume or picture uploaded for many
+portfolios takes the disk space of one file. Each stored file has a ``Blob`` row
+whose ``refcount`` counts the rows pointing at it; ``api.blobs`` keeps the counts
+up to date and deletes blobs nobody references any more.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+BLOB_DIRECTORY = "blobs"
+
+
+def blob_name(digest, original_name):
+    """
+    Storage name of the blob with content hash ``digest``; the extension of the
+    uploaded name is kept so URLs and MIME types still work.
+    """
+    extension = posixpath.splitext(original_name)[1].lower()
+    return posixpath.join(BLOB_DIRECTORY, digest[:2], f"{digest}{extension}")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that names files after the SHA-256 of their content.
+
+    The upload is hashed while it is copied to a temporary file next to the blob
+    directory, so it is read only once. If the blob already exists the copy is
+    dropped; otherwise it is moved into place atomically, which also makes
+    concurrent uploads of the same content safe.
+    """
+    def get_available_name(self, name, max_length=None):
+        # Equal names mean equal content, so an existing name is never a conflict
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        directory = self.path(BLOB_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, "seek") and content.seekable():
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".upload", delete=False) as partial:
+            try:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    partial.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(partial.name)
+                raise
+
+        name = blob_name(digest.hexdigest(), name)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            os.unlink(partial.name)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            file_move_safe(partial.name, full_path, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+
+        # Touching last_used_at keeps garbage collection away from a blob that
+        # is about to be referenced again
+        blob, created = Blob.objects.get_or_create(
+            name=name, defaults={"sha256": digest.hexdigest(), "size": size},
+        )
+        if not created:
+            Blob.objects.filter(pk=blob.pk).update(last_used_at=timezone.now())
+        return name
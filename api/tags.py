@@ -0,0 +1,99 @@
+"""
+Technology tags parsed from ``Project.tech_stack``.
+
+``tech_stack`` stays the free-text field clients write. On every save it is
+split into normalized ``Tag`` rows linked to the project, so "all projects using
+React" is an indexed join instead of a substring scan that also matches
+"React Native".
+"""
+import re
+
+from django.db import router, transaction
+
+from .models import Project, Tag
+
+# Separators between technologies; a slash only with spaces around it, so "CI/CD" stays whole
+SEPARATORS_RE = re.compile(r"[,;|\n]+|\s+/\s+|\s+&\s+|\s+and\s+", re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Common spellings of the same technology
+ALIASES = {
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "angularjs": "angular",
+    "nodejs": "node.js",
+    "node": "node.js",
+    "nextjs": "next.js",
+    "golang": "go",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "js": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "k8s": "kubernetes",
+    "mongo": "mongodb",
+    "tailwindcss": "tailwind",
+    "drf": "django rest framework",
+}
+
+
+def normalize(name):
+    """
+    Slug of a technology name: lowercased, whitespace collapsed, aliases resolved.
+    """
+    slug = WHITESPACE_RE.sub(" ", name).strip().lower()
+    return ALIASES.get(slug, slug)
+
+
+def parse_tech_stack(tech_stack):
+    """
+    ``(slug, name)`` pairs of the technologies in a free-text tech stack, in
+    order of appearance and without duplicates.
+    """
+    tags = {}
+    for part in SEPARATORS_RE.split(tech_stack or ""):
+        name = WHITESPACE_RE.sub(" ", part).strip().rstrip(".")
+        slug = normalize(name)
+        if slug and slug not in tags and len(slug) <= Tag._meta.get_field("slug").max_length:
+            tags[slug] = name
+    return list(tags.items())
+
+
+def sync_project_tags(projects):
+    """
+    Link each of ``projects`` to the tags of its ``tech_stack``, creating missing
+    tags. Runs a fixed number of queries for any number of projects.
+    """
+    desired = {project.pk: parse_tech_stack(project.tech_stack) for project in projects}
+    if not desired:
+        return
+    names = {slug: name for tags in desired.values() for slug, name in tags}
+    through = Project.tags.through
+    with transaction.atomic(using=router.db_for_write(through)):
+        if names:
+            Tag.objects.bulk_create([Tag(slug=slug, name=name) for slug, name in names.items()], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(slug__in=names).values_list("slug", "pk"))
+        wanted = {(project_id, tag_ids[slug]) for project_id, tags in desired.items() for slug, _ in tags}
+        existing = {
+            (project_id, tag_id): pk
+            for pk, project_id, tag_id in through.objects.filter(project_id__in=desired).values_list("pk", "project_id", "tag_id")
+        }
+        stale = [pk for pair, pk in existing.items() if pair not in wanted]
+        if stale:
+            through.objects.filter(pk__in=stale).delete()
+        missing = wanted - existing.keys()
+        if missing:
+            through.objects.bulk_create([through(project_id=project_id, tag_id=tag_id) for project_id, tag_id in missing])
+
+
+def filter_by_tech(queryset, values):
+    """
+    Projects in ``queryset`` tagged with every technology in ``values``; each
+    value may itself be a comma-separated list.
+    """
+    for value in values:
+        for slug, _ in parse_tech_stack(value):
+            queryset = queryset.filter(tags__slug=slug)
+    return queryset
@@ -1,3 +1,1874 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import archive, blobs, fastpath, images, instrumentation, jobs, metrics, middleware, profiling, rollups, routers, search, snapshots, tags, throttling
+from .authentication import user_cache
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .serializers import ProjectSerializer
+from .views import PortfolioViewSet, ProjectViewSet, SkillViewSet
+from .models import (
+    Portfolio, Project, Skill, Experience, Education,
+    Contact, SocialLink, Testimonial, Template, ProjectArchive, ContactArchive, Job, Blob, SearchDocument, Tag, SkillStat,
+    ThrottleBucket, RequestProfile,
+)
+
+User = get_user_model()
+
+JOB_CALLS = []
+
+
+def record_job_call(*args, **kwargs):
+    JOB_CALLS.append((args, kwargs))
+
+
+def failing_job():
+    raise RuntimeError("boom")
+
+
+class DenyObjectPermission(IsAuthenticated):
+    def has_object_permission(self, request, view, obj):
+        return False
+
+
+def create_portfolio_tree(user, children=1, template=None):
+    """
+    Create a portfolio for ``user`` with ``children`` rows in every child collection.
+    """
+    portfolio = Portfolio.objects.create(user=user, template=template, title=f"{user.username}'s Portfolio")
+    for i in range(children):
+        Project.objects.create(portfolio=portfolio, name=f"Project {i}", description="A project", tech_stack="Django, React")
+        Skill.objects.create(portfolio=portfolio, name=f"Skill {i}", proficiency="Expert")
+        Experience.objects.create(portfolio=portfolio, job_title="Engineer", company_name=f"Company {i}", start_date=date(2020, 1, 1))
+        Education.objects.create(portfolio=portfolio, degree="BSc", institution=f"University {i}", start_date=date(2015, 1, 1))
+        Testimonial.objects.create(user=user, author_name=f"Author {i}", testimonial_text="Great work")
+        Contact.objects.create(user=user, name=f"Contact {i}", email="contact@example.com", phone="12345")
+        SocialLink.objects.create(user=user, name=f"Link {i}", url="https://example.com")
+    return portfolio
+
+
+def image_upload(name="photo.png", size=(500, 400)):
+    buffer = BytesIO()
+    Image.new("RGBA", size, (200, 30, 30, 128)).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class MediaRootTestCase(TestCase):
+    """
+    Runs every test against a throwaway MEDIA_ROOT.
+    """
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+
+SERVER_WORKER_SCRIPT = """
+import sys
+
+import django
+
+django.setup()
+exec(sys.argv[1])
+for line in sys.stdin:
+    print(repr(eval(line)), flush=True)
+"""
+
+
+class WorkerProcess:
+    """
+    One of several server worker processes: a Python process with Django set up
+    that runs ``setup``, then answers each ``eval()`` with the repr of the result.
+    """
+    def __init__(self, setup, **environ):
+        environ = {**os.environ, "SECRET_KEY": "test", "WEB_WORKERS": "2", "LOGLEVEL": "WARNING", **environ}
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", SERVER_WORKER_SCRIPT, setup],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=settings.BASE_DIR, env=environ,
+        )
+
+    def eval(self, expression):
+        self.process.stdin.write(expression + "\n")
+        self.process.stdin.flush()
+        return self.process.stdout.readline().strip()
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+        self.process.stdout.close()
+
+
+def settings_error(**environ):
+    """
+    The error that loading the settings of a two-worker server with ``environ`` raises.
+    """
+    environ = {**os.environ, "SECRET_KEY": "test", "WEB_WORKERS": "2", "LOGLEVEL": "WARNING", **environ}
+    result = subprocess.run(
+        [sys.executable, "-c", "import django; django.setup()"],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, env=environ, timeout=30,
+    )
+    return result.stderr.strip().splitlines()[-1] if result.returncode else ""
+
+
+class PortfolioFullDocumentTests(TestCase):
+    def setUp(self):
+        snapshots.get_cache().clear()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.template = Template.objects.create(name="Minimal")
+
+    def test_full_document_contains_active_children(self):
+        portfolio = create_portfolio_tree(self.user, children=2, template=self.template)
+        portfolio.projects.first().delete()
+
+        response = self.client.get(reverse("portfolio-full", args=[portfolio.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["template"]["name"], "Minimal")
+        self.assertEqual(len(response.data["projects"]), 1)
+        for key in ("skills", "experiences", "educations", "testimonials", "contacts", "social_links"):
+            self.assertEqual(len(response.data[key]), 2, key)
+
+    def test_full_document_query_count_is_bounded(self):
+        portfolio = create_portfolio_tree(self.user, children=1, template=self.template)
+        url = reverse("portfolio-full", args=[portfolio.pk])
+        with self.assertNumQueries(10):
+            self.client.get(url)
+
+        create_portfolio_tree(self.user, children=10)
+        for i in range(10):
+            Project.objects.create(portfolio=portfolio, name=f"Extra {i}", description="More")
+        with self.assertNumQueries(10):
+            self.client.get(url)
+
+    def test_full_document_hides_deleted_portfolio(self):
+        portfolio = create_portfolio_tree(self.user)
+        portfolio.delete()
+        response = self.client.get(reverse("portfolio-full", args=[portfolio.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_full_document_checks_object_permissions(self):
+        portfolio = create_portfolio_tree(self.user)
+        with mock.patch.object(PortfolioViewSet, "permission_classes", [DenyObjectPermission]):
+            response = self.client.get(reverse("portfolio-full", args=[portfolio.pk]))
+        self.assertEqual(response.status_code, 403)
+        with mock.patch.object(PortfolioViewSet, "get_queryset", return_value=Portfolio.objects.none()):
+            response = self.client.get(reverse("portfolio-full", args=[portfolio.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(reverse("portfolio-full", args=["not-a-uuid"])).status_code, 404)
+
+
+class PortfolioSnapshotTests(TestCase):
+    def setUp(self):
+        snapshots.get_cache().clear()
+        snapshots.stats.reset()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.template = Template.objects.create(name="Minimal")
+        self.portfolio = create_portfolio_tree(self.user, template=self.template)
+        self.url = reverse("portfolio-full", args=[self.portfolio.pk])
+
+    def test_second_read_is_served_from_snapshot(self):
+        self.client.get(self.url)
+        # Only the visibility and permission lookup of the portfolio
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["title"], self.portfolio.title)
+        self.assertEqual(snapshots.stats.hits, 1)
+        self.assertEqual(snapshots.stats.misses, 1)
+
+    def test_invalidation_reaches_every_worker_process(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        workers = [WorkerProcess("from api import snapshots", SNAPSHOT_CACHE_LOCATION=location) for _ in range(2)]
+        for worker in workers:
+            self.addCleanup(worker.close)
+        pk = str(self.portfolio.pk)
+        get = f"snapshots.get_cache().get(snapshots.snapshot_key({pk!r}))"
+
+        workers[0].eval(f"snapshots.get_cache().set(snapshots.snapshot_key({pk!r}), {{'title': 'Old'}})")
+        self.assertEqual([worker.eval(get) for worker in workers], ["{'title': 'Old'}"] * 2)
+        workers[1].eval(f"snapshots.invalidate([{pk!r}])")
+        self.assertEqual([worker.eval(get) for worker in workers], ["None"] * 2)
+
+    def test_locmem_snapshots_are_refused_with_several_workers(self):
+        self.assertIn("SNAPSHOT_CACHE_BACKEND=locmem", settings_error(SNAPSHOT_CACHE_BACKEND="locmem"))
+
+    def test_child_save_soft_delete_and_restore_invalidate(self):
+        self.client.get(self.url)
+        skill = self.portfolio.skills.get()
+        skill.name = "Django"
+        skill.save()
+        self.assertEqual(self.client.get(self.url).data["skills"][0]["name"], "Django")
+
+        skill.delete()
+        self.assertEqual(self.client.get(self.url).data["skills"], [])
+
+        skill.restore()
+        self.assertEqual(len(self.client.get(self.url).data["skills"]), 1)
+
+    def test_user_child_and_template_changes_invalidate(self):
+        self.client.get(self.url)
+        SocialLink.objects.create(user=self.user, name="GitHub", url="https://github.com")
+        self.assertEqual(len(self.client.get(self.url).data["social_links"]), 2)
+
+        self.template.name = "Bold"
+        self.template.save()
+        self.assertEqual(self.client.get(self.url).data["template"]["name"], "Bold")
+
+    def test_unrelated_change_keeps_snapshot(self):
+        self.client.get(self.url)
+        other = User.objects.create_user(username="other", password="secret")
+        create_portfolio_tree(other)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_warm_snapshots_command(self):
+        create_portfolio_tree(self.user).delete()
+        out = StringIO()
+        call_command("warm_snapshots", stdout=out)
+        self.assertIn("Built 1 portfolio snapshot(s)", out.getvalue())
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        portfolio = Portfolio.objects.create(user=self.user, title="Paged")
+        self.projects = [
+            Project.objects.create(portfolio=portfolio, name=f"Project {i}", description="A project")
+            for i in range(7)
+        ]
+
+    def test_pages_walk_every_row_once_newest_first(self):
+        url = reverse("project-list") + "?page_size=3"
+        seen = []
+        while url:
+            # The page and its prefetched tags
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            seen += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        expected = [str(p.pk) for p in sorted(self.projects, key=lambda p: (p.created_at, p.pk), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get(reverse("project-list") + "?page_size=3").data
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+        self.assertEqual(back["results"], first["results"])
+        self.assertIsNone(first["previous"])
+
+    def test_page_size_is_capped_and_count_is_opt_in(self):
+        with mock.patch.object(ProjectViewSet, "max_page_size", 5, create=True):
+            response = self.client.get(reverse("project-list") + "?page_size=1000")
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertNotIn("count", response.data)
+
+        response = self.client.get(reverse("project-list") + "?page_size=2&count=true")
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse("project-list") + "?cursor=cD1nYXJiYWdl")
+        self.assertEqual(response.status_code, 404)
+
+
+class ActiveRowIndexTests(TestCase):
+    """
+    Soft-delete filtered, owner-scoped lookups must be answered from an index.
+    """
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == "postgresql":
+            # Tiny test tables would otherwise always favour a sequential scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotRegex(plan, rf"(?m)SCAN {queryset.model._meta.db_table}$|Seq Scan")
+
+    def test_portfolio_child_lookups_use_partial_indexes(self):
+        portfolio_id = uuid.uuid4()
+        for model in (Project, Skill, Experience, Education):
+            name = model._meta.model_name
+            self.assertUsesIndex(model.objects.active().filter(portfolio_id=portfolio_id), f"{name}_live_portfolio_idx")
+            self.assertUsesIndex(
+                model.objects.active().filter(portfolio_id__in=[portfolio_id]).order_by("created_at"),
+                f"{name}_live_portfolio_idx",
+            )
+
+    def test_user_scoped_lookups_use_partial_indexes(self):
+        user_id = uuid.uuid4()
+        for model in (Portfolio, Testimonial, Contact, SocialLink):
+            name = model._meta.model_name
+            self.assertUsesIndex(model.objects.active().filter(user_id=user_id), f"{name}_live_user_idx")
+
+    def test_active_listing_uses_partial_indexes(self):
+        for model in (Skill, Experience, Education, Contact):
+            name = model._meta.model_name
+            self.assertUsesIndex(model.objects.active().order_by("-created_at", "-id"), f"{name}_live_created_idx")
+        self.assertUsesIndex(
+            User.objects.filter(is_deleted=False, is_staff=False, is_superuser=False).order_by("-created_at", "-id"),
+            "customuser_live_public_idx",
+        )
+
+
+class SetBasedSoftDeleteTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.portfolio = create_portfolio_tree(self.user, children=3)
+
+    def updates_per_table(self, queries):
+        tables = [q["sql"].split('"')[1] for q in queries if q["sql"].startswith("UPDATE")]
+        return {table: tables.count(table) for table in tables}
+
+    def test_bulk_soft_delete_is_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            count = Project.objects.filter(portfolio=self.portfolio).soft_delete()
+        self.assertEqual(count, 3)
+        self.assertEqual(self.updates_per_table(ctx.captured_queries), {"api_project": 1})
+        self.assertEqual(Project.objects.deleted().values("deleted_at").distinct().count(), 1)
+
+    def test_portfolio_soft_delete_cascades_with_one_stamp(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.portfolio.delete()
+        self.assertEqual(set(self.updates_per_table(ctx.captured_queries).values()), {1})
+        for related_name in Portfolio.soft_delete_cascade:
+            stamps = set(getattr(self.portfolio, related_name).values_list("deleted_at", flat=True))
+            self.assertEqual(stamps, {self.portfolio.deleted_at}, related_name)
+
+    def test_restore_keeps_rows_deleted_on_their_own(self):
+        lone = self.portfolio.skills.first()
+        lone.delete()
+        self.portfolio.delete()
+
+        self.portfolio.restore()
+
+        self.assertEqual(self.portfolio.skills.active().count(), 2)
+        self.assertTrue(Skill.objects.get(pk=lone.pk).is_deleted)
+        self.assertEqual(self.portfolio.projects.active().count(), 3)
+
+    def test_user_soft_delete_cascades_to_portfolios_and_user_rows(self):
+        User.objects.filter(pk=self.user.pk).soft_delete()
+        self.assertFalse(Portfolio.objects.active().filter(user=self.user).exists())
+        self.assertFalse(Project.objects.active().filter(portfolio__user=self.user).exists())
+        self.assertFalse(Contact.objects.active().filter(user=self.user).exists())
+
+        User.objects.filter(pk=self.user.pk).restore()
+        self.assertEqual(Project.objects.active().filter(portfolio__user=self.user).count(), 3)
+        self.assertEqual(SocialLink.objects.active().filter(user=self.user).count(), 3)
+
+    def test_hard_purge_removes_only_soft_deleted_rows(self):
+        self.portfolio.projects.first().delete()
+        Project.objects.all().hard_purge()
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_destroy_endpoint_cascades(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.delete(reverse("portfolio-detail", args=[self.portfolio.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Experience.objects.active().filter(portfolio=self.portfolio).exists())
+
+    def test_admin_delete_action_soft_deletes(self):
+        admin_user = User.objects.create_superuser(username="admin", password="secret")
+        self.client.force_login(admin_user)
+        pks = [str(pk) for pk in self.portfolio.projects.values_list("pk", flat=True)]
+        response = self.client.post(
+            reverse("admin:api_project_changelist"),
+            {"action": "delete_selected", "_selected_action": pks, "post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Project.objects.deleted().count(), 3)
+
+
+class SoftDeleteArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.portfolio = create_portfolio_tree(self.user, children=5)
+        self.old = timezone.now() - timedelta(days=90)
+
+    def test_archives_only_rows_past_retention(self):
+        expired = list(self.portfolio.projects.values_list("pk", flat=True)[:3])
+        Project.objects.filter(pk__in=expired).soft_delete(deleted_at=self.old)
+        self.portfolio.projects.active().first().delete()
+
+        report = archive.archive_soft_deleted(retention=timedelta(days=30), batch_size=2)
+
+        self.assertEqual(report["api.Project"]["rows"], 3)
+        self.assertEqual(set(ProjectArchive.objects.values_list("pk", flat=True)), set(expired))
+        self.assertEqual(Project.objects.count(), 2)
+        archived = ProjectArchive.objects.get(pk=expired[0])
+        self.assertEqual(archived.portfolio_id, self.portfolio.pk)
+        self.assertEqual(archived.deleted_at, self.old)
+
+    def test_interrupted_run_resumes(self):
+        Contact.objects.filter(user=self.user).soft_delete(deleted_at=self.old)
+        cutoff = timezone.now() - timedelta(days=30)
+        self.assertEqual(archive.archive_model_rows(Contact, cutoff, batch_size=2, max_batches=1), 2)
+        self.assertEqual(archive.archive_model_rows(Contact, cutoff, batch_size=2), 3)
+        self.assertEqual(ContactArchive.objects.count(), 5)
+        self.assertFalse(Contact.objects.exists())
+
+    def test_restore_moves_rows_back_as_active(self):
+        project = self.portfolio.projects.first()
+        created_at = project.created_at
+        Project.objects.filter(pk=project.pk).soft_delete(deleted_at=self.old)
+        archive.archive_soft_deleted(retention=timedelta(days=30))
+
+        restored, skipped = archive.restore_archived(Project, pks=[project.pk])
+
+        self.assertEqual((restored, skipped), (1, 0))
+        project = Project.objects.get(pk=project.pk)
+        self.assertFalse(project.is_deleted)
+        self.assertEqual(project.created_at, created_at)
+        self.assertFalse(ProjectArchive.objects.exists())
+
+    def test_command_reports_rows_per_second(self):
+        Project.objects.filter(portfolio=self.portfolio).soft_delete(deleted_at=self.old)
+        out = StringIO()
+        call_command("archive_deleted", "--model", "api.Project", stdout=out)
+        self.assertIn("api.Project: moved 5 row(s)", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+
+
+@override_settings(IMAGE_RENDER_INLINE=True, IMAGE_DERIVATIVE_WIDTHS=[96, 320, 768], IMAGE_DERIVATIVE_FORMATS=["webp", "jpeg"])
+class ImageDerivativeTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_upload_renders_variants_narrower_than_original(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            portfolio = Portfolio.objects.create(user=self.user, title="Pictures", profile_image=image_upload())
+
+        storage = portfolio.profile_image.storage
+        for fmt in ("webp", "jpeg"):
+            for width in (96, 320):
+                with Image.open(storage.path(images.derivative_name(portfolio.profile_image.name, width, fmt))) as variant:
+                    self.assertEqual(variant.width, width)
+                    self.assertEqual(variant.format, fmt.upper())
+            self.assertFalse(storage.exists(images.derivative_name(portfolio.profile_image.name, 768, fmt)))
+
+        response = self.client.get(reverse("portfolio-detail", args=[portfolio.pk]))
+        variants = response.data["profile_image_variants"]
+        self.assertEqual(set(variants), {"webp", "jpeg"})
+        self.assertEqual(set(variants["webp"]), {"96", "320"})
+        self.assertTrue(variants["webp"]["96"].startswith("http://testserver/media/blobs/"))
+
+    def test_serializing_variants_reads_no_storage(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            portfolio = Portfolio.objects.create(user=self.user, title="Pictures", profile_image=image_upload())
+        self.assertEqual(set(Portfolio.objects.get(pk=portfolio.pk).profile_image_variants["webp"]), {"96", "320"})
+
+        with mock.patch.object(FileSystemStorage, "exists", side_effect=AssertionError("storage lookup")), \
+                mock.patch.object(FileSystemStorage, "size", side_effect=AssertionError("storage lookup")):
+            detail = self.client.get(reverse("portfolio-detail", args=[portfolio.pk]))
+            listed = self.client.get(reverse("portfolio-list"))
+        self.assertEqual(set(detail.data["profile_image_variants"]["jpeg"]), {"96", "320"})
+        self.assertEqual(listed.data["results"][0]["profile_image_variants"], detail.data["profile_image_variants"])
+
+    def test_replaced_image_drops_old_variants_until_rendered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            portfolio = Portfolio.objects.create(user=self.user, title="Pictures", profile_image=image_upload())
+        portfolio.refresh_from_db()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            portfolio.profile_image = image_upload(size=(400, 300))
+            portfolio.save()
+        self.assertEqual(Portfolio.objects.get(pk=portfolio.pk).profile_image_variants, {})
+
+        for callback in callbacks:
+            callback()
+        variants = Portfolio.objects.get(pk=portfolio.pk).profile_image_variants
+        self.assertEqual(variants["webp"]["320"], images.derivative_name(portfolio.profile_image.name, 320, "webp"))
+
+    @override_settings(IMAGE_RENDER_INLINE=False)
+    def test_upload_queues_render_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            portfolio = Portfolio.objects.create(user=self.user, title="Pictures", profile_image=image_upload())
+        job = Job.objects.get(task="api.signals.render_image_derivatives")
+        self.assertEqual(job.args[:2], ["api.Portfolio", str(portfolio.pk)])
+        self.assertEqual(Portfolio.objects.get(pk=portfolio.pk).profile_image_variants, {})
+
+        jobs.Worker(burst=True).run()
+        variants = Portfolio.objects.get(pk=portfolio.pk).profile_image_variants
+        self.assertEqual(set(variants["webp"]), {"96", "320"})
+
+    def test_command_records_existing_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            portfolio = Portfolio.objects.create(user=self.user, title="Pictures", profile_image=image_upload())
+        Portfolio.objects.filter(pk=portfolio.pk).update(profile_image_variants={})
+
+        call_command("build_image_derivatives", "--workers", "1", stdout=StringIO())
+        variants = Portfolio.objects.get(pk=portfolio.pk).profile_image_variants
+        self.assertEqual(set(variants), {"webp", "jpeg"})
+        self.assertEqual(set(variants["jpeg"]), {"96", "320"})
+
+    def test_image_less_rows_have_no_variants(self):
+        portfolio = Portfolio.objects.create(user=self.user, title="Plain")
+        response = self.client.get(reverse("portfolio-detail", args=[portfolio.pk]))
+        self.assertEqual(response.data["profile_image_variants"], {})
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        JOB_CALLS.clear()
+
+    def test_burst_worker_runs_queued_jobs(self):
+        jobs.enqueue(record_job_call, 1, 2, key="value")
+        jobs.enqueue("api.tests.record_job_call", 3)
+        worker = jobs.Worker(burst=True)
+        worker.run()
+
+        self.assertEqual(JOB_CALLS, [((1, 2), {"key": "value"}), ((3,), {})])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+        metrics = worker.metrics.as_dict()
+        self.assertEqual(metrics["succeeded"], 2)
+        self.assertIsNotNone(metrics["run_p95"])
+
+    def test_future_jobs_wait_for_run_after(self):
+        jobs.enqueue(record_job_call, run_after=timezone.now() + timedelta(hours=1))
+        jobs.Worker(burst=True).run()
+        self.assertEqual(JOB_CALLS, [])
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        job = jobs.enqueue(failing_job, max_attempts=2)
+        jobs.Worker(burst=True).run()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.Worker(burst=True).run()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        jobs.enqueue(record_job_call)
+        first = jobs.claim_next("worker-a")
+        self.assertEqual((first.status, first.locked_by, first.attempts), (Job.RUNNING, "worker-a", 1))
+        self.assertIsNone(jobs.claim_next("worker-b"))
+
+    def test_stale_running_jobs_are_requeued(self):
+        jobs.enqueue(record_job_call)
+        job = jobs.claim_next("dead-worker")
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        jobs.Worker(burst=True).run()
+        self.assertEqual(len(JOB_CALLS), 1)
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+
+class ContentAddressedStorageTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", password="secret")
+
+    def resume(self, content=b"%PDF-1.4 resume"):
+        return SimpleUploadedFile("Resume.PDF", content, content_type="application/pdf")
+
+    def test_identical_uploads_share_one_blob(self):
+        first = Portfolio.objects.create(user=self.user, title="One", resume=self.resume())
+        second = Portfolio.objects.create(user=self.user, title="Two", resume=self.resume())
+        other = Portfolio.objects.create(user=self.user, title="Three", resume=self.resume(b"other"))
+
+        self.assertEqual(first.resume.name, second.resume.name)
+        self.assertNotEqual(first.resume.name, other.resume.name)
+        self.assertRegex(first.resume.name, r"^blobs/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$")
+        self.assertEqual(Blob.objects.get(name=first.resume.name).refcount, 2)
+        self.assertEqual(first.resume.read(), b"%PDF-1.4 resume")
+
+    def test_references_follow_replacements_and_purges(self):
+        portfolio = Portfolio.objects.create(user=self.user, title="One", resume=self.resume())
+        old_name = portfolio.resume.name
+        portfolio.resume = self.resume(b"new version")
+        portfolio.save()
+        self.assertEqual(Blob.objects.get(name=old_name).refcount, 0)
+        self.assertEqual(Blob.objects.get(name=portfolio.resume.name).refcount, 1)
+
+        # Soft-deleted rows still reference their files; purged rows do not
+        Portfolio.objects.filter(pk=portfolio.pk).soft_delete()
+        self.assertEqual(Blob.objects.get(name=portfolio.resume.name).refcount, 1)
+        Portfolio.objects.filter(pk=portfolio.pk).hard_purge()
+        self.assertEqual(Blob.objects.get(name=portfolio.resume.name).refcount, 0)
+
+    def test_garbage_collection_keeps_referenced_and_recent_blobs(self):
+        kept = Portfolio.objects.create(user=self.user, title="Kept", resume=self.resume())
+        purged = Portfolio.objects.create(user=self.user, title="Purged", resume=self.resume(b"gone"))
+        purged_name = purged.resume.name
+        purged.delete()
+        Portfolio.objects.filter(pk=purged.pk).hard_purge()
+        # A stale count must not get a referenced blob deleted
+        Blob.objects.filter(name=kept.resume.name).update(refcount=0)
+
+        self.assertEqual(blobs.collect_garbage(), (0, 0))
+        Blob.objects.update(last_used_at=timezone.now() - timedelta(days=2))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(blobs.collect_garbage(), (1, len(b"gone")))
+
+        storage = kept.resume.storage
+        self.assertFalse(storage.exists(purged_name))
+        self.assertTrue(storage.exists(kept.resume.name))
+        self.assertEqual(Blob.objects.get().refcount, 1)
+
+    def test_dedupe_moves_existing_files_into_blobs(self):
+        storage = FileSystemStorage()
+        legacy = [storage.save(f"portfolio/resumes/cv{n}.pdf", ContentFile(b"same resume")) for n in range(2)]
+        portfolios = [
+            Portfolio.objects.create(user=self.user, title=f"Legacy {n}") for n in range(2)
+        ]
+        for portfolio, name in zip(portfolios, legacy):
+            Portfolio.objects.filter(pk=portfolio.pk).update(resume=name)
+
+        report = blobs.deduplicate_media(dry_run=True)
+        self.assertEqual((report["files"], report["blobs"]), (2, 1))
+        self.assertTrue(storage.exists(legacy[0]))
+
+        blobs.deduplicate_media()
+        names = set(Portfolio.objects.values_list("resume", flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(name.startswith("blobs/"))
+        self.assertEqual(Blob.objects.get(name=name).refcount, 2)
+        self.assertFalse(any(storage.exists(old) for old in legacy))
+
+
+class MediaServingTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.name = FileSystemStorage().save("portfolio/resumes/cv.pdf", ContentFile(bytes(range(256)) * 40))
+        self.url = f"/media/{self.name}"
+
+    def test_whole_file_is_streamed_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(256)) * 40)
+        self.assertEqual(response["Content-Length"], "10240")
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", response)
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/10240")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(252, 256)))
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=20000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10240")
+
+        # A stale If-Range gets the whole file
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-0", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_blobs_are_immutable_and_tagged_by_hash(self):
+        user = User.objects.create_user(username="owner", password="secret")
+        portfolio = Portfolio.objects.create(
+            user=user, title="One", resume=SimpleUploadedFile("cv.pdf", b"%PDF blob"),
+        )
+        response = self.client.get(portfolio.resume.url)
+        self.assertEqual(response["ETag"], '"{}"'.format(portfolio.resume.name.split("/")[-1].split(".")[0]))
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_compressed_files_are_served_as_is(self):
+        archive = gzip.compress(b"x" * 2000)
+        name = FileSystemStorage().save("portfolio/resumes/sources.tar.gz", ContentFile(archive))
+        response = self.client.get(f"/media/{name}", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), archive)
+
+        name = FileSystemStorage().save("portfolio/resumes/notes.txt.bz2", ContentFile(b"BZh9"))
+        response = self.client.head(f"/media/{name}")
+        self.assertEqual(response["Content-Type"], "application/x-bzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @override_settings(MEDIA_OFFLOAD_HEADER="X-Accel-Redirect", MEDIA_OFFLOAD_PREFIX="/protected-media/")
+    def test_offload_to_web_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response.content, b"")
+
+    def test_paths_outside_media_root_are_not_served(self):
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/portfolio/resumes/missing.pdf").status_code, 404)
+        self.assertEqual(self.client.get("/media/portfolio/").status_code, 404)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="recruiter", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.berlin = Portfolio.objects.create(user=self.user, title="Platform engineer", bio="Based in Berlin")
+            Project.objects.create(portfolio=self.berlin, name="Cluster autoscaler", description="Kubernetes operators", tech_stack="Go")
+            Experience.objects.create(
+                portfolio=self.berlin, job_title="Backend developer", company_name="Acme",
+                location="Berlin", start_date=date(2020, 1, 1),
+            )
+            self.paris = Portfolio.objects.create(user=self.user, title="Kubernetes backend lead", bio="Paris")
+            self.kubernetes = Portfolio.objects.create(user=self.user, title="Kubernetes", bio="Backend work in Berlin")
+            Skill.objects.create(portfolio=self.kubernetes, name="Kubernetes", proficiency="Expert")
+            # Unrelated portfolios, so that term frequencies across documents mean something to the ranking
+            for n in range(10):
+                Portfolio.objects.create(user=self.user, title=f"Graphic designer {n}", bio="Illustration")
+
+    def hits(self, query):
+        response = self.client.get(reverse("search-list"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [result["id"] for result in response.data["results"]]
+
+    def test_every_term_must_match_and_titles_rank_first(self):
+        self.assertEqual(set(self.hits("kubernetes backend Berlin")), {str(self.kubernetes.pk), str(self.berlin.pk)})
+        # Title and skill matches outrank a mention in a project description
+        self.assertEqual(self.hits("kubernetes"), [str(self.kubernetes.pk), str(self.paris.pk), str(self.berlin.pk)])
+        # Stemming and prefix matching of the last word
+        self.assertEqual(self.hits("operator"), [str(self.berlin.pk)])
+        self.assertEqual(self.hits("autosca"), [str(self.berlin.pk)])
+        self.assertEqual(self.hits(""), [])
+
+    def test_index_follows_saves_and_soft_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            skill = Skill.objects.create(portfolio=self.paris, name="Terraform", proficiency="Advanced")
+        self.assertEqual(self.hits("terraform"), [str(self.paris.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.delete()
+        self.assertEqual(self.hits("terraform"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.restore()
+        self.assertEqual(self.hits("terraform"), [str(self.paris.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paris.delete()
+        self.assertEqual(self.hits("terraform"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paris.restore()
+        self.assertEqual(self.hits("terraform"), [str(self.paris.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.paris.title = "Infrastructure lead"
+            self.paris.save()
+        self.assertNotIn(str(self.paris.pk), self.hits("kubernetes backend"))
+
+    def test_portfolio_is_reindexed_once_per_transaction(self):
+        with mock.patch.object(search, "reindex", wraps=search.reindex) as reindex, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("portfolio-detail", args=[self.berlin.pk]))
+        self.assertEqual(response.status_code, 204)
+        reindex.assert_called_once_with({self.berlin.pk})
+        self.assertEqual(self.hits("operator"), [])
+
+    def test_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(5):
+                Portfolio.objects.create(user=self.user, title=f"Rust developer {n}")
+        response = self.client.get(reverse("search-list"), {"q": "rust", "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["previous"])
+        response = self.client.get(response.data["next"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(self.client.get(reverse("search-list"), {"q": "rust", "page": 0}).status_code, 404)
+
+    def test_rebuild_restores_missing_documents(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(search.rebuild(batch_size=4), 13)
+        self.assertEqual(set(self.hits("kubernetes backend Berlin")), {str(self.kubernetes.pk), str(self.berlin.pk)})
+
+
+class ProjectTagTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.portfolio = Portfolio.objects.create(user=self.user, title="Tags")
+
+    def project(self, tech_stack):
+        return Project.objects.create(portfolio=self.portfolio, name=tech_stack, description="-", tech_stack=tech_stack)
+
+    def test_parser_normalizes_and_splits(self):
+        self.assertEqual(
+            tags.parse_tech_stack("React.js, Django;  Node / CI/CD and PostgreSQL | react"),
+            [("react", "React.js"), ("django", "Django"), ("node.js", "Node"), ("ci/cd", "CI/CD"), ("postgresql", "PostgreSQL")],
+        )
+        self.assertEqual(tags.parse_tech_stack(None), [])
+
+    def test_tags_follow_tech_stack(self):
+        project = self.project("React, Django")
+        self.assertEqual(sorted(project.tags.values_list("slug", flat=True)), ["django", "react"])
+        project.tech_stack = "Django, Vue"
+        project.save()
+        self.assertEqual(sorted(project.tags.values_list("slug", flat=True)), ["django", "vue"])
+        self.assertEqual(Tag.objects.count(), 3)
+
+    def test_tech_filter_and_facets(self):
+        react = self.project("React, Django")
+        native = self.project("React Native")
+        both = self.project("ReactJS, django, Docker")
+
+        def ids(params):
+            response = self.client.get(reverse("project-list"), params)
+            return {row["id"] for row in response.data["results"]}
+
+        self.assertEqual(ids({"tech": "react"}), {str(react.pk), str(both.pk)})
+        self.assertEqual(ids({"tech": "React Native"}), {str(native.pk)})
+        self.assertEqual(ids({"tech": ["react", "docker"]}), {str(both.pk)})
+        self.assertCountEqual(self.client.get(reverse("project-detail", args=[both.pk])).data["tags"], ["react", "django", "docker"])
+
+        facets = self.client.get(reverse("project-facets"), {"tech": "django"}).data["tech"]
+        self.assertEqual(
+            [(facet["slug"], facet["count"]) for facet in facets],
+            [("django", 2), ("react", 2), ("docker", 1)],
+        )
+        for limit in ("-1", "0"):
+            response = self.client.get(reverse("project-facets"), {"limit": limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["tech"]), 1)
+
+    def test_backfill_and_archive_round_trip(self):
+        project = self.project("Go, gRPC")
+        Project.tags.through.objects.all().delete()
+        call_command("backfill_tech_tags", stdout=StringIO())
+        self.assertEqual(sorted(project.tags.values_list("slug", flat=True)), ["go", "grpc"])
+
+        Project.objects.filter(pk=project.pk).soft_delete(deleted_at=timezone.now() - timedelta(days=60))
+        archive.archive_soft_deleted(models=[Project])
+        self.assertFalse(Project.tags.through.objects.exists())
+        archive.restore_archived(Project, [project.pk])
+        self.assertEqual(sorted(project.tags.values_list("slug", flat=True)), ["go", "grpc"])
+
+
+class SkillStatLockTests(TransactionTestCase):
+    def test_saves_count_from_the_stored_row_locked_in_their_transaction(self):
+        user = User.objects.create_user(username="owner", password="secret")
+        skill = Skill.objects.create(portfolio=Portfolio.objects.create(user=user, title="Skills"), name="Go", proficiency="Beginner")
+        locked = []
+        select_for_update = QuerySet.select_for_update
+
+        def record(queryset, *args, **kwargs):
+            locked.append((queryset.model, connection.in_atomic_block))
+            return select_for_update(queryset, *args, **kwargs)
+
+        skill.proficiency = "Expert"
+        with mock.patch.object(QuerySet, "select_for_update", record):
+            skill.save()
+        self.assertEqual(locked, [(Skill, True)])
+        self.assertFalse(connection.in_atomic_block)
+        self.assertEqual(SkillStat.objects.get(skill="go", proficiency="Expert").count, 1)
+        self.assertEqual(SkillStat.objects.get(skill="go", proficiency="Beginner").count, 0)
+
+
+class SkillStatTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.portfolio = Portfolio.objects.create(user=self.user, title="Skills")
+
+    def counts(self):
+        stats = SkillStat.objects.filter(count__gt=0).exclude(proficiency=rollups.TOTAL)
+        return {(stat.skill, stat.proficiency): stat.count for stat in stats}
+
+    def totals(self):
+        return dict(SkillStat.objects.filter(proficiency=rollups.TOTAL, count__gt=0).values_list("skill", "count"))
+
+    def test_rollup_follows_skill_changes(self):
+        python = Skill.objects.create(portfolio=self.portfolio, name="Python", proficiency="Expert")
+        Skill.objects.create(portfolio=self.portfolio, name=" python ", proficiency="Expert")
+        go = Skill.objects.create(portfolio=self.portfolio, name="Golang", proficiency="Beginner")
+        self.assertEqual(self.counts(), {("python", "Expert"): 2, ("go", "Beginner"): 1})
+
+        python.proficiency = "Advanced"
+        python.save()
+        go.delete()
+        self.assertEqual(self.counts(), {("python", "Expert"): 1, ("python", "Advanced"): 1})
+        self.assertEqual(self.totals(), {"python": 2})
+
+        go.restore()
+        self.portfolio.delete()
+        self.assertEqual(self.counts(), {})
+        self.portfolio.restore()
+        self.assertEqual(self.counts(), {("python", "Expert"): 1, ("python", "Advanced"): 1, ("go", "Beginner"): 1})
+
+        Skill.objects.filter(pk=python.pk).hard_purge()
+        self.assertEqual(self.counts()[("python", "Advanced")], 1)
+        python.delete()
+        Skill.objects.filter(pk=python.pk).hard_purge()
+        self.assertNotIn(("python", "Advanced"), self.counts())
+
+    def test_reconcile_repairs_drift(self):
+        Skill.objects.create(portfolio=self.portfolio, name="Rust", proficiency="Advanced")
+        Skill.objects.filter(name="Rust").update(proficiency="Expert")
+        SkillStat.objects.filter(skill="rust").delete()
+        Skill.objects.bulk_create([Skill(portfolio=self.portfolio, name="Rust", proficiency="Expert")])
+
+        # The proficiency row and the total
+        self.assertEqual(rollups.reconcile_skill_stats(), 2)
+        self.assertEqual(self.counts(), {("rust", "Expert"): 2})
+        self.assertEqual(self.totals(), {"rust": 2})
+        self.assertEqual(rollups.reconcile_skill_stats(), 0)
+
+    def test_stats_endpoint_reads_only_the_rollup(self):
+        for proficiency in ("Expert", "Expert", "Advanced"):
+            Skill.objects.create(portfolio=self.portfolio, name="Python", proficiency=proficiency)
+        Skill.objects.create(portfolio=self.portfolio, name="Docker", proficiency="Beginner")
+
+        # The top totals, then the proficiencies of those skills
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("skill-stats"))
+        self.assertEqual(response.data["skills"][0], {
+            "skill": "python",
+            "name": "Python",
+            "total": 3,
+            "proficiency": {"Beginner": 0, "Intermediate": 0, "Advanced": 1, "Expert": 2},
+        })
+        self.assertEqual([entry["skill"] for entry in response.data["skills"]], ["python", "docker"])
+        response = self.client.get(reverse("skill-stats"), {"skill": "DOCKER"})
+        self.assertEqual([entry["skill"] for entry in response.data["skills"]], ["docker"])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("skill-stats"), {"limit": 1})
+        self.assertEqual([entry["skill"] for entry in response.data["skills"]], ["python"])
+        self.assertIn("LIMIT 1", ctx.captured_queries[0]["sql"])
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.template = Template.objects.create(name="Minimal", description="Plain")
+        self.portfolio = create_portfolio_tree(self.user, children=2, template=self.template)
+
+    def select_sql(self, queries, table):
+        return next(q["sql"] for q in queries if q["sql"].startswith("SELECT") and f'FROM "{table}"' in q["sql"])
+
+    def test_fields_trim_the_response_and_the_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("portfolio-list"), {"fields": "id,title,profile_image"})
+        self.assertEqual(list(response.data["results"][0]), ["id", "title", "profile_image"])
+        sql = self.select_sql(ctx.captured_queries, "api_portfolio")
+        self.assertIn('"api_portfolio"."title"', sql)
+        self.assertNotIn('"api_portfolio"."bio"', sql)
+
+        response = self.client.get(reverse("portfolio-detail", args=[self.portfolio.pk]), {"fields": "title"})
+        self.assertEqual(response.data, {"title": self.portfolio.title})
+
+    def test_expand_joins_the_related_rows(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("portfolio-list"), {"expand": "user,template", "fields": "id,user,template"})
+        result = response.data["results"][0]
+        self.assertEqual(result["user"]["username"], "owner")
+        self.assertEqual(result["template"]["name"], "Minimal")
+
+        response = self.client.get(reverse("skill-list"), {"expand": "portfolio"})
+        self.assertEqual(response.data["results"][0]["portfolio"]["title"], self.portfolio.title)
+        self.assertEqual(response.data["results"][0]["portfolio"]["template"], self.template.pk)
+
+    def test_expanded_users_hide_emails_and_staff_flags(self):
+        boss = User.objects.create_superuser(username="boss", email="boss@corp.com", password="secret")
+        create_portfolio_tree(boss)
+        Testimonial.objects.create(user=boss, author_name="Ann", testimonial_text="Great")
+        Contact.objects.create(user=boss, name="Boss", email="boss@corp.com", phone="1")
+        SocialLink.objects.create(user=boss, name="GitHub", url="https://github.com/boss")
+        for name in ("portfolio-list", "testimonial-list", "contact-list", "sociallink-list"):
+            response = self.client.get(reverse(name), {"expand": "user"})
+            users = [result["user"] for result in response.data["results"] if result["user"]["username"] == "boss"]
+            self.assertTrue(users, name)
+            for user in users:
+                self.assertEqual(set(user), {"id", "username", "first_name", "last_name"})
+        self.assertNotContains(self.client.get(reverse("portfolio-list"), {"expand": "user"}), "boss@corp.com")
+
+    def test_unrequested_relations_are_not_prefetched(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("project-list"))
+        self.assertCountEqual(response.data["results"][0]["tags"], ["django", "react"])
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("project-list"), {"fields": "id,name"})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_writes_ignore_the_parameters(self):
+        response = self.client.post(
+            reverse("skill-list") + "?fields=id&expand=portfolio",
+            {"portfolio": self.portfolio.pk, "name": "Go", "proficiency": "Beginner"},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["name"], "Go")
+        self.assertEqual(response.data["portfolio"], self.portfolio.pk)
+
+
+@override_settings(IMAGE_RENDER_INLINE=True, IMAGE_DERIVATIVE_WIDTHS=[96, 320], IMAGE_DERIVATIVE_FORMATS=["webp"])
+class FastReadPathTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.portfolio = create_portfolio_tree(self.user, children=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project = Project.objects.create(
+                portfolio=self.portfolio, name="Pictured", tech_stack="Go / Rust", image=image_upload(),
+            )
+        Experience.objects.create(
+            portfolio=self.portfolio, job_title="Lead", company_name="Acme", location="Berlin",
+            start_date=date(2021, 3, 1), end_date=date(2023, 6, 30), description="Led things",
+        )
+
+    def assertSameAsSerializer(self, url, params=None):
+        fast = self.client.get(url, params)
+        with mock.patch.object(fastpath, "compile_plan", return_value=None):
+            regular = self.client.get(url, params)
+        self.assertEqual(fast.status_code, regular.status_code)
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_output_is_byte_identical(self):
+        response = self.assertSameAsSerializer(reverse("project-list"))
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertSameAsSerializer(reverse("project-list"), {"page_size": 2, "fields": "id,tags,image"})
+        self.assertSameAsSerializer(reverse("project-detail", args=[self.project.pk]))
+        self.assertSameAsSerializer(reverse("experience-list"), {"count": "true"})
+        self.assertSameAsSerializer(reverse("experience-detail", args=[uuid.uuid4()]))
+        for basename in ("portfolio", "skill", "education", "testimonial"):
+            self.assertSameAsSerializer(reverse(f"{basename}-list"))
+
+        cursor = self.client.get(reverse("project-list"), {"page_size": 2}).data["next"]
+        self.assertSameAsSerializer(cursor)
+
+    def test_list_skips_model_instances(self):
+        with self.assertNumQueries(2):  # Rows and their tags
+            response = self.client.get(reverse("project-list"))
+        self.assertEqual(response.data["results"][0]["id"], str(self.project.pk))
+
+    def test_unsupported_fields_use_the_serializer(self):
+        serializer = ProjectViewSet(request=None, format_kwarg=None).get_serializer()
+        self.assertIsNotNone(fastpath.compile_plan(serializer))
+        response = self.assertSameAsSerializer(reverse("project-list"), {"expand": "portfolio"})
+        self.assertEqual(response.data["results"][0]["portfolio"]["title"], self.portfolio.title)
+
+    def test_fast_path_is_opt_in_and_skips_custom_representations(self):
+        with mock.patch.object(ProjectViewSet, "fast_reads", False), \
+                mock.patch.object(fastpath, "compile_plan", side_effect=AssertionError("fast path")):
+            self.assertEqual(self.client.get(reverse("project-list")).status_code, 200)
+
+        class ShoutedProjectSerializer(ProjectSerializer):
+            def to_representation(self, instance):
+                return {key: str(value).upper() for key, value in super().to_representation(instance).items()}
+
+        class ShoutedField(serializers.CharField):
+            def to_representation(self, value):
+                return value.upper()
+
+        class ShoutedNameSerializer(ProjectSerializer):
+            name = ShoutedField()
+
+        self.assertIsNone(fastpath.compile_plan(ShoutedProjectSerializer()))
+        self.assertIsNone(fastpath.compile_plan(ShoutedNameSerializer()))
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "day": date(2024, 2, 29),
+        "at": datetime(2024, 2, 29, 12, 30, 5, 120, tzinfo=dt_timezone.utc),
+        "price": Decimal("12.50"),
+        "text": "Zürich \u2028 line",
+        "nested": [{"n": 1, "ok": True, "none": None}],
+        7: "int key",
+    }
+
+    def test_renderer_matches_the_stdlib_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, "application/json; indent=2"),
+            JSONRenderer().render(self.data, "application/json; indent=2"),
+        )
+
+    def test_parser_matches_the_stdlib_parser(self):
+        body = '{"name": "Zürich", "values": [1, 2.5, null], "nested": {"a": "\\u2028"}}'.encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        with self.assertRaisesMessage(Exception, "JSON parse error"):
+            FastJSONParser().parse(BytesIO(b'{"value": NaN}'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"results": [' + b",".join(b'{"name": "Project %d"}' % i for i in range(50)) + b"]}"
+
+    def respond(self, response, accept_encoding="gzip, deflate"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware.CompressionMiddleware(lambda request: response)(request)
+
+    def test_large_json_is_gzipped(self):
+        response = self.respond(HttpResponse(self.body, content_type="application/json"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+
+    def test_small_binary_partial_and_refused_responses_are_untouched(self):
+        cases = [
+            (HttpResponse(b'{"a": 1}', content_type="application/json"), "gzip"),
+            (HttpResponse(self.body, content_type="image/png"), "gzip"),
+            (HttpResponse(self.body, content_type="application/json", status=206), "gzip"),
+            (HttpResponse(self.body, content_type="application/json"), "gzip;q=0, identity"),
+        ]
+        for response, accept_encoding in cases:
+            self.assertFalse(self.respond(response, accept_encoding).has_header("Content-Encoding"))
+
+    def test_streaming_responses_are_compressed_per_chunk(self):
+        chunks = [self.body[i:i + 256] for i in range(0, len(self.body), 256)]
+        response = self.respond(StreamingHttpResponse(iter(chunks), content_type="text/csv"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.body)
+
+    def test_negotiation_prefers_brotli_when_available(self):
+        expected = "br" if middleware.brotli is not None else "gzip"
+        self.assertEqual(middleware.choose_encoding("gzip, br"), expected)
+        self.assertEqual(middleware.choose_encoding("br;q=0.5, gzip;q=0.8"), "gzip")
+        self.assertEqual(middleware.choose_encoding("*"), expected)
+        self.assertIsNone(middleware.choose_encoding("identity"))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        user_cache.stats.reset()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = reverse("template-list")
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(2):  # User and templates
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        stats = user_cache.stats.as_dict()
+        self.assertEqual((stats["hits"], stats["misses"], stats["queries_saved"]), (1, 1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_changes_to_the_user_invalidate_the_entry(self):
+        self.client.get(self.url)
+
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("customuser-auth-cache-stats"))
+        self.assertEqual(response.status_code, 200)  # Already seen as staff
+
+        self.user.set_password("changed")
+        self.user.save(update_fields=["password"])
+        self.client.get(self.url)
+        self.user.delete()
+        self.client.get(self.url)
+        self.user.restore()
+        self.client.get(self.url)
+        self.assertEqual(user_cache.stats.as_dict()["misses"], 5)
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_inactive_users_are_refused_from_the_cache(self):
+        self.client.get(self.url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, 200)  # Bulk updates wait for the TTL
+        user_cache.invalidate([self.user.pk])
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_invalidation_reaches_every_worker_process(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        setup = "from types import SimpleNamespace\nfrom api.authentication import user_cache\n"
+        workers = [WorkerProcess(setup, SHARED_CACHE_LOCATION=location) for _ in range(2)]
+        for worker in workers:
+            self.addCleanup(worker.close)
+        get = "user_cache.get('7')"
+        for worker in workers:
+            worker.eval("user_cache.set('7', SimpleNamespace(is_staff=True), user_cache.version('7'))")
+        self.assertEqual([worker.eval(get) for worker in workers], ["namespace(is_staff=True)"] * 2)
+
+        workers[0].eval("user_cache.invalidate(['7'])")  # E.g. the user was demoted
+        self.assertEqual([worker.eval(get) for worker in workers], ["None"] * 2)
+
+    def test_entries_without_a_version_are_misses(self):
+        self.client.get(self.url)
+        user_cache.versions().clear()  # Versions expired or culled
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_entries_expire_and_are_bounded(self):
+        with override_settings(AUTH_USER_CACHE_TTL=0):
+            self.client.get(self.url)
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+        with override_settings(AUTH_USER_CACHE_SIZE=1):
+            other = User.objects.create_user(username="other", password="secret")
+            self.client.get(self.url)
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}")
+            self.client.get(self.url)
+        self.assertEqual(user_cache.stats.as_dict()["evictions"], 1)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates})
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("template-list")
+
+    def tearDown(self):
+        throttling.get_store().clear()
+
+    @throttle_rates(user="3/min", ip="100/min")
+    def test_requests_beyond_the_bucket_are_refused(self):
+        remaining = [self.client.get(self.url)["X-RateLimit-Remaining"] for _ in range(3)]
+        self.assertEqual(remaining, ["2", "1", "0"])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "20")
+        self.assertEqual((response["X-RateLimit-Limit"], response["X-RateLimit-Reset"]), ("3", "60"))
+
+        # Buckets are per user
+        self.client.force_authenticate(User.objects.create_user(username="other", password="secret"))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @throttle_rates(user="100/min", **{"template.list": "1/min"})
+    def test_actions_have_their_own_rates(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 429)
+        self.assertEqual(self.client.get(reverse("skill-list")).status_code, 200)
+
+    @throttle_rates(user="100/min", **{"template.list": "1/min"})
+    def test_refused_requests_take_no_tokens(self):
+        self.client.get(self.url)
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 429)
+        state = throttling.get_store().peek(f"user:{self.user.pk}", *throttling.parse_rate("100/min"))
+        self.assertEqual(state.remaining, 99)
+
+    @override_settings(THROTTLE_BACKEND="database")
+    @throttle_rates(user="100/min", ip="100/min", **{"template.list": "1/min"})
+    def test_refused_requests_take_no_tokens_from_the_database(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(8):  # Three takes of two queries, then the user and IP refunds
+            self.assertEqual(self.client.get(self.url).status_code, 429)
+        self.assertEqual(self.client.get(self.url).status_code, 429)
+        tokens = dict(ThrottleBucket.objects.values_list("key", "tokens"))
+        # Two refused requests would have left 97, less under a second of refill
+        self.assertEqual(int(tokens[f"user:{self.user.pk}"]), 99)
+        self.assertEqual(int(tokens["ip:127.0.0.1"]), 99)
+
+    def test_default_backend_is_shared_with_several_workers(self):
+        code = "import django; django.setup(); from django.conf import settings; print(settings.THROTTLE_BACKEND)"
+        for workers, backend in (("1", "local"), ("4", "database")):
+            env = {key: value for key, value in os.environ.items() if key != "THROTTLE_BACKEND"}
+            result = subprocess.run(
+                [sys.executable, "-c", code], env={**env, "SECRET_KEY": "test", "WEB_WORKERS": workers},
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True, timeout=30,
+            )
+            self.assertEqual(result.stdout.strip(), backend)
+
+    def test_buckets_refill(self):
+        store = throttling.LocalBucketStore()
+        self.assertTrue(store.take("key", 2, 1.0, now=100).allowed)
+        self.assertTrue(store.take("key", 2, 1.0, now=100).allowed)
+        state = store.take("key", 2, 1.0, now=100.5)
+        self.assertEqual((state.allowed, state.remaining, state.wait), (False, 0, 0.5))
+        self.assertTrue(store.take("key", 2, 1.0, now=101).allowed)
+        self.assertEqual(store.take("key", 2, 1.0, now=200).remaining, 1)  # Capped at the capacity
+
+    def test_database_store(self):
+        store = throttling.DatabaseBucketStore()
+        states = [store.take("user:1", 2, 1.0, now=100) for _ in range(3)]
+        self.assertEqual([state.allowed for state in states], [True, True, False])
+        self.assertEqual(states[2].wait, 1.0)
+        with self.assertNumQueries(2):  # Conditional UPDATE, then the remaining tokens
+            state = store.take("user:1", 2, 1.0, now=101.5)
+        self.assertEqual((state.allowed, state.remaining), (True, 0))
+        self.assertEqual(ThrottleBucket.objects.get().full_at, 103.0)
+
+        store.take("user:2", 2, 1.0, now=100)
+        self.assertEqual(store.purge(now=102), 1)
+        self.assertEqual(list(ThrottleBucket.objects.values_list("key", flat=True)), ["user:1"])
+
+    @override_settings(THROTTLE_BACKEND="database")
+    @throttle_rates(user="2/min")
+    def test_database_backend_is_shared(self):
+        self.client.get(self.url)
+        throttling._stores.clear()  # As seen from another worker process
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 429)
+
+
+@override_settings(ASYNC_READS=True, IMAGE_RENDER_INLINE=True, IMAGE_DERIVATIVE_WIDTHS=[96], IMAGE_DERIVATIVE_FORMATS=["webp"])
+class AsyncReadTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.portfolio = create_portfolio_tree(self.user, children=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project = Project.objects.create(portfolio=self.portfolio, name="Pictured", tech_stack="Go", image=image_upload())
+
+    async def assertSameAsSync(self, viewset, actions, params=None, **kwargs):
+        view = viewset.as_view(actions)
+        self.assertTrue(iscoroutinefunction(view))
+        with override_settings(ASYNC_READS=False):
+            sync_view = viewset.as_view(actions)
+        self.assertFalse(iscoroutinefunction(sync_view))
+
+        request = AsyncRequestFactory().get("/", params)
+        force_authenticate(request, self.user)
+        response = (await view(request, **kwargs)).render()
+        request = RequestFactory().get("/", params)
+        force_authenticate(request, self.user)
+        expected = await sync_to_async(lambda: sync_view(request, **kwargs).render())()
+        self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content))
+        return response
+
+    async def test_reads_match_the_sync_views(self):
+        response = await self.assertSameAsSync(ProjectViewSet, {"get": "list"})
+        self.assertEqual(len(response.data["results"]), 4)
+        with mock.patch.object(ProjectViewSet, "list", side_effect=AssertionError("not async")):
+            request = AsyncRequestFactory().get("/")
+            force_authenticate(request, self.user)
+            self.assertEqual((await ProjectViewSet.as_view({"get": "list"})(request)).status_code, 200)
+        await self.assertSameAsSync(ProjectViewSet, {"get": "list"}, {"page_size": 2, "count": "true", "tech": "go"})
+        await self.assertSameAsSync(ProjectViewSet, {"get": "retrieve"}, pk=self.project.pk)
+        await self.assertSameAsSync(SkillViewSet, {"get": "retrieve"}, pk="not-a-uuid")
+        await self.assertSameAsSync(SkillViewSet, {"get": "list"}, {"expand": "portfolio"})
+        response = await self.assertSameAsSync(PortfolioViewSet, {"get": "full"}, pk=self.portfolio.pk)
+        self.assertEqual(len(response.data["projects"]), 4)
+        pictured = next(project for project in response.data["projects"] if project["image"])
+        self.assertTrue(pictured["image"].startswith("http://testserver/media/blobs/"))
+        self.assertTrue(pictured["image_variants"]["webp"]["96"].startswith("http://testserver/media/blobs/"))
+        with mock.patch.object(PortfolioViewSet, "permission_classes", [DenyObjectPermission]):
+            await self.assertSameAsSync(PortfolioViewSet, {"get": "full"}, pk=self.portfolio.pk)
+
+    async def test_writes_use_the_sync_view(self):
+        view = SkillViewSet.as_view({"get": "list", "post": "create"})
+        request = AsyncRequestFactory().post("/", {"portfolio": str(self.portfolio.pk), "name": "Rust", "proficiency": "Expert"}, content_type="application/json")
+        force_authenticate(request, self.user)
+        response = await view(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Skill.objects.filter(name="Rust").aexists())
+
+        request = AsyncRequestFactory().get("/")
+        response = await view(request)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_middleware_runs_on_the_event_loop(self):
+        async def get_response(request):
+            return HttpResponse(b"x" * 2000, content_type="application/json")
+
+        compression = middleware.CompressionMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(compression))
+        response = await compression(AsyncRequestFactory().get("/", headers={"accept-encoding": "gzip"}))
+        self.assertEqual(gzip.decompress(response.content), b"x" * 2000)
+
+
+WORKER_SCRIPT = """
+import os, sys
+import django
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portfolio_cms.settings")
+django.setup()
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+if len(sys.argv) < 2:
+    token = AccessToken()
+    token["user_id"] = "42"
+    print(token)
+for argument in sys.argv[1:]:
+    try:
+        print(AccessToken(argument)["user_id"])
+    except TokenError:
+        print("invalid")
+"""
+
+
+class SecretKeyTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.key_file = os.path.join(directory, "keys", "secret_key.txt")
+
+    def run_workers(self, *argv, count=1, key_file=None):
+        """
+        Start ``count`` fresh processes at once, as a server's workers, and return their output.
+        """
+        env = {**os.environ, "SECRET_KEY_FILE": key_file or self.key_file, "LOGLEVEL": "WARNING"}
+        env.pop("SECRET_KEY", None)
+        processes = [
+            subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, *argv], cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, text=True)
+            for _ in range(count)
+        ]
+        return [process.communicate(timeout=60)[0].strip() for process in processes]
+
+    def test_every_worker_accepts_a_token_signed_by_another(self):
+        token, = self.run_workers()
+        self.assertEqual(self.run_workers(token, count=3), ["42", "42", "42"])
+        with open(self.key_file) as file:
+            self.assertEqual(len(file.read()), 50)
+
+        # Without the shared file, as before, every worker had its own key
+        other = os.path.join(os.path.dirname(self.key_file), "other.txt")
+        self.assertEqual(self.run_workers(token, key_file=other), ["invalid"])
+
+    def test_concurrent_first_starts_agree_on_one_key(self):
+        tokens = self.run_workers(count=3)
+        self.assertEqual(self.run_workers(*tokens), ["42\n42\n42"])
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.addCleanup(caches[settings.REPLICA_PIN_CACHE].clear)
+
+    def route(self, method, status=200, environ=None, **headers):
+        """
+        The database a read of ``method`` request's view goes to (None is the primary).
+        """
+        seen = []
+
+        def view(request):
+            seen.append(routers.ReplicaRouter().db_for_read(Project))
+            return HttpResponse(status=status)
+
+        request = getattr(RequestFactory(), method)("/", headers=headers, **(environ or {}))
+        middleware.ReplicaRoutingMiddleware(view)(request)
+        return seen[0]
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertEqual(self.route("get"), "replica1")
+        self.assertEqual(self.route("head"), "replica1")
+        self.assertIsNone(self.route("post", status=201))
+        self.assertIsNone(routers.ReplicaRouter().db_for_read(Project))  # Outside requests
+        self.assertEqual(routers.ReplicaRouter().db_for_write(Project), "default")
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertIsNone(self.route("get"))
+
+    def bearer(self, user_id):
+        token = AccessToken()
+        token["user_id"] = user_id
+        return {"authorization": f"Bearer {token}"}
+
+    def test_writers_are_pinned_to_the_primary(self):
+        editor, reader = self.bearer("7"), self.bearer("8")
+        self.route("patch", status=400, **editor)
+        self.assertEqual(self.route("get", **editor), "replica1")  # Failed writes change nothing
+
+        self.route("patch", **editor)
+        self.assertIsNone(self.route("get", **editor))
+        self.assertEqual(self.route("get", **reader), "replica1")
+        caches[settings.REPLICA_PIN_CACHE].clear()  # The pin window has passed
+        self.assertEqual(self.route("get", **editor), "replica1")
+
+    def test_pins_follow_the_user_across_tokens(self):
+        self.route("patch", **self.bearer("7"))
+        self.assertIsNone(self.route("get", **self.bearer("7")))  # E.g. after a token refresh
+        self.assertEqual(self.route("get", **self.bearer("8")), "replica1")
+        # Without a valid token, the session and then the address tell clients apart
+        self.assertEqual(self.route("get", authorization="Bearer forged"), "replica1")
+        self.route("patch", environ={"REMOTE_ADDR": "10.0.0.1"})
+        self.assertIsNone(self.route("get", environ={"REMOTE_ADDR": "10.0.0.1"}))
+
+    def test_pins_reach_every_worker_process(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        setup = (
+            "from django.test import RequestFactory\n"
+            "from api import routers\n"
+            f"headers = {self.bearer('7')!r}\n"
+        )
+        workers = [WorkerProcess(setup, SHARED_CACHE_LOCATION=location) for _ in range(2)]
+        for worker in workers:
+            self.addCleanup(worker.close)
+        pinned = "routers.is_pinned(RequestFactory().get('/', headers=headers))"
+        self.assertEqual([worker.eval(pinned) for worker in workers], ["False"] * 2)
+        workers[0].eval("routers.pin(RequestFactory().patch('/', headers=headers))")
+        self.assertEqual([worker.eval(pinned) for worker in workers], ["True"] * 2)
+
+    def test_transactions_and_cache_fills_read_from_the_primary(self):
+        with routers.replicas():
+            self.assertEqual(routers.ReplicaRouter().db_for_read(Project), "replica1")
+            with routers.primary():
+                self.assertIsNone(routers.ReplicaRouter().db_for_read(Project))
+            with transaction.atomic():
+                self.assertIsNone(routers.ReplicaRouter().db_for_read(Project))
+        self.assertFalse(routers.ReplicaRouter().allow_migrate("replica1", "api"))
+
+
+
+class QueryBudgetMixin:
+    """
+    ``assertWithinQueryBudget()`` requests an endpoint and fails when it runs
+    more queries than its viewset's ``query_budget`` allows for the action.
+    """
+    def assertWithinQueryBudget(self, method, path, data=None):
+        # Budgets include loading the JWT user, as on a user cache miss, and
+        # the work deferred until the request's transaction commits
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(path, data, format="json")
+        self.assertLess(response.status_code, 400, f"{method.upper()} {path}: {response.status_code}")
+        view, action, budget = instrumentation.resolve_budget(response.wsgi_request)
+        self.assertIsNotNone(budget, f"{view}.{action} has no query budget")
+        if len(queries) > budget:
+            self.fail("\n".join([
+                f"{view}.{action} ({method.upper()} {path}) ran {len(queries)} queries, over its budget of {budget}:",
+                *(f"{count}x {sql}" for sql, count in fingerprints(queries).most_common()),
+            ]))
+        return response
+
+
+def fingerprints(queries):
+    return Counter(instrumentation.fingerprint(query["sql"]) for query in queries.captured_queries)
+
+
+class QueryBudgetTests(QueryBudgetMixin, MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser(username="owner", email="owner@example.com", password="secret")
+        template = Template.objects.create(name="Minimal")
+        self.portfolio = create_portfolio_tree(self.user, children=3, template=template)
+        create_portfolio_tree(User.objects.create_user(username="second", password="secret"), children=3, template=template)
+        self.editor = User.objects.create_user(username="editor", password="secret", is_staff=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_every_endpoint_stays_within_its_budget(self):
+        portfolio = self.portfolio
+        endpoints = [
+            ("get", "/api/users/"),
+            ("get", f"/api/users/{self.editor.pk}/"),
+            ("get", "/api/users/auth-cache-stats/"),
+            ("get", "/api/portfolios/"),
+            ("get", f"/api/portfolios/{portfolio.pk}/"),
+            ("get", f"/api/portfolios/{portfolio.pk}/full/"),
+            ("get", "/api/portfolios/snapshot-stats/"),
+            ("patch", f"/api/portfolios/{portfolio.pk}/", {"title": "Renamed"}),
+            ("get", "/api/projects/?tech=django"),
+            ("get", f"/api/projects/{portfolio.projects.first().pk}/"),
+            ("get", "/api/projects/facets/"),
+            ("post", "/api/projects/", {"portfolio": str(portfolio.pk), "name": "New", "description": "New", "tech_stack": "Go, Vue"}),
+            ("get", "/api/skills/"),
+            ("get", "/api/skills/stats/"),
+            ("post", "/api/skills/", {"portfolio": str(portfolio.pk), "name": "Go", "proficiency": "Expert"}),
+            ("get", "/api/experiences/"),
+            ("get", "/api/educations/"),
+            ("get", "/api/contacts/"),
+            ("get", "/api/social-links/"),
+            ("get", "/api/testimonials/"),
+            ("get", "/api/templates/"),
+            ("get", "/api/search/?q=project"),
+            ("delete", f"/api/experiences/{portfolio.experiences.first().pk}/"),
+            ("post", "/api/users/", {"username": "x1", "password": "pw12345!", "email": "x@example.com"}),
+            ("patch", f"/api/users/{self.editor.pk}/", {"first_name": "A"}),
+            ("delete", f"/api/projects/{portfolio.projects.first().pk}/"),
+            ("patch", f"/api/projects/{portfolio.projects.last().pk}/", {"tech_stack": "Rust"}),
+            ("patch", f"/api/skills/{portfolio.skills.first().pk}/", {"name": "Rust"}),
+            ("delete", f"/api/skills/{portfolio.skills.first().pk}/"),
+            ("patch", f"/api/educations/{portfolio.educations.first().pk}/", {"degree": "MSc"}),
+            ("delete", f"/api/educations/{portfolio.educations.first().pk}/"),
+            ("get", f"/api/educations/{portfolio.educations.last().pk}/"),
+            ("post", "/api/contacts/", {"user": str(self.user.pk), "name": "C", "email": "c@example.com", "phone": "1"}),
+            ("delete", f"/api/contacts/{self.user.contacts.first().pk}/"),
+            ("post", "/api/social-links/", {"user": str(self.user.pk), "name": "L", "url": "https://example.com"}),
+            ("delete", f"/api/social-links/{self.user.social_links.first().pk}/"),
+            ("post", "/api/testimonials/", {"user": str(self.user.pk), "author_name": "T", "testimonial_text": "Good"}),
+            ("delete", f"/api/testimonials/{self.user.testimonials.first().pk}/"),
+            ("post", "/api/templates/", {"name": "T2"}),
+            ("delete", f"/api/templates/{Template.objects.first().pk}/"),
+            ("post", "/api/educations/", {"portfolio": str(portfolio.pk), "degree": "PhD", "institution": "U", "start_date": "2020-01-01"}),
+            ("post", "/api/experiences/", {"portfolio": str(portfolio.pk), "job_title": "E", "company_name": "C", "start_date": "2020-01-01"}),
+            ("post", "/api/portfolios/", {"user": str(User.objects.create_user(username="third", password="x").pk), "title": "P"}),
+            ("delete", f"/api/portfolios/{portfolio.pk}/"),
+            ("delete", f"/api/users/{self.editor.pk}/"),
+        ]
+        for method, path, *data in endpoints:
+            with self.subTest(method=method, path=path):
+                self.assertWithinQueryBudget(method, path, *data)
+
+    def test_exceeding_the_budget_fails_with_the_queries(self):
+        with mock.patch.object(SkillViewSet, "query_budget", {"default": 0}):
+            with self.assertRaisesRegex(AssertionError, r"SkillViewSet.list \(GET /api/skills/\) ran 2 queries, over its budget of 0:\n1x SELECT"):
+                self.assertWithinQueryBudget("get", "/api/skills/")
+
+    def test_server_timing_and_repeated_query_warnings(self):
+        response = self.client.get("/api/skills/")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="2 queries", app;dur=[\d.]+$')
+
+        def view(request):
+            for skill in Skill.objects.all()[:10]:
+                Portfolio.objects.get(pk=skill.portfolio_id)
+            return HttpResponse()
+
+        with self.assertLogs("api.queries", "INFO") as logs, override_settings(SQL_REPEAT_THRESHOLD=5):
+            instrumentation.QueryInstrumentationMiddleware(view)(RequestFactory().get("/skills/"))
+        self.assertEqual(logs.records[0].db_queries, 7)
+        self.assertIn('6x SELECT "api_portfolio"', logs.records[1].getMessage())
+        self.assertEqual(list(logs.records[1].db_repeated_queries.values()), [6])
+
+    def test_admin_pages_do_not_query_per_row(self):
+        for i in range(3):
+            create_portfolio_tree(User.objects.create_user(username=f"user{i}", password="secret"))
+        self.client.force_login(self.user)
+        pages = [f"admin:api_{model._meta.model_name}_changelist" for model in (Portfolio, Project, Skill, Experience, Education, Contact, SocialLink, Testimonial)]
+        pages += [f"admin:api_{model._meta.model_name}_add" for model in (Project, Skill, Experience, Education)]
+        for page in pages:
+            with self.subTest(page=page), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(page))
+                self.assertEqual(response.status_code, 200)
+                self.assertLess(max(fingerprints(queries).values()), 3)
+
+
+@override_settings(INTERNAL_IPS=["127.0.0.1"])
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", password="secret")
+        self.portfolio = create_portfolio_tree(self.user)
+        metrics.registry.reset()
+
+    def scrape(self, **headers):
+        response = self.client.get("/metrics", headers=headers)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_handler(self):
+        headers = {"authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.client.get("/api/skills/", headers=headers)
+        self.client.get(f"/api/skills/{uuid.uuid4()}/", headers=headers)
+        self.client.get(f"/api/portfolios/{self.portfolio.pk}/full/", headers=headers)
+        self.client.get("/api/skills/")
+
+        text = self.scrape()
+        self.assertIn('http_requests_total{handler="SkillViewSet.list",method="GET",status="200"} 1\n', text)
+        self.assertIn('http_requests_total{handler="SkillViewSet.list",method="GET",status="401"} 1\n', text)
+        self.assertIn('http_request_errors_total{handler="SkillViewSet.retrieve",status="404"} 1\n', text)
+        self.assertIn('http_request_duration_seconds_bucket{handler="SkillViewSet.list",method="GET",le="+Inf"} 2\n', text)
+        self.assertIn('db_query_duration_seconds_count{handler="SkillViewSet.list"} 2\n', text)
+        self.assertIn('http_response_size_bytes_count{handler="PortfolioViewSet.full"} 1\n', text)
+        self.assertIn('auth_duration_seconds_count{backend="jwt",outcome="authenticated"} 3\n', text)
+        self.assertIn('auth_duration_seconds_count{backend="jwt",outcome="anonymous"} 1\n', text)
+        self.assertIn('cache_duration_seconds_count{cache="snapshots",result="miss"} 1\n', text)
+        self.assertIn("# TYPE http_request_duration_seconds histogram\n", text)
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic("PURGE", "/api/skills/")
+        self.client.generic("X-RANDOM-1234", "/api/skills/")
+        text = self.scrape()
+        self.assertIn('http_requests_total{handler="SkillViewSet.other",method="other",status="401"} 2\n', text)
+        self.assertIn('http_request_duration_seconds_count{handler="SkillViewSet.other",method="other"} 2\n', text)
+        self.assertNotIn("purge", text.lower())
+
+    def test_scrapes_sum_the_files_of_all_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        exited = subprocess.Popen([sys.executable, "-c", ""])
+        exited.wait()
+        key = ("http_requests_total", ("SkillViewSet.list", "GET", "200"))
+        metrics.write_values(os.path.join(directory, f"{exited.pid}-exited.json"), {key: 2})
+        metrics.write_values(os.path.join(directory, f"{os.getppid()}-running.json"), {key: 3})
+        metrics.requests_total.inc(*key[1])
+
+        with override_settings(METRICS_DIR=directory):
+            self.assertEqual(metrics.registry.collect()[key], 6)
+            # The exited worker's values moved to the archive and still count
+            self.assertNotIn(f"{exited.pid}-exited.json", os.listdir(directory))
+            self.assertIn(metrics.ARCHIVE, os.listdir(directory))
+            self.assertEqual(metrics.registry.collect()[key], 6)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_token_protects_the_endpoint(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertIn("http_requests_total", self.scrape(authorization="Bearer scrape-token"))
+
+    @override_settings(INTERNAL_IPS=[])
+    def test_endpoint_is_closed_without_token_or_internal_ips(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.8").status_code, 403)
+        with override_settings(INTERNAL_IPS=["10.0.0.8"]):
+            self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.8").status_code, 200)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(PROFILING_ENABLED=True, PROFILE_DIR=directory, PROFILE_SAMPLE_RATE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.staff = User.objects.create_user(username="staff", password="secret", is_staff=True)
+        self.user = User.objects.create_user(username="owner", password="secret")
+        create_portfolio_tree(self.user)
+
+    def get(self, user, path="/api/skills/", **headers):
+        return self.client.get(path, headers={"authorization": f"Bearer {AccessToken.for_user(user)}", **headers})
+
+    def test_staff_can_profile_a_request(self):
+        response = self.get(self.staff, "/api/skills/?profile")
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual((profile.handler, profile.trigger, profile.user), ("SkillViewSet.list", RequestProfile.REQUESTED, self.staff))
+        with open(profile.path_on_disk) as file:
+            counts = [int(line.rsplit(" ", 1)[1]) for line in file]
+        self.assertEqual(sum(counts), profile.samples)
+
+        profile.delete()
+        self.assertFalse(os.path.exists(profile.path_on_disk))
+
+    def test_other_users_cannot_profile_requests(self):
+        for response in (self.get(self.user, x_profile="1"), self.client.get("/api/skills/?profile")):
+            self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_requests_are_sampled_at_the_sample_rate(self):
+        with override_settings(PROFILE_SAMPLE_RATE=1):
+            response = self.get(self.user)
+        self.assertEqual(RequestProfile.objects.get(pk=response["X-Profile-Id"]).trigger, RequestProfile.SAMPLED)
+
+    def test_long_methods_fit_the_profile(self):
+        with override_settings(PROFILE_SAMPLE_RATE=1):
+            response = self.client.generic("VERSION-CONTROL", "/api/skills/")
+        profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+        self.assertEqual((profile.method, profile.handler), ("VERSION-CO", "SkillViewSet.other"))
+
+    def test_sampler_records_the_running_code(self):
+        def busy():
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+
+        sampler = profiling.StackSampler({threading.get_ident()}, interval=0.001).start()
+        busy()
+        stacks = sampler.stop()
+        self.assertTrue(any(";busy (api/tests.py:" in stack for stack in stacks))
+        self.assertEqual(profiling.fold(sys._getframe(), root=sys._getframe().f_code), "")
+
+    def test_purge_deletes_old_profiles_and_files(self):
+        old = self.get(self.staff, x_profile="1")["X-Profile-Id"]
+        new = self.get(self.staff, x_profile="1")["X-Profile-Id"]
+        RequestProfile.objects.filter(pk=old).update(created_at=timezone.now() - timedelta(days=settings.PROFILE_RETENTION_DAYS + 1))
+        path = RequestProfile.objects.get(pk=old).path_on_disk
+
+        call_command("purge_profiles", stdout=StringIO())
+        self.assertEqual(list(RequestProfile.objects.values_list("pk", flat=True)), [uuid.UUID(new)])
+        self.assertFalse(os.path.exists(path))
+
+    def test_admin_shows_and_downloads_profiles(self):
+        User.objects.create_superuser(username="admin", password="secret")
+        profile = RequestProfile.objects.get(pk=self.get(self.staff, x_profile="1")["X-Profile-Id"])
+        self.client.login(username="admin", password="secret")
+
+        self.assertContains(self.client.get(reverse("admin:api_requestprofile_changelist")), "SkillViewSet.list")
+        self.assertContains(self.client.get(reverse("admin:api_requestprofile_change", args=[profile.pk])), "Hottest functions")
+        response = self.client.get(reverse("admin:api_requestprofile_download", args=[profile.pk]))
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="{profile.file}"')
+        with open(profile.path_on_disk, "rb") as file:
+            self.assertEqual(b"".join(response.streaming_content), file.read())
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_users_with_all_their_rows(self):
+        out = StringIO()
+        call_command("generate_data", users=25, batch_size=10, seed=7, stdout=out)
+        self.assertIn("Created 25 user(s)", out.getvalue())
+
+        portfolios = Portfolio.objects.all()
+        self.assertEqual((User.objects.count(), portfolios.count()), (25, 25))
+        self.assertTrue(User.objects.get(username="user0").check_password("password"))
+        for model in (Project, Skill, Experience, Education, Testimonial, Contact, SocialLink):
+            self.assertTrue(model.objects.exists(), model.__name__)
+        # What the signal receivers maintain for single saves is filled in too
+        self.assertEqual(SearchDocument.objects.count(), 25)
+        self.assertFalse(Project.objects.filter(tags=None).exclude(tech_stack="").exists())
+        self.assertEqual(sum(SkillStat.objects.exclude(proficiency=rollups.TOTAL).values_list("count", flat=True)), Skill.objects.count())
+        self.assertEqual(sum(SkillStat.objects.filter(proficiency=rollups.TOTAL).values_list("count", flat=True)), Skill.objects.count())
+        out = StringIO()
+        call_command("reconcile_skill_stats", stdout=out)
+        self.assertIn("Corrected 0 skill counter(s)", out.getvalue())
+
+    def test_same_seed_generates_same_data_and_numbering_continues(self):
+        call_command("generate_data", users=3, seed=1, stdout=StringIO())
+        first = list(Skill.objects.order_by("portfolio__user__username", "name").values_list("name", "proficiency"))
+        call_command("generate_data", users=3, seed=1, stdout=StringIO())
+
+        self.assertEqual(sorted(User.objects.values_list("username", flat=True)), [f"user{number}" for number in range(6)])
+        second = Skill.objects.filter(portfolio__user__username__in=["user3", "user4", "user5"])
+        self.assertEqual(list(second.order_by("portfolio__user__username", "name").values_list("name", "proficiency")), first)
@@ -0,0 +1,277 @@
+"""
+Token-bucket request throttling.
+
+Every throttle key owns a bucket of ``N`` tokens for a rate of ``"N/period"``
+(DRF's rate format, e.g. ``"600/min"``), refilled continuously at ``N`` per
+period. A request takes one token from each of its buckets and is refused with
+429 and ``Retry-After`` when one is empty, so clients may burst up to ``N``
+requests and then keep to the rate. A refused request is not charged: tokens
+already taken for it are given back, and its remaining buckets are only read.
+
+The throttles in ``REST_FRAMEWORK["DEFAULT_THROTTLE_CLASSES"]`` key buckets
+per user (``user``), per client IP (``ip``) and per viewset action
+(``<basename>.<action>``, e.g. ``portfolio.list``, per user or IP). Rates come
+from ``DEFAULT_THROTTLE_RATES``; a scope without a rate is not throttled.
+
+Buckets live in the backend named by ``THROTTLE_BACKEND``:
+
+- ``local``: a dict in each worker process. No I/O, but every process counts
+  on its own, so a client gets the rate once per worker. The default with a
+  single worker.
+- ``database``: ``ThrottleBucket`` rows, shared by every worker. Taking a
+  token is one conditional UPDATE, so concurrent requests never overdraw a
+  bucket. ``purge_throttle_buckets`` deletes the rows of idle buckets. The
+  default with several workers (``WEB_WORKERS``).
+
+``RateLimitHeadersMiddleware`` adds ``X-RateLimit-Limit``,
+``X-RateLimit-Remaining`` and ``X-RateLimit-Reset`` for the most restrictive
+bucket of the request.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import router
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .models import ThrottleBucket
+
+BACKENDS = {
+    "local": "api.throttling.LocalBucketStore",
+    "database": "api.throttling.DatabaseBucketStore",
+}
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    ``(capacity, tokens per second)`` of a ``"N/period"`` rate, or None.
+    """
+    if not rate:
+        return None
+    count, period = rate.split("/")
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class BucketState:
+    """
+    Outcome of taking a token: whether it was granted, the whole tokens left,
+    and the seconds until the next token and until the bucket is full.
+    """
+    __slots__ = ("allowed", "capacity", "remaining", "wait", "reset")
+
+    def __init__(self, allowed, capacity, tokens, rate):
+        self.allowed = allowed
+        self.capacity = capacity
+        self.remaining = max(int(tokens), 0)
+        self.wait = 0.0 if allowed else (1 - tokens) / rate
+        self.reset = (capacity - tokens) / rate
+
+
+class LocalBucketStore:
+    """
+    Buckets in a dict of this process. Once there are more than ``max_keys``,
+    the buckets that are full again are dropped; they would start full anyway.
+    """
+    max_keys = 100_000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now=None):
+        return self._change(key, capacity, rate, now, -1)
+
+    def peek(self, key, capacity, rate, now=None):
+        """
+        State of the bucket, taking nothing.
+        """
+        return self._change(key, capacity, rate, now, 0)
+
+    def refund(self, key, capacity, rate, now=None):
+        """
+        Give back a token taken for a request that was refused after all.
+        """
+        self._change(key, capacity, rate, now, 1)
+
+    def _change(self, key, capacity, rate, now, change):
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= 1
+            if change and (allowed or change > 0):
+                tokens = min(capacity, tokens + change)
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        return BucketState(allowed, capacity, tokens, rate)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBucketStore:
+    """
+    Buckets in the ``ThrottleBucket`` table, shared by every worker process.
+    """
+    def take(self, key, capacity, rate, now=None):
+        now = time.time() if now is None else now
+        buckets = ThrottleBucket.objects.using(router.db_for_write(ThrottleBucket))
+        refilled = Least(Value(float(capacity)), F("tokens") + (Value(now) - F("updated_at")) * Value(rate))
+        for _ in range(2):
+            # Takes a token only if the refilled bucket holds one, in a single statement
+            taken = buckets.filter(
+                key=key, tokens__gte=Value(1.0) - (Value(now) - F("updated_at")) * Value(rate),
+            ).update(
+                tokens=refilled - 1,
+                updated_at=now,
+                full_at=Value(now) + (Value(float(capacity)) - refilled + 1) / Value(rate),
+            )
+            bucket = buckets.filter(key=key).values_list("tokens", "updated_at").first()
+            if bucket is not None:
+                tokens, updated_at = bucket
+                if not taken:
+                    tokens = min(capacity, tokens + (now - updated_at) * rate)
+                return BucketState(bool(taken), capacity, tokens, rate)
+            # First request of this key: create a full bucket, unless a concurrent request just did
+            buckets.bulk_create([ThrottleBucket(key=key, tokens=capacity, updated_at=now, full_at=now)], ignore_conflicts=True)
+        raise RuntimeError(f"Throttle bucket {key!r} disappeared")
+
+    def peek(self, key, capacity, rate, now=None):
+        """
+        State of the bucket, taking nothing.
+        """
+        now = time.time() if now is None else now
+        bucket = ThrottleBucket.objects.using(router.db_for_write(ThrottleBucket)).filter(key=key).values_list("tokens", "updated_at").first()
+        tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        return BucketState(tokens >= 1, capacity, tokens, rate)
+
+    def refund(self, key, capacity, rate, now=None):
+        """
+        Give back a token taken for a request that was refused after all.
+        """
+        now = time.time() if now is None else now
+        refilled = Least(Value(float(capacity)), F("tokens") + (Value(now) - F("updated_at")) * Value(rate) + 1)
+        ThrottleBucket.objects.using(router.db_for_write(ThrottleBucket)).filter(key=key).update(
+            tokens=refilled,
+            updated_at=now,
+            full_at=Value(now) + (Value(float(capacity)) - refilled) / Value(rate),
+        )
+
+    def purge(self, now=None):
+        """
+        Delete the rows of buckets that are full again. Returns the number deleted.
+        """
+        now = time.time() if now is None else now
+        return ThrottleBucket.objects.filter(full_at__lte=now).delete()[0]
+
+    def clear(self):
+        ThrottleBucket.objects.all().delete()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """
+    The process-wide store of the ``THROTTLE_BACKEND`` backend.
+    """
+    backend = settings.THROTTLE_BACKEND
+    store = _stores.get(backend)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(backend, import_string(BACKENDS[backend])())
+    return store
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Base class: subclasses set ``scope`` and implement ``get_key()``.
+    """
+    scope = None
+
+    def get_rate(self, request, view):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.state = None
+        rate = parse_rate(self.get_rate(request, view))
+        key = self.get_key(request, view) if rate else None
+        if key is None:
+            return True
+        store = get_store()
+        # Tokens taken so far for this request, or None once a bucket refused it
+        taken = getattr(request._request, "rate_limit_taken", [])
+        if taken is None:
+            self.state = store.peek(key, *rate)
+        else:
+            self.state = store.take(key, *rate)
+            if self.state.allowed:
+                taken.append((key, *rate))
+            else:
+                for bucket in taken:
+                    store.refund(*bucket)
+                taken = None
+            request._request.rate_limit_taken = taken
+        # Read by RateLimitHeadersMiddleware from the underlying HttpRequest
+        states = getattr(request._request, "rate_limits", [])
+        states.append(self.state)
+        request._request.rate_limits = states
+        return self.state.allowed
+
+    def wait(self):
+        return self.state.wait if self.state is not None else None
+
+    def client_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+
+class UserBucketThrottle(BucketThrottle):
+    """
+    One bucket per authenticated user; anonymous requests are left to the IP throttle.
+    """
+    scope = "user"
+
+    def get_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return None
+
+
+class IPBucketThrottle(BucketThrottle):
+    """
+    One bucket per client IP, see DRF's ``NUM_PROXIES`` for clients behind proxies.
+    """
+    scope = "ip"
+
+    def get_key(self, request, view):
+        return f"ip:{self.get_ident(request)}"
+
+
+class ActionBucketThrottle(BucketThrottle):
+    """
+    One bucket per viewset action and user (or IP), rated by the
+    ``"<basename>.<action>"`` entry of ``DEFAULT_THROTTLE_RATES``.
+    """
+    def get_rate(self, request, view):
+        basename, action = getattr(view, "basename", None), getattr(view, "action", None)
+        if not basename or not action:
+            return None
+        self.scope = f"{basename}.{action}"
+        return super().get_rate(request, view)
+
+    def get_key(self, request, view):
+        return f"{self.scope}:{self.client_key(request)}"
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     UserViewSet, PortfolioViewSet, ProjectViewSet, SkillViewSet, 
     ExperienceViewSet, EducationViewSet, ContactViewSet, SocialLinkViewSet, 
-    TestimonialViewSet, TemplateViewSet
+    TestimonialViewSet, TemplateViewSet, SearchViewSet
 )
 
 # Create a router and register the viewsets with it
@@ -19,6 +19,7 @@ router.register(r'contacts', ContactViewSet)
 router.register(r'social-links', SocialLinkViewSet)
 router.register(r'testimonials', TestimonialViewSet)
 router.register(r'templates', TemplateViewSet)
+router.register(r'search', SearchViewSet, basename='search')
 
 # The API URLs are now determined automatically by the router
 urlpatterns = [
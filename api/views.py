@@ -1,21 +1,39 @@
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 from django.contrib.auth import get_user_model 
+from django.db.models import Count
+from . import rollups, search, snapshots, tags
+from .asyncviews import AsyncReadMixin
+from .authentication import user_cache
+from .fieldsets import SparseQuerysetMixin
+from .pagination import RankedPagination
 from .models import (
     Portfolio, Project, Skill, Experience, Education,
-    Contact, SocialLink, Testimonial, Template
+    Contact, SocialLink, Testimonial, Template, Tag
 )
 from .serializers import (
     CustomUserSerializer, PortfolioSerializer, ProjectSerializer, SkillSerializer, 
     ExperienceSerializer, EducationSerializer, ContactSerializer, SocialLinkSerializer, 
-    TestimonialSerializer, TemplateSerializer
+    TestimonialSerializer, TemplateSerializer, PortfolioDocumentSerializer, SearchResultSerializer
 )
 
 # User ViewSet
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+# Every viewset declares query_budget, the most queries each action may run
+# (api/instrumentation.py), including loading the JWT user. Reads stay constant
+# in the number of rows; writes include the snapshot, search and rollup updates
+# of the signal handlers, the search reindex running once the write commits.
+# Viewsets whose serializers the fast read path reproduces byte for byte set
+# fast_reads (api/fastpath.py).
+class UserViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
+    query_budget = {"default": 3, "create": 4, "update": 5, "partial_update": 5, "destroy": 10}
 
     def get_queryset(self):
         # Check if user is staff or superuser, and if not, filter out soft-deleted users
@@ -28,32 +46,130 @@ class UserViewSet(viewsets.ModelViewSet):
             return queryset.all()
         else:
             return queryset.filter(is_deleted=False, is_staff=False, is_superuser=False)
+
+    @action(detail=False, methods=["get"], url_path="auth-cache-stats", permission_classes=[IsAdminUser])
+    def auth_cache_stats(self, request):
+        """
+        Hit ratio and database queries saved by the JWT user cache in this worker process.
+        """
+        return Response(user_cache.stats.as_dict())
             
 
 
 # Portfolio ViewSet
-class PortfolioViewSet(viewsets.ModelViewSet):
+class PortfolioViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Portfolio.objects.all()
     serializer_class = PortfolioSerializer
+    query_budget = {"default": 3, "full": 11, "create": 9, "update": 13, "partial_update": 13, "destroy": 26}
+    fast_reads = True
+    async_actions = {**AsyncReadMixin.async_actions, "full": "afull"}
+
+    def get_serializer_class(self):
+        if self.action == "full":
+            return PortfolioDocumentSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "full":
+            # Only looked up for visibility and permissions; the document is the snapshot
+            return queryset.only("pk", "user_id")
+        return queryset
+
+    @action(detail=True, methods=["get"])
+    def full(self, request, pk=None):
+        """
+        Return the portfolio, its template and every active child collection as one document.
+        Served from the snapshot cache, once the portfolio passes the same
+        queryset and permission checks as ``retrieve``.
+        """
+        portfolio = self.get_object()
+        document = snapshots.get_snapshot(portfolio.pk)
+        if document is None:
+            raise NotFound()
+        return Response(snapshots.absolute_media_urls(document, request))
+
+    async def afull(self, request, pk=None):
+        portfolio = await self.aget_object()
+        document = await snapshots.aget_snapshot(portfolio.pk)
+        if document is None:
+            raise NotFound()
+        return Response(snapshots.absolute_media_urls(document, request))
+
+    @action(detail=False, methods=["get"], url_path="snapshot-stats", permission_classes=[IsAdminUser])
+    def snapshot_stats(self, request):
+        """
+        Hit/miss counters of the portfolio snapshot cache in this worker process.
+        """
+        return Response(snapshots.stats.as_dict())
 
 # Project ViewSet
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+class ProjectViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Project.objects.prefetch_related("tags")
     serializer_class = ProjectSerializer
+    query_budget = {"default": 3, "create": 16, "update": 19, "partial_update": 19, "destroy": 15}
+    fast_reads = True
+
+    def get_queryset(self):
+        # ?tech=react&tech=django: projects using every listed technology
+        return tags.filter_by_tech(super().get_queryset(), self.request.query_params.getlist("tech"))
+
+    @extend_schema(parameters=[OpenApiParameter("tech", str, many=True, description="Only projects using this technology")])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(parameters=[OpenApiParameter("tech", str, many=True, description="Only count projects using this technology")])
+    @action(detail=False, methods=["get"])
+    def facets(self, request):
+        """
+        Number of matching projects per technology, most used first.
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 50)), 500))
+        except ValueError:
+            limit = 50
+        projects = self.filter_queryset(self.get_queryset()).values("pk")
+        counts = (
+            Tag.objects.filter(projects__in=projects)
+            .annotate(count=Count("projects"))
+            .order_by("-count", "slug")
+            .values("slug", "name", "count")[:limit]
+        )
+        return Response({"tech": list(counts)})
 
 # Skill ViewSet
-class SkillViewSet(viewsets.ModelViewSet):
+class SkillViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
+    query_budget = {"default": 2, "stats": 3, "create": 15, "update": 16, "partial_update": 16, "destroy": 16}
+    fast_reads = True
 
     def get_queryset(self):
         queryset = super().get_queryset()
         return queryset.filter(is_deleted=False)
 
+    @extend_schema(parameters=[
+        OpenApiParameter("skill", str, description="Only this skill, e.g. python"),
+        OpenApiParameter("limit", int, description="Number of skills, most used first (default 50, at most 500)"),
+    ])
+    @action(detail=False, methods=["get"])
+    def stats(self, request):
+        """
+        Number of active skills per proficiency for the most used skills, read
+        from the SkillStat rollup.
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 50)), 500))
+        except ValueError:
+            limit = 50
+        return Response({"skills": rollups.skill_popularity(request.query_params.get("skill"), limit=limit)})
+
 # Experience ViewSet
-class ExperienceViewSet(viewsets.ModelViewSet):
+class ExperienceViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Experience.objects.all()
     serializer_class = ExperienceSerializer
+    query_budget = {"default": 2, "create": 9, "update": 9, "partial_update": 9, "destroy": 14}
+    fast_reads = True
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -61,18 +177,22 @@ class ExperienceViewSet(viewsets.ModelViewSet):
 
 
 # Education ViewSet
-class EducationViewSet(viewsets.ModelViewSet):
+class EducationViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Education.objects.all()
     serializer_class = EducationSerializer
+    query_budget = {"default": 2, "create": 9, "update": 9, "partial_update": 9, "destroy": 14}
+    fast_reads = True
 
     def get_queryset(self):
         queryset = super().get_queryset()
         return queryset.filter(is_deleted=False)
 
 # Contact ViewSet
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
+    query_budget = {"default": 2, "create": 5, "update": 6, "partial_update": 6, "destroy": 8}
+    fast_reads = True
     
     # Add custom methods
     # IF is_deleted is True, Filter out deleted objects
@@ -82,16 +202,44 @@ class ContactViewSet(viewsets.ModelViewSet):
     
 
 # SocialLink ViewSet
-class SocialLinkViewSet(viewsets.ModelViewSet):
+class SocialLinkViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = SocialLink.objects.all()
     serializer_class = SocialLinkSerializer
+    query_budget = {"default": 2, "create": 5, "update": 6, "partial_update": 6, "destroy": 8}
+    fast_reads = True
 
 # Testimonial ViewSet
-class TestimonialViewSet(viewsets.ModelViewSet):
+class TestimonialViewSet(AsyncReadMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Testimonial.objects.all()
     serializer_class = TestimonialSerializer
+    query_budget = {"default": 2, "create": 5, "update": 6, "partial_update": 6, "destroy": 8}
+    fast_reads = True
 
 # Template ViewSet
-class TemplateViewSet(viewsets.ModelViewSet):
+class TemplateViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     queryset = Template.objects.all()
     serializer_class = TemplateSerializer
+    query_budget = {"default": 2, "create": 3, "update": 9, "partial_update": 9, "destroy": 7}
+
+# Search ViewSet
+class SearchViewSet(viewsets.GenericViewSet):
+    """
+    Ranked full-text search over portfolio titles, bios, projects, experiences,
+    educations and skills. Every word of ``q`` must match.
+    """
+    queryset = Portfolio.objects.none()
+    serializer_class = SearchResultSerializer
+    query_budget = {"default": 3}
+    pagination_class = RankedPagination
+
+    @extend_schema(parameters=[OpenApiParameter("q", str, description="Search terms, e.g. kubernetes backend Berlin")])
+    def list(self, request):
+        query = request.query_params.get("q", "")
+        hits = self.paginator.paginate_hits(
+            lambda limit, offset: search.search(query, limit=limit, offset=offset), request,
+        )
+        scores = dict(hits)
+        portfolios = Portfolio.objects.filter(pk__in=scores, is_deleted=False).select_related("user").in_bulk()
+        results = [portfolios[pk] for pk, _ in hits if pk in portfolios]
+        serializer = self.get_serializer(results, many=True, context={**self.get_serializer_context(), "scores": scores})
+        return self.paginator.get_paginated_response(serializer.data)
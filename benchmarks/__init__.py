@@ -0,0 +1,16 @@
+"""
+Benchmarks for the Portfolio CMS API. Run each module from the repository root,
+e.g. ``python -m benchmarks.images``. Results are printed as JSON.
+"""
+import os
+
+
+def setup_django():
+    """
+    Configure Django for benchmarks that touch the ORM or views.
+    """
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portfolio_cms.settings")
+    os.environ.setdefault("LOGLEVEL", "WARNING")
+    django.setup()
@@ -0,0 +1,66 @@
+"""
+Concurrent-connection throughput of the WSGI and ASGI deployments.
+
+Builds a SQLite database with ``--rows`` projects and experiences, then runs
+gunicorn with gunicorn.conf.py once per interface (``SERVER_INTERFACE=wsgi``
+with threaded sync workers, ``asgi`` with uvicorn workers and ``ASYNC_READS``)
+and drives each with ``--connections`` keep-alive connections requesting
+project and experience list pages, single projects and the full portfolio:
+
+    python -m benchmarks.asgi --connections 64 --duration 15 --workers 2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from benchmarks import load, setup_django
+from benchmarks.serialization import populate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--connections", default="8,64", help="Comma-separated concurrent connection counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes per server")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    databases = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(directory, "benchmark.sqlite3")}}
+    try:
+        with load.settings_module(databases) as settings_directory:
+            setup_django()
+            from django.core.management import call_command
+            from rest_framework_simplejwt.tokens import AccessToken
+
+            from api.models import Portfolio, Project
+
+            call_command("migrate", verbosity=0)
+            user = populate(args.rows, random.Random(42))
+            portfolio = Portfolio.objects.get(user=user)
+            project_ids = list(Project.objects.values_list("pk", flat=True)[:20])
+            headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+            paths = [
+                "/api/projects/?page_size=50",
+                "/api/experiences/?page_size=50",
+                f"/api/portfolios/{portfolio.pk}/full/",
+                *(f"/api/projects/{pk}/" for pk in project_ids),
+            ]
+
+            results = []
+            for interface in ("wsgi", "asgi"):
+                with load.server(settings_directory, interface, workers=args.workers) as port:
+                    load.run_load(port, paths, headers, connections=4, duration=1)  # Warm up
+                    for connections in (int(count) for count in args.connections.split(",")):
+                        result = load.run_load(port, paths, headers, connections=connections, duration=args.duration)
+                        results.append({"interface": interface, "connections": connections, **result})
+        print(json.dumps({"rows": args.rows, "workers": args.workers, "results": results}, indent=2))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
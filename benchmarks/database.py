@@ -0,0 +1,106 @@
+"""
+Requests per second of the database connection modes.
+
+Runs gunicorn (``--interface``, ``--workers`` processes) against one database
+per engine and drives it with a mix of list reads and skill creations, once
+per mode:
+
+- SQLite (default): ``per_request`` opens a connection per request with
+  SQLite's defaults, ``persistent`` keeps connections (``DB_CONN_MAX_AGE``),
+  ``tuned`` adds WAL, ``busy_timeout``, ``synchronous=NORMAL``, mmap and
+  IMMEDIATE transactions (``DB_SQLITE_TUNING``).
+- PostgreSQL (``--engine postgresql``, using DB_HOST, DB_NAME, ...):
+  ``per_request``, ``persistent`` and, with psycopg 3 installed, ``pooled``
+  (``DB_POOL_SIZE``). Runs against a throwaway test database.
+
+    python -m benchmarks.database --connections 32 --duration 15 --workers 2
+
+Failed writes, such as "database is locked", show up as 500s in ``statuses``.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import tempfile
+
+from benchmarks import load, setup_django
+from benchmarks.serialization import populate
+
+MODES = {
+    "sqlite": {
+        "per_request": {"DB_CONN_MAX_AGE": "0", "DB_SQLITE_TUNING": "false"},
+        "persistent": {"DB_CONN_MAX_AGE": "60", "DB_SQLITE_TUNING": "false"},
+        "tuned": {"DB_CONN_MAX_AGE": "60", "DB_SQLITE_TUNING": "true"},
+    },
+    "postgresql": {
+        "per_request": {"DB_CONN_MAX_AGE": "0", "DB_POOL_SIZE": "0"},
+        "persistent": {"DB_CONN_MAX_AGE": "60", "DB_POOL_SIZE": "0"},
+        "pooled": {"DB_POOL_SIZE": "8"},
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=MODES, default="sqlite")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes per server")
+    parser.add_argument("--interface", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--writes", type=int, default=2, help="Skill creations per 10 requests")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ["DB_ENGINE"] = args.engine
+    if args.engine == "sqlite":
+        os.environ["SQLITE_PATH"] = os.path.join(directory, "benchmark.sqlite3")
+        os.environ["DB_SQLITE_TUNING"] = "false"
+    try:
+        with load.settings_module() as settings_directory:
+            setup_django()
+            from django.core.management import call_command
+            from django.db import connection
+            from rest_framework_simplejwt.tokens import AccessToken
+
+            from api.models import Portfolio
+
+            if args.engine == "sqlite":
+                call_command("migrate", verbosity=0)
+            else:
+                os.environ["DB_NAME"] = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            user = populate(args.rows, random.Random(42))
+            portfolio = Portfolio.objects.get(user=user)
+            headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+            write = ("POST", "/api/skills/", json.dumps({"portfolio": str(portfolio.pk), "name": "Go", "proficiency": "Expert"}).encode())
+            reads = ["/api/projects/?page_size=20", "/api/experiences/?page_size=20", f"/api/portfolios/{portfolio.pk}/"]
+            requests = [write] * args.writes + [reads[i % len(reads)] for i in range(10 - args.writes)]
+            random.Random(42).shuffle(requests)
+
+            results = []
+            for mode, env in MODES[args.engine].items():
+                if mode == "pooled" and importlib.util.find_spec("psycopg_pool") is None:
+                    results.append({"mode": mode, "skipped": "needs psycopg[pool]"})
+                    continue
+                if args.engine == "sqlite":
+                    # WAL is a property of the database file; reset it for the untuned modes
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"PRAGMA journal_mode={'WAL' if env['DB_SQLITE_TUNING'] == 'true' else 'DELETE'}")
+                connection.close()
+                with load.server(settings_directory, args.interface, workers=args.workers, env=env) as port:
+                    result = load.run_load(port, requests, headers, connections=args.connections, duration=args.duration)
+                results.append({"mode": mode, **result})
+        print(json.dumps({
+            "engine": args.engine, "interface": args.interface, "workers": args.workers,
+            "connections": args.connections, "results": results,
+        }, indent=2))
+    finally:
+        if args.engine == "postgresql":
+            connection.creation.destroy_test_db(os.environ["DB_NAME"], verbosity=0)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
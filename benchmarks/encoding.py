@@ -0,0 +1,134 @@
+"""
+Encode time and bytes on the wire of representative API payloads.
+
+Renders each payload with DRF's stdlib ``JSONRenderer`` and with
+``FastJSONRenderer``, then compresses the result the way
+``CompressionMiddleware`` would:
+
+    python -m benchmarks.encoding --rows 500
+
+Payloads are a list page of projects as the serializers produce it, the same
+page as ``values()`` rows with UUID, date and datetime objects left for the
+renderer, and a full portfolio document with every child collection.
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from benchmarks import setup_django
+
+WORDS = "django react kubernetes backend platform data design mobile api cloud team product launch users".split()
+
+
+def sentence(rng, words):
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def project_rows(rng, count, as_strings):
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        created = started + timedelta(minutes=i, microseconds=rng.randrange(1_000_000))
+        row = {
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "portfolio": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "name": f"Project {i}",
+            "description": sentence(rng, 40),
+            "tech_stack": "Django, React, PostgreSQL",
+            "tags": ["django", "react", "postgresql"],
+            "role": "Lead developer",
+            "github_url": f"https://github.com/example/project-{i}",
+            "live_demo_url": None,
+            "image": f"http://example.com/media/blobs/ab/{uuid.uuid4().hex}.png",
+            "image_variants": {"webp": {"320": "http://example.com/media/derivatives/a.webp"}},
+            "created_at": created,
+            "updated_at": created,
+        }
+        if as_strings:
+            row["id"], row["portfolio"] = str(row["id"]), str(row["portfolio"])
+            row["created_at"] = row["updated_at"] = created.isoformat().replace("+00:00", "Z")
+        rows.append(row)
+    return {"next": "http://example.com/api/projects/?cursor=abc", "previous": None, "results": rows}
+
+
+def portfolio_document(rng):
+    def child(i, **fields):
+        return {"id": str(uuid.uuid4()), "created_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z", **fields}
+
+    return {
+        "id": str(uuid.uuid4()),
+        "title": "Jane Doe",
+        "bio": sentence(rng, 120),
+        "template": child(0, name="Minimal", description=sentence(rng, 20)),
+        "projects": project_rows(rng, 25, as_strings=True)["results"],
+        "skills": [child(i, name=f"Skill {i}", proficiency="Expert") for i in range(30)],
+        "experiences": [
+            child(i, job_title="Engineer", company_name=f"Company {i}", start_date=str(date(2015 + i, 1, 1)), description=sentence(rng, 60))
+            for i in range(8)
+        ],
+        "educations": [child(i, degree="MSc", institution=f"University {i}", start_date="2010-09-01") for i in range(2)],
+        "testimonials": [child(i, author_name=f"Author {i}", testimonial_text=sentence(rng, 50)) for i in range(10)],
+        "contacts": [child(0, name="Jane", email="jane@example.com", phone="+49 30 1234567")],
+        "social_links": [child(i, name=f"Link {i}", url=f"https://example.com/{i}") for i in range(5)],
+    }
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500, help="Projects per list page")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.utils.text import compress_string
+    from rest_framework.renderers import JSONRenderer
+
+    from api.middleware import brotli
+    from api.renderers import FastJSONRenderer, orjson
+
+    rng = random.Random(42)
+    payloads = {
+        "project_page": project_rows(rng, args.rows, as_strings=True),
+        "project_rows": project_rows(rng, args.rows, as_strings=False),
+        "portfolio_document": portfolio_document(rng),
+    }
+    results = []
+    for name, data in payloads.items():
+        stdlib_ms, body = median_ms(lambda: JSONRenderer().render(data), args.repeat)
+        fast_ms, fast_body = median_ms(lambda: FastJSONRenderer().render(data), args.repeat)
+        gzip_ms, gzipped = median_ms(lambda: compress_string(fast_body), args.repeat)
+        result = {
+            "payload": name,
+            "stdlib_encode_ms": stdlib_ms,
+            "fast_encode_ms": fast_ms,
+            "identical": body == fast_body,
+            "bytes": len(fast_body),
+            "gzip_bytes": len(gzipped),
+            "gzip_ms": gzip_ms,
+        }
+        assert gzip.decompress(gzipped) == fast_body
+        if brotli is not None:
+            quality = settings.COMPRESSION_BROTLI_QUALITY
+            result["brotli_ms"], compressed = median_ms(lambda: brotli.compress(fast_body, quality=quality), args.repeat)
+            result["brotli_bytes"] = len(compressed)
+        results.append(result)
+    print(json.dumps({"orjson": orjson is not None, "brotli": brotli is not None, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Images processed per second per core by the derivative pipeline.
+
+Generates synthetic phone-sized photos and renders every configured derivative
+with process pools of increasing size:
+
+    python -m benchmarks.images --images 24 --size 4032x3024
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from PIL import Image
+
+from api.images import FORMAT_EXTENSIONS, render_derivatives
+
+WIDTHS = [96, 320, 768, 1280]
+FORMATS = ["webp", "jpeg"]
+
+
+def make_photo(path, width, height):
+    # A gradient with noise compresses about as badly as a real photo
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 64)
+    Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(path, quality=92)
+
+
+def targets_for(source, output_dir):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return [
+        (width, fmt, os.path.join(output_dir, f"{stem}_{width}w.{FORMAT_EXTENSIONS[fmt]}"))
+        for width in WIDTHS
+        for fmt in FORMATS
+    ]
+
+
+def run(sources, output_dir, workers, quality):
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        # Warm the workers so process start-up is not measured
+        for future in [pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+        started = time.perf_counter()
+        futures = [pool.submit(render_derivatives, source, targets_for(source, output_dir), quality) for source in sources]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "images": len(sources),
+        "seconds": round(elapsed, 3),
+        "images_per_second": round(len(sources) / elapsed, 2),
+        "images_per_second_per_core": round(len(sources) / elapsed / workers, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--size", default="4032x3024", help="Source image size, WIDTHxHEIGHT")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.split("x"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        sources = []
+        for i in range(args.images):
+            path = os.path.join(workdir, f"photo{i}.jpg")
+            make_photo(path, width, height)
+            sources.append(path)
+        source_bytes = sum(os.path.getsize(path) for path in sources)
+
+        results = []
+        workers = 1
+        while workers <= args.max_workers:
+            output_dir = os.path.join(workdir, f"out{workers}")
+            os.makedirs(output_dir)
+            results.append(run(sources, output_dir, workers, args.quality))
+            workers *= 2
+        output_bytes = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+
+    print(json.dumps({
+        "benchmark": "image_derivatives",
+        "source_size": args.size,
+        "widths": WIDTHS,
+        "formats": FORMATS,
+        "source_bytes_per_image": source_bytes // args.images,
+        "derivative_bytes_per_image": output_bytes // args.images,
+        "runs": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
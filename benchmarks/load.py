@@ -0,0 +1,199 @@
+"""
+Helpers for benchmarks that drive a real server over HTTP.
+
+``server()`` starts gunicorn (see gunicorn.conf.py) against a throwaway
+settings module, and ``run_load()`` keeps ``connections`` keep-alive HTTP/1.1
+connections busy for ``duration`` seconds and reports throughput and latency.
+The client is plain asyncio, so it needs no extra packages; on small machines
+it competes with the server for CPU, so compare results of one run only.
+"""
+import asyncio
+import contextlib
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SETTINGS_TEMPLATE = """\
+from portfolio_cms.settings import *  # noqa: F401,F403
+
+SECRET_KEY = "benchmark-secret-key-not-for-production"
+ALLOWED_HOSTS = ["*"]
+REST_FRAMEWORK = {**REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def settings_module(databases=None):
+    """
+    Point Django at a temporary settings module with a secret key shared by
+    every process, no throttling and, unless None, ``databases``. Yields the
+    directory holding it.
+    """
+    directory = tempfile.mkdtemp()
+    source = SETTINGS_TEMPLATE if databases is None else f"{SETTINGS_TEMPLATE}DATABASES = {databases!r}\n"
+    Path(directory, "benchmark_settings.py").write_text(source)
+    previous = os.environ.get("DJANGO_SETTINGS_MODULE")
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmark_settings"
+    sys.path.insert(0, directory)
+    try:
+        yield directory
+    finally:
+        sys.path.remove(directory)
+        if previous is None:
+            del os.environ["DJANGO_SETTINGS_MODULE"]
+        else:
+            os.environ["DJANGO_SETTINGS_MODULE"] = previous
+
+
+@contextlib.contextmanager
+def server(settings_directory, interface, workers=1, env=None):
+    """
+    Run gunicorn with ``SERVER_INTERFACE=interface`` until the block exits.
+    Yields the port it listens on.
+    """
+    port = free_port()
+    environment = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([settings_directory, str(ROOT)]),
+        "DJANGO_SETTINGS_MODULE": "benchmark_settings",
+        "SERVER_INTERFACE": interface,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "LOGLEVEL": "WARNING",
+        **(env or {}),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--access-logfile", os.devnull, "--log-level", "warning"],
+        cwd=ROOT, env=environment,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {process.returncode}")
+            with contextlib.suppress(OSError), socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _connection(port, requests, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for label, request in requests:
+            if time.perf_counter() >= deadline:
+                break
+            started = time.perf_counter()
+            writer.write(request)
+            status = await _read_response(reader)
+            latencies.append((label, time.perf_counter() - started))
+            statuses[label, status] = statuses.get((label, status), 0) + 1
+    finally:
+        writer.close()
+
+
+def encode_request(request, headers):
+    """
+    HTTP/1.1 bytes of a path to GET or a ``(method, path, JSON body bytes)`` tuple.
+    """
+    method, path, body = ("GET", request, b"") if isinstance(request, str) else request
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", *(f"{name}: {value}" for name, value in headers.items())]
+    if body:
+        lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+
+def latency_summary(latencies):
+    """
+    p50/p95/p99 in milliseconds of ``latencies`` in seconds.
+    """
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 2),
+        "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 2),
+    }
+
+
+def run_load(port, requests, headers=None, connections=16, duration=10.0, labels=None):
+    """
+    Send ``requests`` (see ``encode_request()``) round-robin over
+    ``connections`` connections for ``duration`` seconds. Returns requests per
+    second, latency percentiles in milliseconds and the count of each status code.
+    With ``labels``, one per request, the result also has ``by_label``: the
+    same numbers for the requests of each label.
+    """
+    labels = labels or [None] * len(requests)
+    encoded = [(label, encode_request(request, headers or {})) for label, request in zip(labels, requests)]
+    latencies, statuses = [], {}
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        # Connections start spread over the list, so a short run still sends all of it
+        offsets = [i * len(encoded) // connections if len(encoded) >= connections else i % len(encoded) for i in range(connections)]
+        await asyncio.gather(*(
+            _connection(port, itertools.cycle(encoded[offset:] + encoded[:offset]), deadline, latencies, statuses)
+            for offset in offsets
+        ))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    result = {
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        **latency_summary(latency for _, latency in latencies),
+        "statuses": count_statuses(statuses),
+    }
+    if set(labels) != {None}:
+        grouped = {label: [] for label in labels}
+        for label, latency in latencies:
+            grouped[label].append(latency)
+        result["by_label"] = {
+            label: {
+                "requests": len(grouped[label]),
+                **latency_summary(grouped[label]),
+                "statuses": count_statuses({key: count for key, count in statuses.items() if key[0] == label}),
+            }
+            for label in sorted(grouped)
+        }
+    return result
+
+
+def count_statuses(statuses):
+    totals = {}
+    for (_, status), count in statuses.items():
+        totals[status] = totals.get(status, 0) + count
+    return totals
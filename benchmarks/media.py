@@ -0,0 +1,87 @@
+"""
+Peak memory per request of the media view, against reading the file whole.
+
+Serves files of increasing size through ``api.media.serve_media`` and drains the
+response the way a WSGI server without ``sendfile()`` would, recording the peak
+of Python allocations with tracemalloc:
+
+    python -m benchmarks.media --sizes 1,16,128,512
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+def make_file(path, megabytes):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as file:
+        for _ in range(megabytes):
+            file.write(block)
+
+
+def drain(response):
+    sent = 0
+    for chunk in response:
+        sent += len(chunk)
+    response.close()
+    return sent
+
+
+def measure(view, request, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    sent = drain(view(request, *args))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "bytes": sent,
+        "peak_kib": round(peak / 1024, 1),
+        "mb_per_second": round(sent / 1024 / 1024 / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,16,128,512", help="Comma-separated file sizes in MiB")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.http import HttpResponse
+    from django.test import RequestFactory, override_settings
+
+    from api.media import serve_media
+
+    def read_whole(request, path):
+        with open(path, "rb") as file:
+            return HttpResponse(file.read(), content_type="application/octet-stream")
+
+    factory = RequestFactory()
+    results = []
+    with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+        for megabytes in (int(size) for size in args.sizes.split(",")):
+            name = f"file_{megabytes}m.bin"
+            path = os.path.join(media_root, name)
+            make_file(path, megabytes)
+            half = megabytes * 1024 * 1024 // 2
+            # Warm up imports and the mimetypes table outside the measurement
+            drain(serve_media(factory.get(f"/media/{name}", HTTP_RANGE="bytes=0-0"), name))
+            results.append({
+                "size_mib": megabytes,
+                "serve_media": measure(serve_media, factory.get(f"/media/{name}"), name),
+                "serve_media_range": measure(
+                    serve_media, factory.get(f"/media/{name}", HTTP_RANGE=f"bytes={half}-"), name,
+                ),
+                "read_whole": measure(read_whole, factory.get(f"/media/{name}"), path),
+            })
+            os.unlink(path)
+    print(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
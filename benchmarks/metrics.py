@@ -0,0 +1,101 @@
+"""
+Per-request overhead of the metrics middleware, and the cost of flushing and
+scraping the registry.
+
+Times ``MetricsMiddleware`` around a view that does nothing, and a whole
+``list`` request through the test client with and without the middleware.
+Then fills the registry with ``--handlers`` handlers' series, the values of
+``--workers`` worker files, and times a flush and a scrape:
+
+    python -m benchmarks.metrics --requests 5000 --handlers 50 --workers 8
+
+Per-request results are in microseconds (p50/p99), flush and scrape in
+milliseconds. Runs against a throwaway test database.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import setup_django
+from benchmarks.throttling import percentiles, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--handlers", type=int, default=50, help="Handlers with series in the registry")
+    parser.add_argument("--workers", type=int, default=8, help="Worker files summed by a scrape")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory, override_settings
+    from django.test.utils import setup_test_environment
+    from django.urls import resolve
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from api import metrics
+    from api.models import Template
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    directory = tempfile.mkdtemp()
+    try:
+        request = RequestFactory().get("/api/templates/")
+        request.resolver_match = resolve("/api/templates/")
+        response = HttpResponse(b"x" * 2048, content_type="application/json")
+        middleware = metrics.MetricsMiddleware(lambda request: response)
+        bare = time_calls(lambda _: response, range(args.requests))
+        wrapped = time_calls(middleware, [request] * args.requests)
+
+        Template.objects.create(name="Minimal")
+        user = get_user_model().objects.create_user(username="bench", password="bench")
+        headers = {"authorization": f"Bearer {AccessToken.for_user(user)}"}
+        without = [item for item in settings.MIDDLEWARE if item != "api.metrics.MetricsMiddleware"]
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}):
+            client = Client()
+            with_metrics = time_calls(lambda _: client.get("/api/templates/", headers=headers), range(args.requests))
+            with override_settings(MIDDLEWARE=without):
+                client = Client()
+                without_metrics = time_calls(lambda _: client.get("/api/templates/", headers=headers), range(args.requests))
+
+        metrics.registry.reset()
+        for number in range(args.handlers):
+            handler = f"Handler{number}ViewSet.list"
+            for status in ("200", "404"):
+                metrics.requests_total.inc(handler, "GET", status)
+                metrics.request_duration.observe(0.01, handler, "GET")
+                metrics.db_duration.observe(0.002, handler)
+                metrics.response_size.observe(2048, handler)
+        values = metrics.registry.snapshot()
+        for number in range(args.workers):
+            metrics.write_values(os.path.join(directory, f"{os.getpid()}-worker{number}.json"), values)
+        with override_settings(METRICS_DIR=directory):
+            started = time.perf_counter()
+            metrics.registry.flush()
+            flush = time.perf_counter() - started
+            started = time.perf_counter()
+            text = metrics.exposition(metrics.registry.collect())
+            scrape = time.perf_counter() - started
+
+        print(json.dumps({
+            "requests": args.requests,
+            "middleware_us": {"bare_view": percentiles(bare), "with_metrics": percentiles(wrapped)},
+            "list_request_us": {"without_metrics": percentiles(without_metrics), "with_metrics": percentiles(with_metrics)},
+            "series": len(values),
+            "flush_ms": round(flush * 1000, 2),
+            "scrape_ms": {"workers": args.workers, "time": round(scrape * 1000, 2), "bytes": len(text)},
+        }, indent=2))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        connection.creation.destroy_test_db(":memory:", verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Latency of /api/search/ queries against a large index.
+
+Builds a throwaway test database with ``--documents`` synthetic portfolios and
+their search documents, then times ranked queries of one to three words, first
+page and a deep page:
+
+    python -m benchmarks.search --documents 1000000
+
+The target at 1M documents is p95 under 100 ms for first pages of selective
+queries on SQLite FTS5; very common single words cost more, since every match
+is scored before the top page is known.
+"""
+import argparse
+import itertools
+import json
+import random
+import statistics
+import time
+import uuid
+
+from benchmarks import setup_django
+
+WORDS = (
+    "python django react kubernetes docker terraform golang rust java kotlin swift typescript "
+    "postgres redis kafka spark airflow aws gcp azure backend frontend fullstack platform data "
+    "mobile devops security machine learning designer berlin paris london lisbon madrid remote "
+    "startup fintech healthcare gaming lead senior junior architect consultant freelance"
+).split()
+
+QUERIES = ["kubernetes", "kubernetes backend berlin", "senior rust", "react native", "python data lisbon", "fintech architect"]
+
+
+def vocabulary(rng, size=20_000):
+    """
+    ``WORDS`` plus filler tokens, with Zipf-like frequencies so that a few words
+    are very common and most are rare, as in real text.
+    """
+    filler = ["".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(3)) for _ in range(size)]
+    tokens = filler[:50] + WORDS + filler[50:]
+    return tokens, list(itertools.accumulate(1 / rank for rank in range(1, len(tokens) + 1)))
+
+
+def populate(count, rng, batch_size=5000):
+    from django.contrib.auth import get_user_model
+
+    from api.models import Portfolio, SearchDocument
+
+    tokens, cum_weights = vocabulary(rng)
+
+    def sentence(rng, words):
+        return " ".join(rng.choices(tokens, cum_weights=cum_weights, k=words))
+
+    user = get_user_model().objects.create_user(username="benchmark", password="benchmark")
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        portfolios = [Portfolio(id=uuid.uuid4(), user=user, title=sentence(rng, 3), bio=sentence(rng, 20)) for _ in range(size)]
+        Portfolio.objects.bulk_create(portfolios)
+        SearchDocument.objects.bulk_create([
+            SearchDocument(
+                portfolio=portfolio,
+                title=portfolio.title,
+                bio=portfolio.bio,
+                projects=sentence(rng, 30),
+                experiences=sentence(rng, 20),
+                educations=sentence(rng, 4),
+                skills=sentence(rng, 8),
+            )
+            for portfolio in portfolios
+        ])
+
+
+def percentile(samples, percent):
+    return round(statistics.quantiles(samples, n=100, method="inclusive")[percent - 1] * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of every query")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    from api import search
+
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        rng = random.Random(42)
+        started = time.perf_counter()
+        populate(args.documents, rng)
+        indexed = time.perf_counter() - started
+
+        results = []
+        for query in QUERIES:
+            for page in (1, 10):
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    hits = search.search(query, limit=21, offset=(page - 1) * 20)
+                    timings.append(time.perf_counter() - started)
+                results.append({
+                    "query": query,
+                    "page": page,
+                    "hits": len(hits),
+                    "p50_ms": percentile(timings, 50),
+                    "p95_ms": percentile(timings, 95),
+                    "p99_ms": percentile(timings, 99),
+                })
+        print(json.dumps({
+            "documents": args.documents,
+            "vendor": connection.vendor,
+            "index_seconds": round(indexed, 1),
+            "results": results,
+        }, indent=2))
+    finally:
+        connection.creation.destroy_test_db(":memory:", verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
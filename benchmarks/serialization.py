@@ -0,0 +1,133 @@
+"""
+Rows per second of the fast read path against the DRF serializers.
+
+Builds a throwaway test database with ``--rows`` projects and experiences, then
+times, for page sizes from 50 to 500:
+
+- ``serializer``: ``ModelSerializer(queryset, many=True).data``
+- ``fast_path``: ``RowPlan.serialize()`` over ``QuerySet.values()``
+- ``view_*``: the whole ``list`` view, both ways, including the query and
+  JSON rendering; its pages are capped at the view's ``max_page_size``
+
+    python -m benchmarks.serialization --rows 2000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from benchmarks import setup_django
+
+
+def populate(count, rng):
+    from django.contrib.auth import get_user_model
+
+    from api import tags
+    from api.models import Experience, Portfolio, Project
+
+    user = get_user_model().objects.create_user(username="benchmark", password="benchmark")
+    portfolio = Portfolio.objects.create(user=user, title="Benchmark")
+    stacks = ["Django, React", "Go / Rust", "Python, PostgreSQL, Redis", "Kotlin", "TypeScript, Node"]
+    projects = Project.objects.bulk_create([
+        Project(
+            portfolio=portfolio,
+            name=f"Project {i}",
+            description="Lorem ipsum dolor sit amet " * 8,
+            tech_stack=rng.choice(stacks),
+            role="Developer",
+            github_url=f"https://github.com/example/project-{i}",
+        )
+        for i in range(count)
+    ])
+    tags.sync_project_tags(projects)
+    Experience.objects.bulk_create([
+        Experience(
+            portfolio=portfolio,
+            job_title="Engineer",
+            company_name=f"Company {i}",
+            location="Berlin",
+            start_date=date(2015, 1, 1) + timedelta(days=i),
+            end_date=date(2020, 1, 1) + timedelta(days=i),
+            description="Built things " * 10,
+        )
+        for i in range(count)
+    ])
+    return user
+
+
+def rows_per_second(function, repeat):
+    """
+    Median throughput of ``function``, which returns the number of rows it produced.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = function()
+        timings.append(time.perf_counter() - started)
+    return round(rows / statistics.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--page-sizes", default="50,200,500", help="Comma-separated page sizes")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from api import fastpath
+    from api.models import Experience, Project
+    from api.serializers import ExperienceSerializer, ProjectSerializer
+    from api.views import ExperienceViewSet, ProjectViewSet
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = populate(args.rows, random.Random(42))
+        factory = APIRequestFactory()
+        cases = [
+            ("projects", Project.objects.prefetch_related("tags"), ProjectSerializer, ProjectViewSet),
+            ("experiences", Experience.objects.all(), ExperienceSerializer, ExperienceViewSet),
+        ]
+        results = []
+        for name, queryset, serializer_class, viewset in cases:
+            view = viewset.as_view({"get": "list"})
+            for page_size in (int(size) for size in args.page_sizes.split(",")):
+                request = factory.get("/", {"page_size": page_size})
+                force_authenticate(request, user=user)
+                page = queryset.order_by("-created_at", "-id")[:page_size]
+                plan = fastpath.compile_plan(serializer_class(context={"request": None}))
+
+                def render_view():
+                    return len(view(request).render().data["results"])
+
+                def regular_view():
+                    with mock.patch.object(fastpath, "compile_plan", return_value=None):
+                        return render_view()
+
+                results.append({
+                    "endpoint": name,
+                    "page_size": page_size,
+                    "serializer_rows_per_second": rows_per_second(
+                        lambda: len(serializer_class(page.all(), many=True).data), args.repeat,
+                    ),
+                    "fast_path_rows_per_second": rows_per_second(
+                        lambda: len(plan.serialize(plan.values(page))), args.repeat,
+                    ),
+                    "view_serializer_rows_per_second": rows_per_second(regular_view, args.repeat),
+                    "view_fast_path_rows_per_second": rows_per_second(render_view, args.repeat),
+                })
+        print(json.dumps({"rows": args.rows, "results": results}, indent=2))
+    finally:
+        connection.creation.destroy_test_db(":memory:", verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
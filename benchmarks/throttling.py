@@ -0,0 +1,102 @@
+"""
+Per-request overhead of the token-bucket throttles.
+
+Times ``BucketThrottle.allow_request`` against each backend for ``--keys``
+distinct clients, and a whole ``list`` request with the default throttles
+against the same view without any:
+
+    python -m benchmarks.throttling --requests 5000 --keys 1000
+
+Results are in microseconds per request (p50/p99). The database backend runs
+against a throwaway test database.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from benchmarks import setup_django
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return {
+        "p50_us": round(statistics.median(timings) * 1e6, 1),
+        "p99_us": round(timings[int(len(timings) * 0.99) - 1] * 1e6, 1),
+    }
+
+
+def time_calls(function, arguments):
+    timings = []
+    for argument in arguments:
+        started = time.perf_counter()
+        function(argument)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=1000, help="Distinct clients")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from api import throttling
+    from api.views import TemplateViewSet
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        rng = random.Random(42)
+        users = get_user_model().objects.bulk_create([
+            get_user_model()(username=f"client{i}", email=f"client{i}@example.com") for i in range(args.keys)
+        ])
+        factory = APIRequestFactory()
+        view = TemplateViewSet.as_view({"get": "list"})
+        unthrottled = TemplateViewSet.as_view({"get": "list"}, throttle_classes=[])
+        # Rates high enough that every request is let through and takes the full path
+        rates = {"user": "1000000/min", "ip": "1000000/min", "template.list": "1000000/min"}
+
+        addresses = {user.pk: f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i, user in enumerate(users)}
+
+        def build_request(user):
+            request = factory.get("/", REMOTE_ADDR=addresses[user.pk])
+            force_authenticate(request, user=user)
+            return request
+
+        results = {}
+        with override_settings(REST_FRAMEWORK={**throttling.settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            for backend in throttling.BACKENDS:
+                with override_settings(THROTTLE_BACKEND=backend):
+                    throttling.get_store().clear()
+                    clients = [rng.choice(users) for _ in range(args.requests)]
+                    drf_requests = [Request(build_request(user)) for user in clients]
+                    for request, user in zip(drf_requests, clients):
+                        request.user = user
+                    throttle = throttling.UserBucketThrottle()
+                    allow = time_calls(lambda request: throttle.allow_request(request, None), drf_requests)
+                    throttled = time_calls(lambda user: view(build_request(user)).render(), clients)
+                    results[backend] = {
+                        "allow_request": percentiles(allow),
+                        "request_throttled": percentiles(throttled),
+                        "buckets": args.keys,
+                    }
+                    throttling.get_store().clear()
+            clients = [rng.choice(users) for _ in range(args.requests)]
+            results["unthrottled"] = {"request": percentiles(time_calls(lambda user: unthrottled(build_request(user)).render(), clients))}
+        print(json.dumps({"requests": args.requests, "keys": args.keys, "results": results}, indent=2))
+    finally:
+        connection.creation.destroy_test_db(":memory:", verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
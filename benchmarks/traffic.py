@@ -0,0 +1,243 @@
+"""
+End-to-end load test of every route in api/urls.py.
+
+Fills a SQLite database with ``manage.py generate_data --users N``. Then it
+runs gunicorn (``--interface``, ``--workers`` processes) and replays a
+shuffled, seeded mix of requests over ``--connections`` keep-alive
+connections. The mix has a GET of every list, detail and extra action route,
+weighted towards the portfolio reads the frontend makes most, plus a
+``--write-ratio`` share of updates and creations. Requests use a staff user's
+JWT, so the admin-only routes answer too.
+
+The mix is sent twice. ``mixed`` is the throughput and p50/p95/p99 latency of
+``--connections`` concurrent connections for ``--duration`` seconds. ``routes``
+is the latency of each route over one connection for ``--route-duration``
+seconds. With no queueing in front of them, these are the routes' own times:
+under saturation, every route's latency is mostly time spent waiting behind the
+others. Results are printed as JSON:
+
+    python -m benchmarks.traffic --users 10000 --connections 16 --duration 30 --output results.json
+
+Results carry the commit they were measured on. ``--baseline`` compares a run
+with an earlier ``--output``. It exits with status 1 when the throughput or a
+route's p50 got worse by more than ``--tolerance``:
+
+    git checkout main && python -m benchmarks.traffic --database /tmp/traffic.sqlite3 --output main.json
+    git checkout my-branch && python -m benchmarks.traffic --database /tmp/traffic.sqlite3 --baseline main.json
+
+``--database`` keeps the generated data between runs. It is migrated on every
+run and only filled when empty; the write requests change a few rows per run.
+Compare runs on the same machine only, because the client shares the CPU with
+the server.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import load, setup_django
+
+# Relative frequency of the GET routes; the others get DEFAULT_WEIGHT
+WEIGHTS = {
+    "portfolio-full": 8,
+    "portfolio-detail": 4,
+    "portfolio-list": 3,
+    "project-list": 4,
+    "project-detail": 3,
+    "search-list": 3,
+    "customuser-auth-cache-stats": 1,
+    "portfolio-snapshot-stats": 1,
+    "api-root": 1,
+}
+DEFAULT_WEIGHT = 2
+
+# Query strings, one picked per request
+QUERIES = {
+    "project-list": ["", "?tech=python", "?tech=react&tech=docker", "?page_size=10"],
+    "project-facets": ["", "?tech=python"],
+    "skill-stats": ["", "?skill=python", "?limit=10"],
+    "search-list": ["?q=python", "?q=backend+berlin", "?q=kubernetes", "?q=platform+latency"],
+}
+
+# Write requests as (method, route name): function of (random, ids of the route's viewset) to a JSON body
+WRITES = {
+    ("PATCH", "portfolio-detail"): lambda rng, ids: {"bio": f"Updated bio {rng.randrange(1000)}"},
+    ("PATCH", "project-detail"): lambda rng, ids: {"description": f"Updated description {rng.randrange(1000)}"},
+    ("PATCH", "skill-detail"): lambda rng, ids: {"proficiency": rng.choice(["Beginner", "Intermediate", "Advanced", "Expert"])},
+    ("POST", "skill-list"): lambda rng, ids: {"portfolio": str(rng.choice(ids["portfolio"])), "name": "Elixir", "proficiency": "Beginner"},
+}
+
+SAMPLE_IDS = 500  # Rows per viewset that detail requests pick from
+REQUESTS_PER_WEIGHT = 20
+MIN_COMPARED = 10  # Routes with fewer requests in either run are too noisy to compare
+MIN_SLOWDOWN_MS = 1.0  # Smaller changes of a route's p50 are noise, whatever the ratio
+
+
+def commit():
+    """
+    Short hash of the checked-out commit, with ``-dirty`` for uncommitted changes.
+    """
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=load.ROOT, capture_output=True, text=True).stdout.strip()
+
+    head = git("rev-parse", "--short", "HEAD") or "unknown"
+    return f"{head}-dirty" if git("status", "--porcelain", "--untracked-files=no") else head
+
+
+def routes():
+    """
+    ``(route name, viewset, detail)`` of every route of the API router that answers GET.
+    """
+    from api.urls import router
+
+    yield "api-root", None, False
+    for prefix, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            if "get" in router.get_method_map(viewset, route.mapping):
+                yield route.name.format(basename=basename), viewset, route.detail
+
+
+def sample_ids(user):
+    """
+    ``{basename: [pk, ...]}`` of rows the viewsets show ``user``.
+    """
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+
+    from api.urls import router
+
+    request = Request(RequestFactory().get("/"))
+    request.user = user
+    ids = {}
+    for prefix, viewset, basename in router.registry:
+        view = viewset(request=request, format_kwarg=None, kwargs={}, action="list")
+        if basename != "search":
+            ids[basename] = list(view.get_queryset().order_by().values_list("pk", flat=True)[:SAMPLE_IDS])
+    return ids
+
+
+def build_requests(ids, write_ratio, rng):
+    """
+    Shuffled ``(requests, labels)`` for ``load.run_load()``.
+    """
+    from django.urls import reverse
+
+    def path(name, detail):
+        basename = name.rsplit("-", 1)[0] if detail else None
+        url = reverse(name, kwargs={"pk": rng.choice(ids[basename])} if detail else None)
+        return url + rng.choice(QUERIES.get(name, [""]))
+
+    requests, labels = [], []
+    for name, viewset, detail in routes():
+        if detail and not ids.get(name.rsplit("-", 1)[0]):
+            continue
+        for _ in range(WEIGHTS.get(name, DEFAULT_WEIGHT) * REQUESTS_PER_WEIGHT):
+            requests.append(path(name, detail))
+            labels.append(f"GET {name}")
+    writes = round(len(requests) * write_ratio / (1 - write_ratio))
+    for index in range(writes):
+        method, name = list(WRITES)[index % len(WRITES)]
+        url = path(name, name.endswith("-detail")).split("?")[0]
+        requests.append((method, url, json.dumps(WRITES[method, name](rng, ids)).encode()))
+        labels.append(f"{method} {name}")
+    order = list(range(len(requests)))
+    rng.shuffle(order)
+    return [requests[i] for i in order], [labels[i] for i in order]
+
+
+def regressions(baseline, result, tolerance):
+    """
+    Descriptions of the numbers in ``result`` that are worse than in
+    ``baseline`` by more than ``tolerance`` (a fraction).
+    """
+    found = []
+    before, after = baseline["mixed"]["requests_per_second"], result["mixed"]["requests_per_second"]
+    if after < before * (1 - tolerance):
+        found.append(f"throughput {before} -> {after} requests/s")
+    for label, numbers in result["routes"].items():
+        previous = baseline["routes"].get(label)
+        if not previous or min(previous["requests"], numbers["requests"]) < MIN_COMPARED:
+            continue
+        if numbers["p50_ms"] > previous["p50_ms"] * (1 + tolerance) and numbers["p50_ms"] - previous["p50_ms"] >= MIN_SLOWDOWN_MS:
+            found.append(f"{label} p50 {previous['p50_ms']} -> {numbers['p50_ms']} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000, help="Users generated into an empty database")
+    parser.add_argument("--database", help="SQLite file to keep the data in between runs (default: a temporary one)")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of concurrent load")
+    parser.add_argument("--route-duration", type=float, default=30.0, help="Seconds of requests over one connection")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes of the server")
+    parser.add_argument("--interface", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="Share of write requests")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the results to this file")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against --baseline (default: 0.2)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ["DB_ENGINE"] = "sqlite"
+    os.environ["SQLITE_PATH"] = os.path.abspath(args.database) if args.database else os.path.join(directory, "benchmark.sqlite3")
+    try:
+        with load.settings_module() as settings_directory:
+            setup_django()
+            from django.contrib.auth import get_user_model
+            from django.core.management import call_command
+            from django.db import connection
+            from rest_framework_simplejwt.tokens import AccessToken
+
+            from api.models import Portfolio
+
+            call_command("migrate", verbosity=0)
+            if not Portfolio.objects.exists():
+                call_command("generate_data", users=args.users, seed=args.seed, stdout=sys.stderr)
+            User = get_user_model()
+            user = User.objects.filter(username="traffic").first() or User.objects.create_user(
+                username="traffic", password="traffic", is_staff=True,
+            )
+            headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+            rng = random.Random(args.seed)
+            requests, labels = build_requests(sample_ids(user), args.write_ratio, rng)
+            connection.close()
+
+            with load.server(settings_directory, args.interface, workers=args.workers) as port:
+                load.run_load(port, requests, headers, connections=4, duration=2)  # Warm up
+                mixed = load.run_load(port, requests, headers, connections=args.connections, duration=args.duration)
+                routes = load.run_load(port, requests, headers, connections=1, duration=args.route_duration, labels=labels)["by_label"]
+        output = {
+            "commit": commit(),
+            "users": User.objects.filter(is_staff=False).count(),
+            "interface": args.interface,
+            "workers": args.workers,
+            "connections": args.connections,
+            "duration": args.duration,
+            "write_ratio": args.write_ratio,
+            "seed": args.seed,
+            "mixed": mixed,
+            "routes": routes,
+        }
+        if args.baseline:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+            output["baseline"] = {"commit": baseline["commit"], "regressions": regressions(baseline, output, args.tolerance)}
+        text = json.dumps(output, indent=2)
+        print(text)
+        if args.output:
+            with open(args.output, "w") as file:
+                file.write(text + "\n")
+        if args.baseline and output["baseline"]["regressions"]:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
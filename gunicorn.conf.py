@@ -0,0 +1,74 @@
+"""
+Gunicorn settings for production; run ``gunicorn`` from the repository root.
+
+SERVER_INTERFACE selects the deployment:
+
+- ``asgi`` (default): uvicorn workers serving ``portfolio_cms.asgi`` with
+  ``ASYNC_READS`` on, so list/retrieve of the portfolio viewsets run on the
+  event loop (api/asyncviews.py).
+- ``wsgi``: threaded sync workers serving ``portfolio_cms.wsgi``.
+
+WEB_CONCURRENCY overrides the number of worker processes, PORT the port.
+Workers write their metrics to METRICS_DIR (a directory in the system temp
+directory by default), which is emptied on start, so /metrics reports the
+whole server (see api/metrics.py).
+
+The application is loaded once in the master and forked into the workers, so
+they share one SECRET_KEY (see portfolio_cms/__init__.py) and start fast.
+Reloads are graceful: workers finish their requests within
+``graceful_timeout``. Because the code is preloaded, ``kill -HUP`` only
+restarts workers with the loaded code; to deploy new code send ``USR2`` (a new
+master starts next to the old one), then ``QUIT`` to the old master.
+"""
+import os
+import shutil
+import tempfile
+
+interface = os.environ.get("SERVER_INTERFACE", "asgi")
+cores = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+# Set before the preloaded application reads its settings
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"portfolio-cms-metrics-{os.environ.get('PORT', 8000)}"))
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+preload_app = True
+# Recycle workers now and then, staggered, to bound memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+if interface == "asgi":
+    wsgi_app = "portfolio_cms.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    # One event loop per core serves many concurrent connections each
+    workers = int(os.environ.get("WEB_CONCURRENCY", cores))
+    # Set before the preloaded application reads its settings
+    os.environ.setdefault("ASYNC_READS", "true")
+elif interface == "wsgi":
+    wsgi_app = "portfolio_cms.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.environ.get("WEB_CONCURRENCY", cores * 2 + 1))
+    threads = int(os.environ.get("WEB_THREADS", 4))
+else:
+    raise RuntimeError(f"SERVER_INTERFACE must be 'asgi' or 'wsgi', not {interface!r}")
+# Settings refuse per-process caches when several workers share the state they hold
+os.environ["WEB_WORKERS"] = str(workers)
+
+
+def when_ready(server):
+    # Runs in the master before the workers fork; they must not share its connections
+    from django.db import connections
+
+    connections.close_all()
+    # Counters restart from zero with the server
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["METRICS_DIR"])
+
+
+def worker_exit(server, worker):
+    # Keep the requests a recycled worker served since its last flush
+    from api.metrics import registry
+
+    registry.flush()
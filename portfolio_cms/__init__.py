@@ -25,12 +25,90 @@ def create_secret_key():
     return get_random_secret_key()
 
 
+def load_secret_key(path):
+    """
+    Read the secret key persisted at ``path``, creating the file on first use.
+
+    Every worker process, replica sharing the file and restart signs with the
+    same key, so tokens and sessions stay valid. Concurrent first starts agree
+    on one key: it is written to a temporary file and linked into place, which
+    fails if another process got there first.
+    """
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".secret_key.{os.getpid()}.tmp")
+    fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as file:
+        file.write(create_secret_key())
+    try:
+        os.link(temporary, path)
+        logger.info("Saved secret key to %s", path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(temporary)
+    with open(path) as file:
+        return file.read().strip()
+
+
 DB_HOST = os.environ.get("DB_HOST", "")
 DB_PORT = os.environ.get("DB_PORT", 5432)
 DB_NAME = os.environ.get("DB_NAME", "")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "")
 DB_UNAME = os.environ.get("DB_UNAME", "")
 DB_PWORD = os.environ.get("DB_PWORD", "")
-SECRET_KEY = create_secret_key()
+DB_ENGINE = os.environ.get("DB_ENGINE", "postgresql" if DB_HOST else "sqlite")  # postgresql or sqlite
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+DB_CONN_HEALTH_CHECKS = os.environ.get("DB_CONN_HEALTH_CHECKS", "true").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 0))
+DB_SQLITE_TUNING = os.environ.get("DB_SQLITE_TUNING", "true").lower() in ("1", "true", "yes")
+# Comma-separated replica hosts (host or host:port, PostgreSQL) or files (SQLite)
+DB_REPLICAS = [replica.strip() for replica in os.environ.get("DB_REPLICAS", "").split(",") if replica.strip()]
+DB_REPLICA_PIN_SECONDS = int(os.environ.get("DB_REPLICA_PIN_SECONDS", 5))
+# SECRET_KEY wins; otherwise the key persisted in SECRET_KEY_FILE (created on first start)
+SECRET_KEY_FILE = os.environ.get("SECRET_KEY_FILE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "secret_key.txt"))
+SECRET_KEY = os.environ.get("SECRET_KEY") or load_secret_key(SECRET_KEY_FILE)
+# Worker processes serving requests; gunicorn.conf.py sets it
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 1))
+# Cache of state every worker process must agree on (replica pins, user cache versions)
+SHARED_CACHE_BACKEND = os.environ.get("SHARED_CACHE_BACKEND", "file")  # file or locmem (one worker only)
+SHARED_CACHE_LOCATION = os.environ.get("SHARED_CACHE_LOCATION", "")
+SNAPSHOT_CACHE_BACKEND = os.environ.get("SNAPSHOT_CACHE_BACKEND", "file")  # file or locmem (one worker only)
+SNAPSHOT_CACHE_LOCATION = os.environ.get("SNAPSHOT_CACHE_LOCATION", "")
+SNAPSHOT_CACHE_TIMEOUT = int(os.environ.get("SNAPSHOT_CACHE_TIMEOUT", 7 * 24 * 60 * 60))
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", 30))
+IMAGE_DERIVATIVE_WIDTHS = [int(width) for width in os.environ.get("IMAGE_DERIVATIVE_WIDTHS", "96,320,768,1280").split(",")]
+IMAGE_DERIVATIVE_FORMATS = os.environ.get("IMAGE_DERIVATIVE_FORMATS", "webp,jpeg").split(",")
+IMAGE_DERIVATIVE_QUALITY = int(os.environ.get("IMAGE_DERIVATIVE_QUALITY", 80))
+IMAGE_RENDER_INLINE = os.environ.get("IMAGE_RENDER_INLINE", "false").lower() in ("1", "true", "yes")
+JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", 1))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+AUTH_USER_CACHE_SIZE = int(os.environ.get("AUTH_USER_CACHE_SIZE", 10000))
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", 300))
+THROTTLE_BACKEND = os.environ.get("THROTTLE_BACKEND", "database" if WEB_WORKERS > 1 else "local")
+THROTTLE_USER_RATE = os.environ.get("THROTTLE_USER_RATE", "600/min")
+THROTTLE_IP_RATE = os.environ.get("THROTTLE_IP_RATE", "1200/min")
+ASYNC_READS = os.environ.get("ASYNC_READS", "false").lower() in ("1", "true", "yes")
+SQL_INSTRUMENTATION = os.environ.get("SQL_INSTRUMENTATION", "true").lower() in ("1", "true", "yes")
+SQL_REPEAT_THRESHOLD = int(os.environ.get("SQL_REPEAT_THRESHOLD", 10))
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_DIR = os.environ.get("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+# Comma-separated client addresses that may scrape /metrics without METRICS_TOKEN
+INTERNAL_IPS = [ip.strip() for ip in os.environ.get("INTERNAL_IPS", "").split(",") if ip.strip()]
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.001))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+PROFILE_RETENTION_DAYS = int(os.environ.get("PROFILE_RETENTION_DAYS", 7))
+MEDIA_OFFLOAD_HEADER = os.environ.get("MEDIA_OFFLOAD_HEADER", "")
+MEDIA_OFFLOAD_PREFIX = os.environ.get("MEDIA_OFFLOAD_PREFIX", "/protected-media/")
 DEBUG = os.environ.get("DEBUG", False)
 PRODUCTION_SERVER = "https://portfolio-cms-jqgh.onrender.com"
 ALLOWED_HOSTS = ["portfolio-cms-jqgh.onrender.com", "localhost", "127.0.0.1"]
@@ -13,7 +13,24 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 from portfolio_cms import SECRET_KEY, DEBUG,ALLOWED_HOSTS, SPECTACULAR_CONFIG,TRUSTED_ORIGINS
+from portfolio_cms import WEB_WORKERS, SHARED_CACHE_BACKEND, SHARED_CACHE_LOCATION
+from portfolio_cms import SNAPSHOT_CACHE_BACKEND, SNAPSHOT_CACHE_LOCATION, SNAPSHOT_CACHE_TIMEOUT
+from portfolio_cms import ARCHIVE_RETENTION_DAYS
+from portfolio_cms import IMAGE_DERIVATIVE_WIDTHS, IMAGE_DERIVATIVE_FORMATS, IMAGE_DERIVATIVE_QUALITY, IMAGE_RENDER_INLINE
+from portfolio_cms import JOB_WORKER_CONCURRENCY, JOB_MAX_ATTEMPTS
+from portfolio_cms import MEDIA_OFFLOAD_HEADER, MEDIA_OFFLOAD_PREFIX
+from portfolio_cms import AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL
+from portfolio_cms import THROTTLE_BACKEND, THROTTLE_USER_RATE, THROTTLE_IP_RATE
+from portfolio_cms import ASYNC_READS
+from portfolio_cms import SQL_INSTRUMENTATION, SQL_REPEAT_THRESHOLD
+from portfolio_cms import METRICS_ENABLED, METRICS_DIR, METRICS_FLUSH_INTERVAL, METRICS_TOKEN, INTERNAL_IPS
+from portfolio_cms import PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL, PROFILE_DIR, PROFILE_RETENTION_DAYS
+from portfolio_cms import DB_ENGINE, DB_HOST, DB_PORT, DB_NAME, DB_UNAME, DB_PWORD
+from portfolio_cms import DB_CONN_MAX_AGE, DB_CONN_HEALTH_CHECKS, DB_POOL_SIZE, DB_SQLITE_TUNING, SQLITE_PATH
+from portfolio_cms import DB_REPLICAS, DB_REPLICA_PIN_SECONDS
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,16 +69,67 @@ AUTH_USER_MODEL = "api.CustomUser"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
+    # orjson-backed, falling back to the stdlib without orjson, see api/renderers.py
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    # Token buckets, see api/throttling.py. "<basename>.<action>" entries rate single actions.
+    "DEFAULT_THROTTLE_CLASSES": (
+        "api.throttling.UserBucketThrottle",
+        "api.throttling.IPBucketThrottle",
+        "api.throttling.ActionBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "user": THROTTLE_USER_RATE,
+        "ip": THROTTLE_IP_RATE,
+        "search.list": "120/min",
+    },
 }
 
+# "local" keeps buckets per worker process, "database" shares them between
+# workers and is the default with more than one
+THROTTLE_BACKEND = THROTTLE_BACKEND
+
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Uploads are stored once per distinct content, see api/storage.py and api/blobs.py.
+# Unreferenced blobs younger than BLOB_GC_GRACE seconds are kept by collect_blobs.
+STORAGES = {
+    "default": {"BACKEND": "api.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+BLOB_GC_GRACE = 24 * 60 * 60
+
+# Media serving, see api/media.py. In production set MEDIA_OFFLOAD_HEADER to
+# "X-Accel-Redirect" (nginx, internal location MEDIA_OFFLOAD_PREFIX aliased to
+# MEDIA_ROOT) or "X-Sendfile" to let the web server send file bodies; Django
+# only uses sendfile() itself under WSGI.
+MEDIA_OFFLOAD_HEADER = MEDIA_OFFLOAD_HEADER
+MEDIA_OFFLOAD_PREFIX = MEDIA_OFFLOAD_PREFIX
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Resized WebP/JPEG variants of uploaded images, see api/images.py.
+# Renders are queued for `manage.py runworker`; IMAGE_RENDER_INLINE renders them
+# in the request once the upload is committed.
+IMAGE_DERIVATIVE_WIDTHS = IMAGE_DERIVATIVE_WIDTHS
+IMAGE_DERIVATIVE_FORMATS = IMAGE_DERIVATIVE_FORMATS
+IMAGE_DERIVATIVE_QUALITY = IMAGE_DERIVATIVE_QUALITY
+IMAGE_RENDER_INLINE = IMAGE_RENDER_INLINE
+
 
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
@@ -74,8 +142,22 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Users of JWT requests are cached per process, see api/authentication.py.
+# Invalidations are versioned in the shared cache, so a deactivated or demoted
+# user is dropped by every worker process at once. AUTH_USER_CACHE_SIZE = 0 disables the cache.
+AUTH_USER_CACHE = "shared"
+AUTH_USER_CACHE_SIZE = AUTH_USER_CACHE_SIZE
+AUTH_USER_CACHE_TTL = AUTH_USER_CACHE_TTL
+
+# Serve reads of the portfolio viewsets on the event loop, see api/asyncviews.py.
+# Set under ASGI only; gunicorn.conf.py turns it on with SERVER_INTERFACE=asgi, the default.
+ASYNC_READS = ASYNC_READS
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.ReplicaRoutingMiddleware",
+    "api.middleware.CompressionMiddleware",
+    "api.middleware.RateLimitHeadersMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -85,6 +167,38 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
 ]
 
+# Request, database, auth and cache metrics served at /metrics, see api/metrics.py.
+# With several worker processes each writes its values to METRICS_DIR every
+# METRICS_FLUSH_INTERVAL seconds and a scrape sums them (gunicorn.conf.py sets it).
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, "api.metrics.MetricsMiddleware")
+METRICS_DIR = METRICS_DIR
+METRICS_FLUSH_INTERVAL = METRICS_FLUSH_INTERVAL
+# /metrics requires METRICS_TOKEN; without one, only INTERNAL_IPS may scrape it
+METRICS_TOKEN = METRICS_TOKEN
+INTERNAL_IPS = INTERNAL_IPS
+
+# Sampling profiler for single requests, see api/profiling.py. Last, so the
+# profiles cover the view only; without PROFILING_ENABLED it drops out of the chain.
+MIDDLEWARE.append("api.profiling.ProfilingMiddleware")
+PROFILING_ENABLED = PROFILING_ENABLED
+PROFILE_SAMPLE_RATE = PROFILE_SAMPLE_RATE
+PROFILE_INTERVAL = PROFILE_INTERVAL
+PROFILE_DIR = PROFILE_DIR or os.path.join(BASE_DIR, "profiles")
+PROFILE_RETENTION_DAYS = PROFILE_RETENTION_DAYS
+
+# Query count and time of each request in Server-Timing and the api.queries log,
+# with warnings for repeated queries (N+1) and views over their query_budget,
+# see api/instrumentation.py. First, so it covers every other middleware.
+if SQL_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, "api.instrumentation.QueryInstrumentationMiddleware")
+SQL_REPEAT_THRESHOLD = SQL_REPEAT_THRESHOLD
+
+# Response compression, see api/middleware.py. Brotli is used when the brotli
+# package is installed and the client accepts it, gzip otherwise.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = TRUSTED_ORIGINS
 
@@ -116,23 +230,129 @@ WSGI_APPLICATION = "portfolio_cms.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DB_ENGINE selects PostgreSQL (the default when DB_HOST is set) or SQLite.
+# Connections are kept for DB_CONN_MAX_AGE seconds and checked before reuse.
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": DB_NAME,
+            "USER": DB_UNAME,
+            "PASSWORD": DB_PWORD,
+            "HOST": DB_HOST,
+            "PORT": DB_PORT,
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+            "OPTIONS": {},
+        }
     }
+    if DB_POOL_SIZE:
+        # A psycopg 3 connection pool per process (psycopg[pool] in requirements.txt);
+        # replaces persistent connections
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {"min_size": 1, "max_size": DB_POOL_SIZE, "timeout": 10}
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": SQLITE_PATH or BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+            "OPTIONS": {},
+        }
+    }
+    if DB_SQLITE_TUNING:
+        # WAL lets readers run alongside the writer; writers wait up to 5 s for
+        # the lock instead of failing with "database is locked", and take it
+        # when the transaction starts so it never has to be upgraded mid-way.
+        DATABASES["default"]["OPTIONS"] = {
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA busy_timeout=5000;"
+                "PRAGMA mmap_size=268435456;"
+                "PRAGMA temp_store=MEMORY;"
+            ),
+            "transaction_mode": "IMMEDIATE",
+        }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be 'postgresql' or 'sqlite', not {DB_ENGINE!r}")
+
+# Read replicas, see api/routers.py. Safe requests read from a random replica;
+# a client that wrote stays on the primary for REPLICA_PIN_SECONDS. The pin
+# must reach every worker process, so it lives in the shared cache.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(DB_REPLICAS, 1):
+    alias = f"replica{number}"
+    DATABASES[alias] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if DB_ENGINE == "postgresql":
+        host, _, port = replica.partition(":")
+        DATABASES[alias].update(HOST=host, PORT=port or DB_PORT)
+    else:
+        DATABASES[alias]["NAME"] = replica
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+REPLICA_PIN_SECONDS = DB_REPLICA_PIN_SECONDS
+REPLICA_PIN_CACHE = "shared"
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
 }
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': DB_NAME,                      
-#         'USER': DB_UNAME,
-#         'PASSWORD': DB_PWORD,
-#         'HOST': DB_HOST,
-#         'PORT': DB_PORT,
-#     }
-# }
+# Worker processes serving requests (set by gunicorn.conf.py). Caches that must
+# agree between them cannot be kept per process.
+WEB_WORKERS = WEB_WORKERS
+
+
+def shared_backend(name, backend):
+    if backend == "locmem" and WEB_WORKERS > 1:
+        raise ImproperlyConfigured(
+            f"{name}=locmem keeps a copy per worker process, so changes in one worker never reach "
+            f"the other {WEB_WORKERS - 1}; use file"
+        )
+    return CACHE_BACKENDS[backend]
+
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS["locmem"],
+    },
+    # Precomputed portfolio documents, see api/snapshots.py. Every worker
+    # process must see an invalidation, so they share the file backend.
+    "snapshots": {
+        "BACKEND": shared_backend("SNAPSHOT_CACHE_BACKEND", SNAPSHOT_CACHE_BACKEND),
+        "LOCATION": SNAPSHOT_CACHE_LOCATION or (
+            os.path.join(BASE_DIR, "cache", "snapshots") if SNAPSHOT_CACHE_BACKEND == "file" else "snapshots"
+        ),
+        "TIMEOUT": SNAPSHOT_CACHE_TIMEOUT,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # Small, short-lived entries every worker process must see, see REPLICA_PIN_CACHE and AUTH_USER_CACHE
+    "shared": {
+        "BACKEND": shared_backend("SHARED_CACHE_BACKEND", SHARED_CACHE_BACKEND),
+        "LOCATION": SHARED_CACHE_LOCATION or (
+            os.path.join(BASE_DIR, "cache", "shared") if SHARED_CACHE_BACKEND == "file" else "shared"
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
+PORTFOLIO_SNAPSHOT_CACHE = "snapshots"
+
+# Soft-deleted rows older than this are moved to the archive tables by `manage.py archive_deleted`
+ARCHIVE_RETENTION_DAYS = ARCHIVE_RETENTION_DAYS
+
+# Background jobs, see api/jobs.py
+JOB_WORKER_CONCURRENCY = JOB_WORKER_CONCURRENCY
+JOB_MAX_ATTEMPTS = JOB_MAX_ATTEMPTS
+JOB_RETRY_BACKOFF = 5  # Seconds before the first retry, doubled on every further attempt
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+JOB_STALE_TIMEOUT = 60 * 60  # Running jobs locked longer than this are requeued on worker start
+JOB_CLAIM_CANDIDATES = 10  # Rows tried per claim on backends without SKIP LOCKED
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
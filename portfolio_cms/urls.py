@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from api.media import serve_media
+from api.metrics import metrics_view
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView 
 
 urlpatterns = [
@@ -8,6 +11,8 @@ urlpatterns = [
     path('api/auth/', include('djoser.urls')),  # Djoser auth endpoints
     path('api/auth/', include('djoser.urls.jwt')),  # JWT authentication with Djoser
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),  # Uploaded files
+    path('metrics', metrics_view, name='metrics'),  # Prometheus metrics
 
     # Swagger UI
     path('', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),